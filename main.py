@@ -1,37 +1,370 @@
 import argparse
 import sys
 import os
+import time
+from collections import Counter
+from concurrent.futures import ThreadPoolExecutor
 from dotenv import load_dotenv
 
 from src.utils.logger import log_experiment, ActionType
-from src.tools import read_file, write_file
+from src.utils.artifacts import get_artifact_store, prune_sandbox
+from src.utils.backends import BACKENDS, FAKE, GEMINI, configure_backend
+from src.utils.cache import configure_cache
+from src.utils.chunker import DEFAULT_CHUNK_CHARS
+from src.utils.concurrency import set_max_inflight
+from src.utils.console import capture_output
+from src.utils.rate_limiter import configure_rate_limiter
+from src.utils.tokens import estimate_tokens
+from src.utils.tracing import bind_span, configure_tracing, span
+from src.utils.watcher import TreeWatcher
+from src.utils import report
+from src.utils.sandbox_runner import configure_test_pool
+from src.utils.prepass import run_prepass, format_findings
+from src.utils.manifest import Manifest, file_sha256, VERDICT_PASS, VERDICT_FAIL
+from src.utils.work_queue import DEFAULT_QUEUE_PATH, STAGE_AUDITED, STAGE_FIXED, STAGE_QUEUED, Lease, LeaseLost, \
+    WorkQueue, worker_id
+from src.tools import read_file
 from src.agents.auditor import AuditorAgent
 from src.agents.fixer import FixerAgent
 from src.agents.judge import JudgeAgent
 
 load_dotenv()
 
+
+def collect_target_files(target_dir: str) -> list:
+    """Return the original .py files under target_dir, in a stable order."""
+    targets = []
+    for root, dirs, files in os.walk(target_dir):
+        dirs.sort()
+        for fname in sorted(files):
+            if not fname.endswith(".py"):
+                continue
+            if fname.startswith("fixed_") or fname.startswith("fixed_temp_") or fname.startswith("generated_"):
+                continue
+            targets.append(os.path.join(root, fname))
+    return targets
+
+
+def sandbox_key(full_path: str, target_dir: str) -> str:
+    """Unique, filesystem-safe name for a file, so same-named files in subfolders don't share a sandbox."""
+    rel_path = os.path.relpath(full_path, target_dir)
+    return rel_path.replace(os.sep, "__").replace("/", "__")
+
+
+def process_file(full_path: str, key: str, auditor, fixer, judge, max_iterations: int, manifest: Manifest = None,
+                 force: bool = False, prepass: dict = None, triage: str = "off", cheap_auditor=None,
+                 analysis: str = None, checkpoint: Lease = None):
+    """
+    Run Auditor -> Fixer -> Judge on one file.
+    analysis: audit already done for this file (batched audit); the Auditor is not called again.
+    checkpoint: lease on this file's queue job; completed stages are saved to it, and stages it
+    already holds (audit, fix, Judge iterations) are not redone.
+    prepass: this file's static-analysis result; triage decides what happens to clean files
+    ("off": full audit, "cheap": brief audit by cheap_auditor, "skip": not processed).
+    Returns "skipped", "clean", "new" or "reprocessed" (or "error" if the file could not be read).
+    """
+    with span("file", path=full_path) as file_span:
+        outcome = _process_file(full_path, key, auditor, fixer, judge, max_iterations, manifest, force,
+                                prepass, triage, cheap_auditor, analysis, checkpoint)
+        file_span.attrs["outcome"] = outcome
+    return outcome
+
+
+def _process_file(full_path, key, auditor, fixer, judge, max_iterations, manifest, force,
+                  prepass, triage, cheap_auditor, analysis, checkpoint):
+    try:
+        content_hash = file_sha256(full_path)
+    except OSError as e:
+        print(f"Failed to read {full_path}: {e}")
+        return "error"
+    previous = manifest.get(full_path) if manifest else None
+    if manifest and not force and manifest.is_up_to_date(full_path, content_hash, fixer.model_id):
+        print(f"\n⏭️ Skipping {full_path} (unchanged, passed last run)")
+        return "skipped"
+    outcome = "reprocessed" if previous else "new"
+
+    findings = prepass["findings"] if prepass else []
+    if prepass and prepass["clean"] and triage == "skip":
+        print(f"\n🧹 Skipping {full_path} (static analysis clean)")
+        return "clean"
+
+    print(f"\n🔹 Processing {full_path}...")
+
+    state = checkpoint.state if checkpoint else {}
+    if checkpoint and checkpoint.job["content_hash"] != content_hash:
+        state.clear()  # the file changed since it was queued: the saved progress doesn't apply
+    # Once the lease is lost the job belongs to another worker: stop before every stage and every sandbox write
+    guard = checkpoint.check if checkpoint else (lambda: None)
+
+    guard()
+    if "analysis" in state:
+        print("↪️ Using the saved audit.")
+        analysis = state["analysis"]
+    else:
+        try:
+            if analysis is not None:
+                print("📦 Using batched audit.")
+                if findings:
+                    analysis += "\n\nStatic analysis findings:\n" + format_findings(findings)
+            elif prepass and prepass["broken"]:
+                # The file doesn't even compile: the static findings are the audit
+                print("🧱 Compile errors found locally, skipping the LLM audit.")
+                analysis = "The code does not compile:\n" + format_findings(findings)
+            elif prepass and prepass["clean"] and triage == "cheap":
+                analysis = (cheap_auditor or auditor).analyze(full_path, brief=True)
+            else:
+                analysis = auditor.analyze(full_path, findings=findings)
+                if findings:
+                    analysis += "\n\nStatic analysis findings:\n" + format_findings(findings)
+        except Exception as e:
+            analysis = f"<auditor-error> {e}"
+        if checkpoint and not analysis.startswith("<auditor-error>"):
+            checkpoint.save(STAGE_AUDITED, analysis=analysis)
+
+    try:
+        original_code = read_file(full_path)
+    except Exception as e:
+        print(f"Failed to read {full_path}: {e}")
+        return "error"
+
+    # ✅ Write temp fixed code in sandbox
+    sandbox_temp_dir = os.path.join("sandbox", f"temp_{key}")
+    os.makedirs(sandbox_temp_dir, exist_ok=True)
+    temp_fixed_path = os.path.join(sandbox_temp_dir, f"fixed_temp_{key}")
+
+    guard()
+    if "fixed_code" in state:
+        print("↪️ Using the saved fix.")
+        fixed_code = state["fixed_code"]
+    else:
+        try:
+            fixed_code = fixer.fix(original_code, analysis, output_path=temp_fixed_path)
+        except Exception as e:
+            print(f"Fixer failed: {e}")
+            fixed_code = original_code
+        if checkpoint:
+            checkpoint.save(STAGE_FIXED, fixed_code=fixed_code)
+    guard()
+    get_artifact_store().write(temp_fixed_path, fixed_code)
+
+    # ✅ Judge test folder per file: sandbox/temp_<file>/test_<file>
+    judge_test_dir = os.path.join(sandbox_temp_dir, f"test_{key}")
+    resume = state.get("judge")
+    if resume and not os.path.exists(resume["code_path"]):
+        resume = None  # its sandbox files are gone: redo the Judge loop
+    on_iteration = (lambda judge_state: checkpoint.save(f"iteration {judge_state['iteration']}", judge=judge_state)) \
+        if checkpoint else None
+    verdict = judge.evaluate(temp_fixed_path, fixer, max_iterations=max_iterations, base_dir_override=judge_test_dir,
+                             suite_key=content_hash, resume=resume, on_iteration=on_iteration, guard=guard)
+    final_fixed_path = verdict["final_path"]
+
+    # Save final fixed code to sandbox
+    sandbox_dir = os.path.join("sandbox")
+    os.makedirs(sandbox_dir, exist_ok=True)
+    final_output_path = os.path.join(sandbox_dir, f"final_fixed_{key}")
+    guard()
+    get_artifact_store().copy(final_fixed_path, final_output_path)  # same blob as the best iteration
+
+    print(f"✅ Final fixed code saved to: {final_output_path}")
+
+    if manifest:
+        manifest.record(full_path, content_hash, fixer.model_id,
+                        VERDICT_PASS if verdict["passed"] else VERDICT_FAIL, final_output_path)
+    return outcome
+
+
+def _process_captured(**kwargs):
+    """Worker entry point: run process_file with this thread's prints buffered."""
+    with capture_output() as buffer:
+        try:
+            outcome = process_file(**kwargs)
+        except LeaseLost as e:
+            print(f"⚠️ {e}; stopping.")
+            outcome = "lost"
+        except Exception as e:
+            print(f"❌ Unexpected error: {e}")
+            outcome = "error"
+    return outcome, buffer.getvalue()
+
+
+def run_jobs(jobs: list, workers: int) -> list:
+    """Process every job, sequentially or on a thread pool. Returns the outcomes in job order."""
+    outcomes = []
+    if workers == 1:
+        for job in jobs:
+            outcomes.append(process_file(**job))
+    else:
+        print(f"⚙️ {len(jobs)} files, {workers} workers")
+        with ThreadPoolExecutor(max_workers=workers) as pool:
+            # map() yields results in submission order, so each file's output is printed as one block
+            for outcome, output in pool.map(bind_span(lambda job: _process_captured(**job)), jobs):
+                print(output, end="")
+                outcomes.append(outcome)
+    return outcomes
+
+
+def batch_audit(targets: list, auditor, manifest: Manifest, args, prepass: dict, model_id: str) -> dict:
+    """Audit the small files that will need a full audit, several per request. Returns {path: analysis}."""
+    small = []
+    for path in targets:
+        try:
+            if not args.force and manifest.is_up_to_date(path, file_sha256(path), model_id):
+                continue
+            if estimate_tokens(read_file(path)) > args.batch_file_tokens:
+                continue
+        except OSError:
+            continue
+        result = prepass.get(path)
+        # Broken files don't need an LLM audit; clean ones get the cheap/skip treatment
+        if result and (result["broken"] or (result["clean"] and args.prepass != "off")):
+            continue
+        small.append(path)
+    if len(small) < 2:
+        return {}
+    print(f"📦 Batched audit of {len(small)} small files...")
+    findings = {path: prepass[path]["findings"] for path in small if path in prepass}
+    with span("batch_audit", files=len(small)):
+        return auditor.analyze_batch(small, token_budget=args.batch_tokens, findings_by_path=findings)
+
+
 def main():
+    # Subcommands; without one, main.py runs the pipeline as before
+    commands = {"report": report.main, "enqueue": enqueue_main, "worker": worker_main, "status": status_main,
+                "watch": watch_main}
+    if len(sys.argv) > 1 and sys.argv[1] in commands:
+        commands[sys.argv[1]](sys.argv[2:])
+        return
+    run_pipeline()
+
+
+def add_pipeline_args(parser: argparse.ArgumentParser) -> None:
+    """Options shared by the pipeline and the queue workers."""
+    parser.add_argument("--max_iterations", type=int, default=5, help="Maximum iterations for JudgeAgent")
+    parser.add_argument("--patience", type=int, default=2,
+                        help="Stop the Judge loop after N iterations without fewer failures (0: never)")
+    parser.add_argument("--workers", type=int, default=1, help="Number of files processed concurrently")
+    parser.add_argument("--max_inflight", type=int, default=None,
+                        help="Global cap on in-flight Gemini requests (default: same as --workers)")
+    parser.add_argument("--audit_chunk_chars", type=int, default=DEFAULT_CHUNK_CHARS,
+                        help="Files larger than this are split by AST and audited in parallel chunks (0: never)")
+    parser.add_argument("--patch_min_lines", type=int, default=150,
+                        help="Files with at least this many lines are fixed with unified diffs (0: always full file)")
+    parser.add_argument("--prepass", choices=["off", "cheap", "skip"], default="off",
+                        help="Run ast/compile/pylint checks first; clean files get a cheap audit or are skipped")
+    parser.add_argument("--cheap_model", type=str, default="models/gemini-2.5-flash-lite",
+                        help="Model used for the brief audit of clean files (--prepass cheap)")
+    parser.add_argument("--batch_audit", action="store_true",
+                        help="Audit several small files per Gemini request")
+    parser.add_argument("--batch_tokens", type=int, default=8000, help="Token budget of code per batched audit request")
+    parser.add_argument("--batch_file_tokens", type=int, default=1500,
+                        help="Only files up to this many tokens are batched")
+    parser.add_argument("--rpm", type=float, default=float(os.getenv("IGL_RPM", "0")) or None,
+                        help="Requests per minute allowed by the API quota (default: $IGL_RPM, unlimited if unset)")
+    parser.add_argument("--tpm", type=float, default=float(os.getenv("IGL_TPM", "0")) or None,
+                        help="Tokens per minute allowed by the API quota (default: $IGL_TPM, unlimited if unset)")
+    parser.add_argument("--max_retries", type=int, default=5, help="Retries per Gemini call on transient/quota errors")
+    parser.add_argument("--test_workers", type=int, default=None,
+                        help="Warm test-runner processes (default: same as --workers)")
+    parser.add_argument("--shard_tests", type=int, default=0,
+                        help="Split each generated test suite across N test workers (0: run serially)")
+    parser.add_argument("--stable_tests", action="store_true",
+                        help="Generate each file's test suite once and reuse it across Judge iterations")
+    parser.add_argument("--test_timeout", type=float, default=10.0, help="Time budget per generated test case (seconds)")
+    parser.add_argument("--test_memory_mb", type=int, default=1024, help="Memory limit for a test run (MB)")
+    parser.add_argument("--failure_tokens", type=int, default=1500,
+                        help="Token budget of the compressed test-failure report sent to the Fixer (0: raw output)")
+    parser.add_argument("--stream", action="store_true",
+                        help="Stream Fixer and test-generation answers: checked as they arrive, aborted early if broken")
+    parser.add_argument("--force", action="store_true", help="Reprocess every file, even unchanged ones that passed")
+    parser.add_argument("--manifest", type=str, default=None, help="Run manifest path (default: sandbox/manifest.json)")
+    parser.add_argument("--no_metrics", action="store_true", help="Don't record stage timings in logs/metrics.jsonl")
+    parser.add_argument("--backend", choices=BACKENDS, default=os.getenv("IGL_BACKEND", GEMINI),
+                        help="Model backend; 'fake' answers locally, for offline runs and benchmarks "
+                             "(default: $IGL_BACKEND or gemini)")
+    parser.add_argument("--fake_config", type=str, default=os.getenv("IGL_FAKE_CONFIG"),
+                        help="JSON config of the fake backend: latency, injected errors, canned responses")
+    parser.add_argument("--keep_iterations", type=int, default=0,
+                        help="Keep only the last N iteration folders per file once the run is over (0: keep all)")
+    parser.add_argument("--blob_min_age", type=float, default=3600.0,
+                        help="Unreferenced sandbox blobs younger than this (seconds) survive the end-of-run cleanup")
+    parser.add_argument("--no_cache", action="store_true", help="Bypass the Gemini response cache")
+    parser.add_argument("--cache_dir", type=str, default=None, help="Response cache directory (default: .cache/gemini)")
+
+
+def setup(args, workers: int) -> dict:
+    """Configure the shared limits, pools and caches, and build the agents."""
+    api_key = os.getenv("GOOGLE_API_KEY")
+    if not api_key and args.backend == GEMINI:
+        print("❌ GOOGLE_API_KEY not found in environment. Use a .env file or set the variable.")
+        sys.exit(1)
+
+    set_max_inflight(args.max_inflight or workers)
+    configure_rate_limiter(rpm=args.rpm, tpm=args.tpm, max_retries=args.max_retries)
+    test_workers = max(args.test_workers or workers, args.shard_tests)
+    configure_test_pool(size=test_workers, test_timeout=args.test_timeout, memory_mb=args.test_memory_mb)
+    cache = configure_cache(enabled=not args.no_cache, cache_dir=args.cache_dir)
+    configure_tracing(enabled=not args.no_metrics)
+    backend = configure_backend(args.backend, api_key=api_key, fake_config=args.fake_config)
+
+    fixer = FixerAgent(api_key, patch_min_lines=args.patch_min_lines, stream=args.stream)
+    return {
+        "cache": cache,
+        "backend": backend,
+        "auditor": AuditorAgent(api_key, chunk_chars=args.audit_chunk_chars),
+        "cheap_auditor": (AuditorAgent(api_key, model=args.cheap_model, chunk_chars=args.audit_chunk_chars)
+                          if args.prepass == "cheap" else None),
+        "fixer": fixer,
+        "judge": JudgeAgent(api_key, test_shards=args.shard_tests, stable_tests=args.stable_tests,
+                            patience=args.patience, stream=args.stream, failure_tokens=args.failure_tokens),
+        "manifest": Manifest(args.manifest) if args.manifest else Manifest(),
+        "artifacts": get_artifact_store(),
+    }
+
+
+def clean_sandbox(ctx: dict, args) -> None:
+    """Apply the iteration retention policy, then drop the blobs nothing links to anymore."""
+    pruned = prune_sandbox("sandbox", args.keep_iterations)
+    collected = ctx["artifacts"].gc(min_age=args.blob_min_age)
+    if pruned or collected["removed"]:
+        print(f"🧹 Sandbox: {pruned} old iteration folders pruned, {collected['removed']} blobs "
+              f"({collected['freed'] / 1024:.0f} KiB) freed")
+
+
+def print_summary(outcomes: list, ctx: dict) -> None:
+    print(f"\n📋 Summary: {outcomes.count('skipped')} skipped, {outcomes.count('reprocessed')} reprocessed, "
+          f"{outcomes.count('new')} new"
+          + (f", {outcomes.count('clean')} clean (triaged out)" if "clean" in outcomes else "") + (f", {outcomes.count('error')} errors" if "error" in outcomes else ""))
+
+    cache = ctx["cache"]
+    if cache.enabled:
+        stats = cache.stats()
+        print(f"\n💾 Cache: {stats['hits']} hits, {stats['misses']} misses, {stats['evictions']} evictions")
+
+    backend = ctx["backend"]
+    if backend.name == FAKE:
+        stats = backend.stats()
+        print(f"🧪 Fake backend: {stats['calls']} calls, {stats['rate_limited']} rate-limited, {stats['failed']} failed")
+
+    stats = ctx["artifacts"].stats()
+    print(f"🗂️ Artifacts: {stats['blobs_written']} blobs written ({stats['bytes_written'] / 1024:.0f} KiB), "
+          f"{stats['deduplicated']} writes deduplicated")
+
+
+def run_pipeline():
     parser = argparse.ArgumentParser()
     parser.add_argument("--target_dir", type=str, required=True)
-    parser.add_argument("--max_iterations", type=int, default=5, help="Maximum iterations for JudgeAgent")
+    add_pipeline_args(parser)
     args = parser.parse_args()
 
     if not os.path.exists(args.target_dir):
         print(f"❌ Dossier {args.target_dir} introuvable.")
         sys.exit(1)
 
-    api_key = os.getenv("GOOGLE_API_KEY")
-    if not api_key:
-        print("❌ GOOGLE_API_KEY not found in environment. Use a .env file or set the variable.")
-        sys.exit(1)
+    workers = max(1, args.workers)
+    ctx = setup(args, workers)
 
     print(f"🚀 DEMARRAGE SUR : {args.target_dir}")
 
-    auditor = AuditorAgent(api_key)
-    fixer = FixerAgent(api_key)
-    judge = JudgeAgent(api_key)
-
     # Log startup
     try:
         log_experiment("System", "local", ActionType.DEBUG, {"input_prompt": "startup", "output_response": f"Target: {args.target_dir}"}, "SUCCESS")
@@ -39,52 +372,236 @@ def main():
         pass
 
     # Process only original .py files
-    for root, _dirs, files in os.walk(args.target_dir):
-        for fname in files:
-            if not fname.endswith(".py"):
-                continue
-            if fname.startswith("fixed_") or fname.startswith("fixed_temp_") or fname.startswith("generated_"):
-                continue
+    targets = collect_target_files(args.target_dir)
 
-            full_path = os.path.join(root, fname)
-            print(f"\n🔹 Processing {full_path}...")
+    prepass = {}
+    if args.prepass != "off":
+        print(f"🔎 Static pre-pass on {len(targets)} files...")
+        with span("prepass", files=len(targets)):
+            prepass = run_prepass(targets, workers=max(workers, os.cpu_count() or 1))
+        print(f"🔎 {sum(r['clean'] for r in prepass.values())} clean, "
+              f"{sum(r['broken'] for r in prepass.values())} not compiling, "
+              f"{sum(not r['clean'] and not r['broken'] for r in prepass.values())} with findings")
 
-            try:
-                analysis = auditor.analyze(full_path)
-            except Exception as e:
-                analysis = f"<auditor-error> {e}"
+    batched = {}
+    if args.batch_audit:
+        batched = batch_audit(targets, ctx["auditor"], ctx["manifest"], args, prepass, ctx["fixer"].model_id)
+
+    jobs = [dict(full_path=path, key=sandbox_key(path, args.target_dir), auditor=ctx["auditor"], fixer=ctx["fixer"],
+                 judge=ctx["judge"], max_iterations=args.max_iterations, manifest=ctx["manifest"], force=args.force,
+                 prepass=prepass.get(path), triage=args.prepass, cheap_auditor=ctx["cheap_auditor"],
+                 analysis=batched.get(path))
+            for path in targets]
+
+    with span("run", target_dir=args.target_dir, workers=workers, files=len(jobs)):
+        outcomes = run_jobs(jobs, workers)
+
+    clean_sandbox(ctx, args)
+    print_summary(outcomes, ctx)
+    print("\n🎯 ALL FILES PROCESSED.")
+
+
+def watch_main(argv=None):
+    parser = argparse.ArgumentParser(prog="main.py watch",
+                                     description="Stay up and process the files of a tree as they are saved")
+    parser.add_argument("--target_dir", type=str, required=True)
+    add_pipeline_args(parser)
+    parser.add_argument("--poll_interval", type=float, default=0.5, help="Seconds between two scans of the tree")
+    parser.add_argument("--debounce", type=float, default=1.0,
+                        help="A file is processed once it has not changed for this many seconds")
+    args = parser.parse_args(argv)
+
+    if not os.path.exists(args.target_dir):
+        print(f"❌ Dossier {args.target_dir} introuvable.")
+        sys.exit(1)
 
+    # Everything heavy is set up once: model client, agents, warm test workers, caches
+    workers = max(1, args.workers)
+    ctx = setup(args, workers)
+    watcher = TreeWatcher(args.target_dir, collect_target_files, debounce=args.debounce)
+    print(f"👀 Watching {args.target_dir} (Ctrl-C to stop)")
+    prepass = {}
+
+    def job(path: str) -> dict:
+        return dict(full_path=path, key=sandbox_key(path, args.target_dir), auditor=ctx["auditor"],
+                    fixer=ctx["fixer"], judge=ctx["judge"], max_iterations=args.max_iterations,
+                    manifest=ctx["manifest"], force=args.force, prepass=prepass.get(path), triage=args.prepass,
+                    cheap_auditor=ctx["cheap_auditor"])
+
+    def run(kwargs: dict):
+        if workers > 1:
+            return _process_captured(**kwargs)
+        try:
+            return process_file(**kwargs), ""
+        except Exception as e:
+            print(f"❌ Unexpected error: {e}")
+            return "error", ""
+
+    outcomes = []
+    inflight = {}  # path -> future
+    waiting = set()  # changed again while being processed: goes again once the current run is over
+    pool = ThreadPoolExecutor(max_workers=workers)
+    try:
+        while True:
+            waiting.update(watcher.poll())
+            for path, future in list(inflight.items()):
+                if future.done():
+                    del inflight[path]
+                    outcome, output = future.result()
+                    print(output, end="")
+                    outcomes.append(outcome)
+                    try:
+                        print(f"⏱️ {path}: {outcome}, {time.time() - os.path.getmtime(path):.1f}s after the save")
+                    except OSError:
+                        pass
+            ready = sorted(waiting - set(inflight))
+            if ready:
+                waiting.difference_update(ready)
+                if args.prepass != "off":
+                    prepass.update(run_prepass(ready, workers=max(workers, os.cpu_count() or 1)))
+                for path in ready:
+                    inflight[path] = pool.submit(run, job(path))
+            time.sleep(args.poll_interval)
+    except KeyboardInterrupt:
+        print("\n🛑 Stopping: waiting for the files in progress...")
+        pool.shutdown(wait=True, cancel_futures=True)
+        for future in inflight.values():
+            if future.done() and not future.cancelled():
+                outcome, output = future.result()
+                print(output, end="")
+                outcomes.append(outcome)
+    clean_sandbox(ctx, args)
+    print_summary(outcomes, ctx)
+
+
+def add_queue_args(parser: argparse.ArgumentParser) -> None:
+    parser.add_argument("--queue", type=str, default=DEFAULT_QUEUE_PATH, help="Queue database (default: sandbox/queue.db)")
+    parser.add_argument("--no_wal", action="store_true",
+                        help="Don't use SQLite WAL journaling (needed when the database is on a network filesystem)")
+
+
+def enqueue_main(argv=None):
+    parser = argparse.ArgumentParser(prog="main.py enqueue", description="Add the files of a tree to the work queue")
+    parser.add_argument("--target_dir", type=str, required=True)
+    parser.add_argument("--force", action="store_true", help="Requeue files even if they are unchanged and done")
+    add_queue_args(parser)
+    args = parser.parse_args(argv)
+
+    if not os.path.exists(args.target_dir):
+        print(f"❌ Dossier {args.target_dir} introuvable.")
+        sys.exit(1)
+
+    queue = WorkQueue(args.queue, wal=not args.no_wal)
+    counts = Counter()
+    for path in collect_target_files(args.target_dir):
+        try:
+            content_hash = file_sha256(path)
+        except OSError as e:
+            print(f"Failed to read {path}: {e}")
+            continue
+        counts[queue.enqueue(path, args.target_dir, sandbox_key(path, args.target_dir), content_hash,
+                             force=args.force)] += 1
+    print(f"📥 {counts['added']} added, {counts['requeued']} requeued, {counts['unchanged']} unchanged "
+          f"in {args.queue}")
+
+
+def run_queued_job(queue: WorkQueue, job: dict, owner: str, ctx: dict, args, capture: bool) -> str:
+    """Process one claimed job under its lease, resuming from its checkpoint, and record the result."""
+    prepass = run_prepass([job["path"]], workers=1)[job["path"]] if args.prepass != "off" else None
+    kwargs = dict(full_path=job["path"], key=job["key"], auditor=ctx["auditor"], fixer=ctx["fixer"],
+                  judge=ctx["judge"], max_iterations=args.max_iterations, manifest=ctx["manifest"], force=args.force,
+                  prepass=prepass, triage=args.prepass, cheap_auditor=ctx["cheap_auditor"])
+    try:
+        with Lease(queue, job, owner) as lease:
+            if job["stage"] != STAGE_QUEUED:
+                print(f"\n↪️ Resuming {job['path']} from stage '{job['stage']}' (attempt {job['attempts'] + 1})")
             try:
-                original_code = read_file(full_path)
+                if capture:
+                    outcome, output = _process_captured(checkpoint=lease, **kwargs)
+                    print(output, end="")
+                    if outcome == "lost":
+                        raise LeaseLost(f"job {job['id']} is no longer leased by {owner}")
+                else:
+                    outcome = process_file(checkpoint=lease, **kwargs)
+            except LeaseLost:
+                raise
             except Exception as e:
-                print(f"Failed to read {full_path}: {e}")
+                print(f"❌ Unexpected error: {e}")
+                outcome = "error"
+        if outcome == "error":
+            queue.fail(job["id"], owner, f"processing error on attempt {job['attempts'] + 1}")
+        else:
+            queue.complete(job["id"], owner, outcome)
+    except LeaseLost as e:
+        print(f"⚠️ {e}; leaving {job['path']} to its new owner.")
+        outcome = "lost"
+    return outcome
+
+
+def worker_main(argv=None):
+    parser = argparse.ArgumentParser(prog="main.py worker", description="Process jobs from the work queue")
+    add_pipeline_args(parser)
+    add_queue_args(parser)
+    parser.add_argument("--lease", type=float, default=300.0,
+                        help="Lease duration (s); a job whose worker stops renewing it is picked up by another worker")
+    parser.add_argument("--max_attempts", type=int, default=3, help="Attempts per job before it is marked failed")
+    parser.add_argument("--wait", action="store_true", help="Keep polling for new jobs instead of exiting when idle")
+    parser.add_argument("--poll_interval", type=float, default=5.0, help="Seconds between polls with --wait")
+    args = parser.parse_args(argv)
+
+    queue = WorkQueue(args.queue, lease_seconds=args.lease, max_attempts=args.max_attempts, wal=not args.no_wal)
+    workers = max(1, args.workers)
+    ctx = setup(args, workers)
+    owner = worker_id()
+    print(f"👷 Worker {owner} on {args.queue} ({workers} thread(s))")
+
+    def loop(n: int) -> list:
+        outcomes = []
+        while True:
+            job = queue.claim(f"{owner}/{n}")
+            if job is None:
+                if not args.wait:
+                    return outcomes
+                time.sleep(args.poll_interval)
                 continue
+            outcomes.append(run_queued_job(queue, job, f"{owner}/{n}", ctx, args, capture=workers > 1))
 
-            try:
-                fixed_code = fixer.fix(original_code, analysis)
-            except Exception as e:
-                print(f"Fixer failed: {e}")
-                fixed_code = original_code
+    with span("run", queue=args.queue, workers=workers):
+        if workers == 1:
+            outcomes = loop(0)
+        else:
+            with ThreadPoolExecutor(max_workers=workers) as pool:
+                outcomes = [o for thread_outcomes in pool.map(bind_span(loop), range(workers)) for o in thread_outcomes]
 
-            # ✅ Write temp fixed code in sandbox
-            sandbox_temp_dir = os.path.join("sandbox", f"temp_{fname}")
-            os.makedirs(sandbox_temp_dir, exist_ok=True)
-            temp_fixed_path = os.path.join(sandbox_temp_dir, f"fixed_temp_{fname}")
-            write_file(temp_fixed_path, fixed_code)
+    clean_sandbox(ctx, args)
+    print_summary(outcomes, ctx)
+    print("\n🎯 QUEUE DRAINED.")
 
-            # ✅ Judge test folder per file: sandbox/temp_<file>/test_<file>
-            judge_test_dir = os.path.join(sandbox_temp_dir, f"test_{fname}")
-            final_fixed_path = judge.judge(temp_fixed_path, fixer, max_iterations=args.max_iterations, base_dir_override=judge_test_dir)
 
-            # Save final fixed code to sandbox
-            sandbox_dir = os.path.join("sandbox")
-            os.makedirs(sandbox_dir, exist_ok=True)
-            final_output_path = os.path.join(sandbox_dir, f"final_fixed_{fname}")
-            write_file(final_output_path, read_file(final_fixed_path))
+def status_main(argv=None):
+    parser = argparse.ArgumentParser(prog="main.py status", description="Progress of the work queue")
+    add_queue_args(parser)
+    parser.add_argument("--jobs", choices=["running", "failed", "pending", "done"], default=None,
+                        help="Also list the jobs with this status")
+    args = parser.parse_args(argv)
 
-            print(f"✅ Final fixed code saved to: {final_output_path}")
+    if not os.path.exists(args.queue):
+        print(f"No queue at {args.queue}.")
+        return
+    queue = WorkQueue(args.queue, wal=not args.no_wal)
+    counts = queue.counts()
+    total = sum(sum(stages.values()) for stages in counts.values())
+    print(f"Queue {args.queue}: {total} jobs")
+    for status in ("pending", "running", "stale", "done", "failed"):
+        stages = counts.get(status)
+        if stages:
+            detail = ", ".join(f"{stage}: {n}" for stage, n in sorted(stages.items()))
+            print(f"  {status:<8} {sum(stages.values()):>6}  ({detail})")
+    if args.jobs:
+        for job in queue.jobs(args.jobs):
+            extra = job["lease_owner"] or job["outcome"] or job["error"] or ""
+            print(f"  #{job['id']:<5} {job['stage']:<12} attempts={job['attempts']}  {job['path']}  {extra}")
 
-    print("\n🎯 ALL FILES PROCESSED.")
 
 if __name__ == "__main__":
     main()
@@ -0,0 +1,178 @@
+"""Offline end-to-end benchmark of main.py on synthetic corpora, using the fake model backend.
+
+Every combination of --files and --lines gets a fresh corpus and a fresh
+working directory (sandbox/, logs/, .cache/), so runs don't share state and the
+real sandbox and caches are never touched. Throughput and latencies are read
+from the run's logs/metrics.jsonl.
+
+Usage:
+    python scripts/benchmark.py --files 5,20 --lines 50,400
+    python scripts/benchmark.py --latency lognormal:0.5:0.4 --rate_limit_rate 0.05 --output bench.json
+    python scripts/benchmark.py --baseline bench.json      # exit code 1 on a regression
+    python scripts/benchmark.py -- --workers 4 --batch_audit   # arguments after -- go to main.py
+"""
+import argparse
+import json
+import os
+import random
+import subprocess
+import sys
+import tempfile
+import time
+from itertools import product
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from src.utils.log_store import read_entries  # noqa: E402
+from src.utils.report import percentile  # noqa: E402
+
+MAIN = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "main.py")
+
+_FUNCTION_TEMPLATES = [
+    "def {name}(values):\n    total = 0\n    for i in range(len(values) + 1):\n        total += values[i]\n    return total\n",
+    "def {name}(a, b):\n    if b == 0:\n        return None\n    return a / b\n",
+    "def {name}(text):\n    words = text.split()\n    return {{w: words.count(w) for w in words}}\n",
+    "def {name}(items, key=None):\n    result = []\n    for item in items:\n        if item not in result:\n            result.append(item)\n    return sorted(result, key=key)\n",
+    "def {name}(n):\n    if n <= 1:\n        return 1\n    return n * {name}(n - 1)\n",
+    "class {cls}:\n    def __init__(self):\n        self.items = []\n\n    def add(self, item):\n        self.items.append(item)\n        return len(self.items)\n\n    def pop(self):\n        return self.items.pop(0)\n",
+]
+
+
+def make_module(lines: int, rng: random.Random) -> str:
+    """A plausible, importable module of roughly `lines` lines (some functions carry classic bugs)."""
+    parts = ['"""Synthetic module generated by scripts/benchmark.py."""\nimport math\n']
+    count = 0
+    while sum(part.count("\n") + 1 for part in parts) < lines:
+        template = rng.choice(_FUNCTION_TEMPLATES)
+        parts.append(template.format(name=f"func_{count}", cls=f"Container{count}"))
+        count += 1
+    return "\n\n".join(parts)
+
+
+def make_corpus(directory: str, files: int, lines: int, seed: int) -> None:
+    rng = random.Random(seed)
+    for i in range(files):
+        # A couple of subfolders, like a real project
+        folder = os.path.join(directory, f"pkg_{i % 3}")
+        os.makedirs(folder, exist_ok=True)
+        with open(os.path.join(folder, f"module_{i}.py"), "w", encoding="utf-8") as f:
+            f.write(make_module(lines, rng))
+
+
+def summarize_run(metrics_path: str, elapsed: float) -> dict:
+    spans = [s for s in read_entries(metrics_path) if "span_id" in s]
+    by_name = {}
+    for s in spans:
+        by_name.setdefault(s["name"], []).append(s["duration"])
+    files = [s for s in spans if s["name"] == "file"]
+    processed = [s for s in files if s["attrs"].get("outcome") in ("new", "reprocessed")]
+    totals = {}
+    for s in spans:
+        if s["name"] == "run":
+            for key, value in s.get("counters", {}).items():
+                totals[key] = totals.get(key, 0) + value
+    file_latency = [s["duration"] for s in files]
+    return {
+        "elapsed": round(elapsed, 3),
+        "files": len(processed),
+        "throughput": round(len(processed) / elapsed * 60, 2) if elapsed else 0.0,  # files/min
+        "file_p50": round(percentile(file_latency, 50), 3),
+        "file_p90": round(percentile(file_latency, 90), 3),
+        "llm_p50": round(percentile(by_name.get("llm_call", []), 50), 3),
+        "llm_p90": round(percentile(by_name.get("llm_call", []), 90), 3),
+        "test_run_p50": round(percentile(by_name.get("test_run", []), 50), 3),
+        "llm_calls": totals.get("llm_calls", 0),
+        "retries": totals.get("retries", 0),
+        "prompt_tokens": totals.get("prompt_tokens", 0),
+    }
+
+
+def run_case(files: int, lines: int, args, main_args: list) -> dict:
+    with tempfile.TemporaryDirectory(prefix="igl-bench-") as workdir:
+        corpus = os.path.join(workdir, "corpus")
+        make_corpus(corpus, files, lines, args.seed)
+        config_path = args.fake_config
+        if not config_path:
+            config_path = os.path.join(workdir, "fake_backend.json")
+            with open(config_path, "w", encoding="utf-8") as f:
+                json.dump({"latency": args.latency, "seconds_per_token": args.seconds_per_token,
+                           "rate_limit_rate": args.rate_limit_rate, "error_rate": args.error_rate,
+                           "retry_after": args.retry_after, "seed": args.seed}, f)
+
+        command = [sys.executable, MAIN, "--target_dir", corpus, "--backend", "fake",
+                   "--fake_config", config_path, "--no_cache", "--force", *main_args]
+        started = time.perf_counter()
+        # cwd = workdir: sandbox/, logs/ and .cache/ of the run live (and die) there
+        result = subprocess.run(command, cwd=workdir, capture_output=True, text=True)
+        elapsed = time.perf_counter() - started
+        if result.returncode != 0:
+            raise RuntimeError(f"main.py failed ({result.returncode}):\n{result.stdout[-2000:]}{result.stderr[-2000:]}")
+        return summarize_run(os.path.join(workdir, "logs", "metrics.jsonl"), elapsed)
+
+
+def compare(results: dict, baseline: dict, tolerance: float) -> list:
+    """Cases whose throughput dropped, or whose p90 file latency grew, by more than `tolerance` (a fraction)."""
+    regressions = []
+    for case, current in results.items():
+        previous = baseline.get(case)
+        if not previous:
+            continue
+        if current["throughput"] < previous["throughput"] * (1 - tolerance):
+            regressions.append(f"{case}: throughput {previous['throughput']} -> {current['throughput']} files/min")
+        if current["file_p90"] > previous["file_p90"] * (1 + tolerance):
+            regressions.append(f"{case}: file p90 {previous['file_p90']} -> {current['file_p90']} s")
+    return regressions
+
+
+def main():
+    argv = sys.argv[1:]
+    main_args = []
+    if "--" in argv:
+        split = argv.index("--")
+        argv, main_args = argv[:split], argv[split + 1:]
+
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--files", type=str, default="5,20", help="Comma-separated corpus sizes (number of files)")
+    parser.add_argument("--lines", type=str, default="50,400", help="Comma-separated file sizes (lines per file)")
+    parser.add_argument("--repeat", type=int, default=1, help="Runs per case; the median throughput run is kept")
+    parser.add_argument("--seed", type=int, default=0, help="Seed of the corpus generator and the fake backend")
+    parser.add_argument("--latency", type=str, default="lognormal:0.3:0.5", help="Fake model latency (see src/utils/backends.py)")
+    parser.add_argument("--seconds_per_token", type=float, default=0.0, help="Extra fake latency per response token")
+    parser.add_argument("--rate_limit_rate", type=float, default=0.0, help="Share of fake calls answered with a 429")
+    parser.add_argument("--error_rate", type=float, default=0.0, help="Share of fake calls answered with a 503")
+    parser.add_argument("--retry_after", type=float, default=0.5, help="Retry delay hinted by injected 429s")
+    parser.add_argument("--fake_config", type=str, default=None, help="Fake backend JSON config (overrides the options above)")
+    parser.add_argument("--output", type=str, default=None, help="Write the results as JSON (usable as a --baseline)")
+    parser.add_argument("--baseline", type=str, default=None, help="Compare with a previous --output file")
+    parser.add_argument("--tolerance", type=float, default=0.15, help="Allowed relative slowdown before flagging")
+    args = parser.parse_args(argv)
+
+    results = {}
+    print(f"{'case':<18}{'files/min':>10}{'elapsed':>9}{'file p50':>10}{'file p90':>10}"
+          f"{'llm p50':>9}{'llm p90':>9}{'calls':>7}{'retries':>8}")
+    for files, lines in product([int(n) for n in args.files.split(",")], [int(n) for n in args.lines.split(",")]):
+        runs = sorted((run_case(files, lines, args, main_args) for _ in range(max(1, args.repeat))),
+                      key=lambda r: r["throughput"])
+        case = f"{files}x{lines}"
+        r = results[case] = runs[len(runs) // 2]
+        print(f"{case:<18}{r['throughput']:>10.1f}{r['elapsed']:>9.1f}{r['file_p50']:>10.2f}{r['file_p90']:>10.2f}"
+              f"{r['llm_p50']:>9.2f}{r['llm_p90']:>9.2f}{r['llm_calls']:>7}{r['retries']:>8}")
+
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            json.dump(results, f, indent=2)
+        print(f"✅ Results written to {args.output}")
+
+    if args.baseline:
+        with open(args.baseline, "r", encoding="utf-8") as f:
+            regressions = compare(results, json.load(f), args.tolerance)
+        if regressions:
+            print("❌ Regressions:")
+            for line in regressions:
+                print(f"  {line}")
+            sys.exit(1)
+        print("✅ No regression against the baseline.")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,59 @@
+"""Read, migrate or export the experiment log.
+
+Usage:
+    python scripts/migrate_logs.py migrate   # legacy experiment_data.json -> experiment_data.jsonl
+    python scripts/migrate_logs.py export    # everything -> one JSON array (legacy format)
+    python scripts/migrate_logs.py stats     # count entries per agent/status, size of the text store
+    python scripts/migrate_logs.py compact   # drop stored texts no entry references anymore (after rotation)
+"""
+import argparse
+import os
+import sys
+from collections import Counter
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from src.utils.log_store import BodyStore, compact_bodies, export_json, migrate_legacy, read_entries  # noqa: E402
+from src.utils.logger import BODY_FILE, LEGACY_LOG_FILE, LOG_FILE  # noqa: E402
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("command", choices=["migrate", "export", "stats", "compact"])
+    parser.add_argument("--log", default=LOG_FILE, help="JSONL log file")
+    parser.add_argument("--legacy", default=LEGACY_LOG_FILE, help="Legacy JSON-array log file")
+    parser.add_argument("--bodies", default=BODY_FILE, help="Prompt/response store of the JSONL log")
+    parser.add_argument("--output", default=None, help="Output file for 'export'")
+    parser.add_argument("--min_age", type=float, default=3600.0,
+                        help="'compact' keeps texts used in the last N seconds (their entries may still be in flight)")
+    args = parser.parse_args()
+    # Only `migrate` writes texts; the other commands never create the store
+    bodies = BodyStore(args.bodies) if args.command == "migrate" or os.path.exists(args.bodies) else None
+
+    if args.command == "migrate":
+        count = migrate_legacy(args.legacy, args.log, bodies)
+        print(f"✅ {count} entries migrated from {args.legacy} to {args.log}")
+    elif args.command == "export":
+        output = args.output or os.path.splitext(args.log)[0] + ".export.json"
+        count = export_json(args.log, output, legacy_path=args.legacy, bodies=bodies)
+        print(f"✅ {count} entries exported to {output}")
+    elif args.command == "stats":
+        counts = Counter((e.get("agent"), e.get("status")) for e in read_entries(args.log, args.legacy))
+        for (agent, status), n in sorted(counts.items(), key=lambda kv: str(kv[0])):
+            print(f"{agent:<15} {status:<10} {n}")
+        print(f"Total: {sum(counts.values())}")
+        if bodies is None:
+            return
+        stats = bodies.stats()
+        print(f"Texts: {stats['bodies']} unique, {stats['raw_bytes'] / 1024:.0f} KiB raw, "
+              f"{stats['stored_bytes'] / 1024:.0f} KiB stored")
+    elif args.command == "compact":
+        if bodies is None:
+            print(f"Nothing to compact: {args.bodies} does not exist.")
+            return
+        count = compact_bodies(args.log, bodies, min_age=args.min_age)
+        print(f"✅ {count} unreferenced texts removed from {args.bodies}")
+
+
+if __name__ == "__main__":
+    main()
@@ -1,33 +1,136 @@
-import time
-import google.generativeai as genai
+import json
+import re
+from concurrent.futures import ThreadPoolExecutor
+from src.agents.base import BaseAgent
 from src.tools import read_file
+from src.utils.chunker import DEFAULT_CHUNK_CHARS, chunk_module
+from src.utils.console import bind_output
 from src.utils.logger import log_experiment, ActionType
+from src.utils.prepass import format_findings
+from src.utils.tokens import estimate_tokens
+from src.utils.tracing import bind_span, span
 
-class AuditorAgent:
+class AuditorAgent(BaseAgent):
     # MISE A JOUR ICI : On utilise le modèle 2.5 disponible dans votre liste
-    def __init__(self, google_api_key: str, model: str = "models/gemini-2.5-flash"):
-        self.model_name = model
-        genai.configure(api_key=google_api_key)
-        self.model = genai.GenerativeModel(self.model_name)
+    def __init__(self, google_api_key: str, model: str = "models/gemini-2.5-flash", chunk_chars: int = DEFAULT_CHUNK_CHARS):
+        super().__init__(google_api_key, model)
+        self.chunk_chars = chunk_chars  # au-delà, le fichier est découpé (AST) et audité en parallèle ; 0 = jamais
 
-    def analyze(self, file_path: str) -> str:
+    def analyze(self, file_path: str, findings: list = None, brief: bool = False) -> str:
+        """
+        findings: résultats de l'analyse statique locale (prepass), pour un prompt plus ciblé.
+        brief: audit allégé pour un fichier que l'analyse statique juge propre.
+        """
+        with span("audit", agent="AuditorAgent", file=file_path, brief=brief):
+            return self._analyze(file_path, findings, brief)
+
+    def _analyze(self, file_path: str, findings: list = None, brief: bool = False) -> str:
         code = read_file(file_path)
-        prompt = f"Analyze this code and list bugs:\n\n{code}"
-        
+        if self.chunk_chars and len(code) > self.chunk_chars:
+            chunks = chunk_module(code, self.chunk_chars)
+            if len(chunks) > 1:
+                return self._analyze_chunks(file_path, chunks, findings)
+        if brief:
+            return self._audit(
+                "Static analysis found no issue in this code. List only definite bugs, one line each, "
+                f"or answer 'No bugs found.'\n\n{code}"
+            )
+        return self._audit(f"{self._instructions(findings)}\n\n{code}")
+
+    @staticmethod
+    def _instructions(findings: list = None) -> str:
+        if not findings:
+            return "Analyze this code and list bugs:"
+        return (
+            "Analyze this code and list bugs. Static analysis already reported:\n"
+            f"{format_findings(findings)}\n"
+            "Confirm or dismiss each of these, add any other real bug, skip style remarks and be concise:"
+        )
+
+    def _analyze_chunks(self, file_path: str, chunks: list, findings: list = None) -> str:
+        """Audite chaque morceau en parallèle puis fusionne les analyses, dans l'ordre du fichier."""
+        print(f"🧩 {file_path}: {len(chunks)} chunks audited in parallel")
+
+        def audit_chunk(chunk):
+            local = [f for f in findings or [] if chunk["start"] <= f["line"] <= chunk["end"]]
+            prompt = (
+                f"This is an excerpt of {file_path} (lines {chunk['start']}-{chunk['end']}: "
+                f"{', '.join(chunk['names'])}). "
+                f"The context block only shows imports/globals it uses; report line numbers from the original file.\n"
+                f"{self._instructions(local)}\n\n"
+                f"{chunk['code']}"
+            )
+            return self._audit(prompt)
+
+        # Le sémaphore global limite toujours le nombre de requêtes simultanées
+        with ThreadPoolExecutor(max_workers=len(chunks)) as pool:
+            analyses = list(pool.map(bind_output(bind_span(audit_chunk)), chunks))
+
+        sections = []
+        for chunk, analysis in zip(chunks, analyses):
+            sections.append(f"## Lines {chunk['start']}-{chunk['end']} ({', '.join(chunk['names'])})\n{analysis or '<no analysis>'}")
+        return "\n\n".join(sections)
+
+    def analyze_batch(self, file_paths: list, token_budget: int = 8000, findings_by_path: dict = None) -> dict:
+        """
+        Audite plusieurs petits fichiers par requête (jusqu'à `token_budget` tokens de code par requête).
+        Retourne {chemin: analyse}. Les fichiers absents d'une réponse mal formée sont ré-audités un par un.
+        """
+        findings_by_path = findings_by_path or {}
+        batches, current, size = [], [], 0
+        for path in file_paths:
+            tokens = estimate_tokens(read_file(path))
+            if current and size + tokens > token_budget:
+                batches.append(current)
+                current, size = [], 0
+            current.append(path)
+            size += tokens
+        if current:
+            batches.append(current)
+
+        def run(batch):
+            parsed = self._audit_batch(batch, findings_by_path) if len(batch) > 1 else {}
+            for path in batch:
+                if not parsed.get(path):
+                    if len(batch) > 1:
+                        print(f"↩️ No batch analysis for {path}, auditing it alone.")
+                    parsed[path] = self.analyze(path, findings=findings_by_path.get(path))
+            return parsed
+
+        results = {}
+        # Le sémaphore global limite toujours le nombre de requêtes simultanées
+        with ThreadPoolExecutor(max_workers=max(1, len(batches))) as pool:
+            for parsed in pool.map(bind_output(bind_span(run)), batches):
+                results.update(parsed)
+        return results
+
+    def _audit_batch(self, batch: list, findings_by_path: dict) -> dict:
+        ids = {f"F{i + 1}": path for i, path in enumerate(batch)}
+        sections = []
+        for file_id, path in ids.items():
+            findings = findings_by_path.get(path)
+            notes = f"Static analysis already reported:\n{format_findings(findings)}\n" if findings else ""
+            sections.append(f"=== FILE {file_id}: {path} ===\n{notes}{read_file(path)}\n=== END {file_id} ===")
+        prompt = (
+            "Analyze each of the following Python files independently and list its bugs.\n"
+            "Answer ONLY with JSON of the form "
+            '{"files": [{"id": "F1", "analysis": "..."}, ...]} with one entry per file id.\n\n'
+            + "\n\n".join(sections)
+        )
+        with span("audit_batch", agent="AuditorAgent", files=len(batch)):
+            raw = self._audit(prompt)
+        return {ids[file_id]: analysis for file_id, analysis in _parse_batch_response(raw).items() if file_id in ids}
+
+    def _audit(self, prompt: str) -> str:
         analysis = ""
         status = "FAILURE"
         
-        # On garde la sécurité anti-crash (Retry)
-        for attempt in range(3):
-            try:
-                response = self.model.generate_content(prompt)
-                analysis = response.text
-                status = "SUCCESS"
-                break 
-            except Exception as e:
-                error_msg = str(e)
-                print(f"⚠️ Erreur ({error_msg}). Pause de 10s avant réessai {attempt+1}/3...")
-                time.sleep(10)
+        # Les réessais (backoff, quotas) sont gérés par le rate limiter partagé
+        try:
+            analysis = self._generate(prompt)
+            status = "SUCCESS"
+        except Exception as e:
+            print(f"⚠️ Erreur ({e}). Abandon de l'audit.")
 
         log_experiment(
             agent_name="AuditorAgent",
@@ -36,4 +139,27 @@ class AuditorAgent:
             details={"input_prompt": prompt, "output_response": analysis},
             status=status
         )
-        return analysis
\ No newline at end of file
+        return analysis
+
+
+def _parse_batch_response(raw: str) -> dict:
+    """{"F1": analysis, ...} from a batch answer; {} if it isn't the expected JSON."""
+    text = raw.strip()
+    match = re.search(r"\{.*\}", text, re.DOTALL)  # ignore fences/prose around the JSON object
+    if not match:
+        return {}
+    try:
+        data = json.loads(match.group(0))
+    except ValueError:
+        return {}
+    entries = data.get("files", []) if isinstance(data, dict) else []
+    parsed = {}
+    for entry in entries:
+        if not isinstance(entry, dict):
+            continue
+        analysis = entry.get("analysis")
+        if isinstance(analysis, list):
+            analysis = "\n".join(f"- {item}" for item in analysis)
+        if isinstance(analysis, str):
+            parsed[str(entry.get("id"))] = analysis
+    return parsed
@@ -0,0 +1,124 @@
+import os
+import time
+
+from src.utils.backends import get_backend
+from src.utils.cache import get_cache
+from src.utils.concurrency import gemini_slot
+from src.utils.rate_limiter import get_rate_limiter
+from src.utils.streaming import StreamAborted
+from src.utils.tokens import estimate_tokens
+from src.utils.tracing import add_counters, span
+
+
+class BaseAgent:
+    """Common model plumbing for the agents: backend selection, cached and streamed generation."""
+
+    def __init__(self, api_key: str, model: str = "models/gemini-2.5-flash", backend=None):
+        self.model_name = model
+        self.generation_config = None
+        # Shared backend (Gemini, or the local fake one for offline runs and benchmarks)
+        self.backend = backend or get_backend(api_key)
+        # Identity used by caches and the manifest, so results from different backends never mix
+        self.model_id = self.backend.cache_prefix + self.model_name
+
+    def _generate(self, prompt: str, use_cache: bool = True) -> str:
+        """
+        Return the model's text for `prompt`, served from the shared cache when possible
+        (use_cache=False always asks the model, e.g. when the cached answer proved wrong;
+        the new answer replaces it). Network calls go through the shared rate limiter,
+        which retries transient and quota errors; raises RetryError once it gives up.
+        """
+        cache = get_cache()
+        key = cache.make_key(self.model_id, prompt, self.generation_config)
+        cached = cache.get(key) if use_cache else None
+        if cached is not None:
+            add_counters(cache_hits=1)
+            return cached
+        add_counters(cache_misses=1)
+
+        def call():
+            with gemini_slot():
+                return self.backend.generate(self.model_name, prompt, self.generation_config)
+
+        prompt_tokens = estimate_tokens(prompt)
+        with span("llm_call", agent=type(self).__name__, model=self.model_name,
+                  backend=self.backend.name):
+            text = get_rate_limiter().call(
+                call,
+                prompt_tokens=prompt_tokens,
+                response_tokens=estimate_tokens,
+                on_retry=self._on_retry,
+            )
+            add_counters(llm_calls=1, prompt_tokens=prompt_tokens, response_tokens=estimate_tokens(text))
+        cache.put(key, text, self.model_id)
+        return text
+
+    def _generate_stream(self, prompt: str, make_checker, output_path: str = None) -> str:
+        """
+        Streamed variant of _generate() for code answers. `make_checker()` returns a fresh
+        CodeStreamChecker for each attempt; chunks are fed to it as they arrive (and appended to
+        `output_path`, if given). Reading stops as soon as the checker reports a complete module.
+        Returns the code; raises StreamAborted when the checker rejects the generation, and
+        RetryError like _generate().
+        """
+        cache = get_cache()
+        key = cache.make_key(self.model_id, prompt, self.generation_config)
+        cached = cache.get(key)
+        if cached is not None:
+            add_counters(cache_hits=1)
+            return cached
+        add_counters(cache_misses=1)
+
+        def call():
+            checker = make_checker()
+            if output_path and os.path.lexists(output_path):
+                os.remove(output_path)  # may be a hard link to a shared artifact blob: never write through it
+            sink = open(output_path, "w", encoding="utf-8") if output_path else None
+            chunks = self.backend.stream(self.model_name, prompt, self.generation_config)
+            try:
+                with gemini_slot():
+                    started = time.perf_counter()
+                    for chunk in chunks:
+                        if "first_chunk" not in llm_span.attrs:
+                            llm_span.attrs["first_chunk"] = round(time.perf_counter() - started, 6)
+                        if sink:
+                            sink.write(chunk)
+                            sink.flush()
+                        checker.feed(chunk)
+                        if checker.complete:
+                            add_counters(stream_early_stops=1)
+                            break
+            except StreamAborted as e:
+                # Not an API error: hand it over without going through the retry policy
+                return None, e
+            finally:
+                chunks.close()
+                if sink:
+                    sink.close()
+            return checker.code(), None
+
+        def received(result) -> str:
+            text, aborted = result
+            return text if aborted is None else aborted.text
+
+        prompt_tokens = estimate_tokens(prompt)
+        with span("llm_call", agent=type(self).__name__, model=self.model_name,
+                  backend=self.backend.name, stream=True) as llm_span:
+            result = get_rate_limiter().call(
+                call,
+                prompt_tokens=prompt_tokens,
+                response_tokens=lambda result: estimate_tokens(received(result)),
+                on_retry=self._on_retry,
+            )
+            text, aborted = result
+            add_counters(llm_calls=1, prompt_tokens=prompt_tokens, response_tokens=estimate_tokens(received(result)))
+            if aborted is not None:
+                add_counters(stream_aborts=1)
+                llm_span.attrs["aborted"] = aborted.reason
+                raise aborted
+        cache.put(key, text, self.model_id)
+        return text
+
+    def _on_retry(self, kind: str, delay: float, error: BaseException) -> None:
+        add_counters(retries=1)
+        print(f"⚠️ {type(self).__name__}: {kind} error ({error}). Retrying in {delay:.1f}s...")
@@ -1,15 +1,71 @@
-import time
-import google.generativeai as genai
+from src.agents.base import BaseAgent
 from src.utils.logger import log_experiment, ActionType
+from src.utils.tracing import span
+from src.utils.patching import PatchError, apply_unified_diff, is_valid_python, strip_code_fences
+from src.utils.streaming import CodeStreamChecker, StreamAborted
 
-class FixerAgent:
+class FixerAgent(BaseAgent):
     # MISE A JOUR ICI : On utilise le modèle 2.5
-    def __init__(self, api_key: str, model: str = "models/gemini-2.5-flash"):
-        self.model_name = model
-        genai.configure(api_key=api_key)
-        self.model = genai.GenerativeModel(self.model_name)
+    def __init__(self, api_key: str, model: str = "models/gemini-2.5-flash", patch_min_lines: int = 150,
+                 stream: bool = False):
+        super().__init__(api_key, model)
+        # À partir de ce nombre de lignes, on demande un diff plutôt que le fichier complet (0 = jamais)
+        self.patch_min_lines = patch_min_lines
+        # Fichier complet en streaming : vérifié au fil de l'eau, abandonné dès qu'il est manifestement faux
+        self.stream = stream
 
-    def fix(self, original_code: str, analysis_plan: str) -> str:
+    def fix(self, original_code: str, analysis_plan: str, output_path: str = None) -> str:
+        """output_path: in stream mode, the code is written there as it arrives (the caller writes the final code)."""
+        with span("fix", agent="FixerAgent", lines=original_code.count("\n") + 1):
+            return self._fix(original_code, analysis_plan, output_path)
+
+    def _fix(self, original_code: str, analysis_plan: str, output_path: str = None) -> str:
+        if self.patch_min_lines and original_code.count("\n") + 1 >= self.patch_min_lines:
+            patched = self._fix_with_patch(original_code, analysis_plan)
+            if patched is not None:
+                return patched
+            print("↩️ Patch rejected, falling back to full-file output.")
+        return self._fix_full(original_code, analysis_plan, output_path)
+
+    def _fix_with_patch(self, original_code: str, analysis_plan: str):
+        """Demande un diff unifié, l'applique et le valide localement. Retourne None si le patch est inutilisable."""
+        prompt = (
+            f"You are a Python expert. Fix the following code based on the analysis plan.\n"
+            f"PLAN:\n{analysis_plan}\n\n"
+            f"CODE:\n{original_code}\n\n"
+            f"Output ONLY a unified diff against CODE (@@ hunks with 3 lines of context), not the whole file. "
+            f"If no change is needed, output nothing."
+        )
+
+        diff = ""
+        patched = None
+        status = "FAILURE"
+        try:
+            diff = strip_code_fences(self._generate(prompt))
+            if not diff.strip():
+                patched = original_code
+            else:
+                candidate = apply_unified_diff(original_code, diff)
+                if is_valid_python(candidate) or not is_valid_python(original_code):
+                    patched = candidate
+                else:
+                    print("⚠️ Patched code is not valid Python.")
+            status = "SUCCESS" if patched is not None else "FAILURE"
+        except PatchError as e:
+            print(f"⚠️ Patch does not apply ({e}).")
+        except Exception as e:
+            print(f"⚠️ Erreur ({e}). Abandon du patch.")
+
+        log_experiment(
+            agent_name="FixerAgent",
+            model_used=self.model_name,
+            action=ActionType.FIX,
+            details={"input_prompt": prompt, "output_response": diff, "mode": "patch"},
+            status=status
+        )
+        return patched
+
+    def _fix_full(self, original_code: str, analysis_plan: str, output_path: str = None) -> str:
         prompt = (
             f"You are a Python expert. Fix the following code based on the analysis plan.\n"
             f"PLAN:\n{analysis_plan}\n\n"
@@ -20,17 +76,26 @@ class FixerAgent:
         fixed_code = ""
         status = "FAILURE"
 
-        for attempt in range(3):
-            try:
-                response = self.model.generate_content(prompt)
+        # Les réessais (backoff, quotas) sont gérés par le rate limiter partagé
+        try:
+            if self.stream:
+                # Une réponse bien plus longue que le fichier d'origine part en boucle : on coupe
+                fixed_code = strip_code_fences(self._generate_stream(
+                    prompt, lambda: CodeStreamChecker(max_chars=2 * len(original_code) + 2000), output_path))
+            else:
                 # Nettoyage automatique du markdown
-                fixed_code = response.text.replace("```python", "").replace("```", "").strip()
-                status = "SUCCESS"
-                break
-            except Exception as e:
-                error_msg = str(e)
-                print(f"⚠️ Erreur ({error_msg}). Pause de 10s avant réessai {attempt+1}/3...")
-                time.sleep(10)
+                fixed_code = strip_code_fences(self._generate(prompt))
+            status = "SUCCESS"
+            # Une réponse tronquée ne doit pas remplacer silencieusement du code valide
+            if not is_valid_python(fixed_code) and is_valid_python(original_code):
+                print("⚠️ Fixed code is not valid Python (truncated response?). Keeping the original code.")
+                fixed_code = original_code
+                status = "FAILURE"
+        except StreamAborted as e:
+            print(f"⚠️ Fix generation aborted early ({e}). Keeping the original code.")
+            fixed_code = original_code
+        except Exception as e:
+            print(f"⚠️ Erreur ({e}). Abandon du correctif.")
 
         log_experiment(
             agent_name="FixerAgent",
@@ -1,121 +1,318 @@
 import os
-import time
-import subprocess
 import shutil
-import google.generativeai as genai
+from src.agents.base import BaseAgent
+from src.utils.sandbox_runner import get_test_pool, slowest_tests, summarize
+from src.utils.artifacts import get_artifact_store
 from src.utils.logger import log_experiment, ActionType
+from src.utils.patching import strip_code_fences
+from src.utils.streaming import CodeStreamChecker, StreamAborted
+from src.utils.failures import compress_failures
+from src.utils.suite_cache import SuiteCache
+from src.utils.tracing import span
+from src.utils import convergence
 
-class JudgeAgent:
-    def __init__(self, api_key: str, model: str = "models/gemini-2.5-flash"):
-        self.model_name = model
-        genai.configure(api_key=api_key)
-        self.model = genai.GenerativeModel(self.model_name)
-        self._test_dir_cleared = False  # Delete test folder only once per program launch
+class JudgeAgent(BaseAgent):
+    def __init__(self, api_key: str, model: str = "models/gemini-2.5-flash", test_shards: int = 0,
+                 stable_tests: bool = False, patience: int = 2, stream: bool = False, failure_tokens: int = 1500):
+        super().__init__(api_key, model)
+        self.failure_tokens = failure_tokens  # budget of the failure report sent to the Fixer (0: raw test output)
+        self.stream = stream  # stream test generation: checked as it arrives, the run starts once the module is whole
+        self.patience = patience  # stop after this many iterations without improvement (0: never)
+        self.test_shards = test_shards  # > 1: split each generated suite across that many test workers
+        self.stable_tests = stable_tests  # generate the suite once per source file and reuse it
+        self.suite_cache = SuiteCache()
+        self.artifacts = get_artifact_store()  # iteration files are deduplicated, hard-linked blobs
 
-    def generate_tests(self, fixed_code: str) -> str:
+    def generate_tests(self, fixed_code: str, output_path: str = None, previous_error: str = None) -> str:
+        """
+        output_path: in stream mode, the tests are written there as they arrive.
+        previous_error: why the last suite for this code was rejected; the model is asked to avoid it,
+        and the answer never comes from the response cache.
+        """
+        with span("generate_tests", agent="JudgeAgent"):
+            return self._generate_tests(fixed_code, output_path, previous_error)
+
+    def _generate_tests(self, fixed_code: str, output_path: str = None, previous_error: str = None) -> str:
         prompt = (
             "You are a Python expert. Generate well-formed Python unit tests using the unittest module.\n"
-            "The tests should cover the functionality of the following code. Make sure the tests run without errors.\n\n"
+            "The tests should cover the functionality of the following code. Make sure the tests run without errors.\n"
+            "The code is saved as `fixed_code.py` next to the tests: import it from the `fixed_code` module.\n\n"
             f"CODE:\n{fixed_code}\n\n"
-            "Output ONLY the Python unittest code without markdown blocks."
         )
-        for attempt in range(3):
-            try:
-                response = self.model.generate_content(prompt)
-                # ✅ Remove markdown and control characters
-                test_code = response.text.replace("```python", "").replace("```", "").strip()
-                test_code = ''.join(ch for ch in test_code if ord(ch) >= 32 or ch in '\n\t')  # removes <ctrl63> and other control chars
-                return test_code
-            except Exception as e:
-                print(f"⚠️ Gemini test generation error ({e}). Retry {attempt+1}/3 in 10s...")
-                time.sleep(10)
+        if previous_error:
+            prompt += ("A previous test suite for this code was unusable:\n"
+                       f"{previous_error}\n"
+                       "Write a corrected suite that avoids this problem.\n\n")
+        prompt += "Output ONLY the Python unittest code without markdown blocks."
+        # Retries (backoff, quota) are handled by the shared rate limiter
+        try:
+            # ✅ Remove markdown and control characters
+            if self.stream and not previous_error:
+                raw = self._stream_tests(prompt, fixed_code, output_path)
+            else:
+                raw = self._generate(prompt, use_cache=not previous_error)
+            test_code = strip_code_fences(raw)
+            test_code = ''.join(ch for ch in test_code if ord(ch) >= 32 or ch in '\n\t')  # removes <ctrl63> and other control chars
+            return test_code
+        except Exception as e:
+            print(f"⚠️ Gemini test generation error ({e}).")
         return ""
 
-    def run_unit_tests(self, code_path: str, test_path: str) -> dict:
-        test_env = os.path.dirname(test_path)
-        os.environ["PYTHONPATH"] = test_env
-
+    def _stream_tests(self, prompt: str, fixed_code: str, output_path: str) -> str:
+        """Streamed generation; the module is complete at the unittest.main() guard, not at the end of the answer."""
         try:
-            result = subprocess.run(
-                ["python", "-m", "unittest", os.path.basename(test_path)],
-                capture_output=True,
-                text=True,
-                cwd=test_env
+            return self._generate_stream(
+                prompt,
+                lambda: CodeStreamChecker(max_chars=4 * len(fixed_code) + 20000,
+                                          complete_pattern=r"^\s+unittest\.main\(.*\)\s*$"),
+                output_path,
             )
-            output = result.stdout + "\n" + result.stderr
+        except StreamAborted as e:
+            # An empty suite would "pass": pay for one full, non-streamed answer instead
+            print(f"⚠️ Test generation aborted early ({e}), regenerating without streaming.")
+            return self._generate(prompt)
 
-            passed, failed = 0, 0
-            for line in output.splitlines():
-                line = line.strip()
-                if line and set(line).issubset({".", "F", "E"}):
-                    passed += line.count(".")
-                    failed += line.count("F") + line.count("E")
+    def _stable_suite(self, fixed_code: str, suite_key: str) -> str:
+        """Return the reusable suite for this source file, generating (and caching) it if needed."""
+        if suite_key:
+            cached = self.suite_cache.get(suite_key, self.model_id)
+            if cached:
+                print("♻️ Reusing cached test suite.")
+                return cached
+        return self._regenerate_suite(fixed_code, suite_key)
 
-            total = passed + failed
-            return {"total": total, "passed": passed, "failed": failed, "output": output}
+    def _regenerate_suite(self, fixed_code: str, suite_key: str, previous_error: str = None) -> str:
+        test_code = self.generate_tests(fixed_code, previous_error=previous_error)
+        if suite_key and test_code and _compiles(test_code):
+            self.suite_cache.put(suite_key, self.model_id, test_code)
+        return test_code
 
+    @staticmethod
+    def _suite_problem(test_code: str, fixed_code: str, results: dict):
+        """
+        Why the failure comes from the suite itself rather than the code under test (empty or
+        syntactically invalid suite, no test collected, or a load error while the code compiles),
+        or None if the suite is usable.
+        """
+        if not test_code.strip():
+            return "The suite was empty."
+        error = _syntax_error(test_code)
+        if error:
+            return f"The suite does not compile: {error}"
+        if results.get("load_error") and _compiles(fixed_code):
+            return "The suite could not be loaded:\n" + results.get("output", "").strip()[-1500:]
+        if results["total"] == 0:
+            return "No test case was collected from the suite."
+        return None
+
+    def run_unit_tests(self, code_path: str, test_path: str) -> dict:
+        """
+        Run the generated test module in a warm, isolated worker (per-test timeout, memory limit).
+        Returns {"total", "passed", "failed", "output", "tests", "load_error"}; "tests" holds one
+        {"id", "status", "duration", "traceback"} record per test case.
+        """
+        with span("test_run", shards=self.test_shards) as test_span:
+            results = self._run_unit_tests(test_path)
+            test_span.attrs.update(total=results["total"], failed=results["failed"])
+        return results
+
+    def _run_unit_tests(self, test_path: str) -> dict:
+        try:
+            pool = get_test_pool()
+            if self.test_shards > 1:
+                return summarize(pool.run_sharded(test_path, self.test_shards))
+            return summarize(pool.run(test_path))
         except Exception as e:
-            return {"total": 0, "passed": 0, "failed": 0, "output": f"<unit-test-run-error> {e}"}
+            return {"total": 0, "passed": 0, "failed": 0, "output": f"<unit-test-run-error> {e}", "tests": [], "load_error": False}
 
-    def judge(self, target_code_path: str, fixer_agent, max_iterations: int = 5, base_dir_override: str = None):
+    def judge(self, target_code_path: str, fixer_agent, max_iterations: int = 5, base_dir_override: str = None,
+              suite_key: str = None):
         """
         Main judge loop: generates tests, runs them, and asks fixer for new fixes if needed.
         base_dir_override: optional folder to store test iterations (used for sandbox per file)
+        suite_key: hash of the original source file; in stable_tests mode the suite is cached under it
+        Returns the path of the final code.
         """
+        return self.evaluate(target_code_path, fixer_agent, max_iterations, base_dir_override, suite_key)["final_path"]
+
+    def evaluate(self, target_code_path: str, fixer_agent, max_iterations: int = 5, base_dir_override: str = None,
+                 suite_key: str = None, resume: dict = None, on_iteration=None, guard=None) -> dict:
+        """
+        Same loop as judge(), but returns a verdict dict:
+        {"final_path", "passed", "iterations", "total", "failed", "stop_reason", "best_iteration"}
+        The loop stops early on a fixpoint, a cycle between candidates, or when the score stops
+        improving; the best-scoring tested candidate is kept, not the last one.
+        on_iteration(state): called after each iteration that leads to another one, with a
+        JSON-serializable state; passing that state back as `resume` continues the loop from there.
+        guard(): called before each iteration; whatever it raises abandons the loop (e.g. LeaseLost).
+        """
+        with span("judge", target=target_code_path) as judge_span:
+            verdict = self._evaluate(target_code_path, fixer_agent, max_iterations, base_dir_override, suite_key,
+                                     resume, on_iteration, guard)
+            judge_span.attrs.update(stop_reason=verdict["stop_reason"], iterations=verdict["iterations"])
+        return verdict
+
+    def _evaluate(self, target_code_path: str, fixer_agent, max_iterations: int, base_dir_override: str,
+                  suite_key: str, resume: dict = None, on_iteration=None, guard=None) -> dict:
         base_dir = base_dir_override if base_dir_override else os.path.join(os.path.dirname(target_code_path), "test")
 
-        # Delete test folder only once per program launch
-        if not self._test_dir_cleared and os.path.exists(base_dir):
+        # Delete the file's stale test folder from an earlier evaluation (a previous launch, or an earlier
+        # version of the file in watch mode), but never when resuming: it holds the earlier iterations.
+        # Only the links go away; unreferenced blobs are collected by ArtifactStore.gc().
+        if not resume and os.path.exists(base_dir):
             shutil.rmtree(base_dir)
-            self._test_dir_cleared = True
 
         os.makedirs(base_dir, exist_ok=True)
 
         current_code_path = target_code_path
-        for iteration in range(1, max_iterations + 1):
-            iter_dir = os.path.join(base_dir, f"iteration_{iteration}")
-            os.makedirs(iter_dir, exist_ok=True)
+        results = {"total": 0, "failed": 0}
+        tracker = convergence.ConvergenceTracker(self.patience)
+        stop_reason = convergence.STOP_MAX_ITERATIONS
+        iteration = 0
+        test_code = None  # stable_tests mode: one suite for every iteration
+        if resume:
+            iteration = resume["iteration"]
+            current_code_path = resume["code_path"]
+            tracker = convergence.ConvergenceTracker.from_state(resume["tracker"], self.patience)
+            test_code = resume.get("test_code")
+            print(f"↪️ Resuming the Judge loop after iteration {iteration}.")
+        for iteration in range(iteration + 1, max_iterations + 1):
+            if guard:
+                guard()
+            with span("iteration", n=iteration):
+                iter_dir = os.path.join(base_dir, f"iteration_{iteration}")
+                os.makedirs(iter_dir, exist_ok=True)
+
+                with open(current_code_path, "r") as f:
+                    fixed_code = f.read()
+
+                test_file_path = os.path.join(iter_dir, "generated_tests.py")
+                fixed_file_path = os.path.join(iter_dir, "fixed_code.py")
+                next_iter_file_path = os.path.join(iter_dir, "fixed_code_next_iter.py")
+                results_file_path = os.path.join(iter_dir, "test_results.txt")
+
+                # Overwrite any existing files
+                for path in [test_file_path, fixed_file_path, next_iter_file_path, results_file_path]:
+                    if os.path.exists(path):
+                        os.remove(path)
 
-            with open(current_code_path, "r") as f:
-                fixed_code = f.read()
+                if not self.stable_tests:
+                    test_code = self.generate_tests(fixed_code, output_path=test_file_path)
+                elif test_code is None:
+                    test_code = self._stable_suite(fixed_code, suite_key)
+                self.artifacts.write(test_file_path, test_code)
+                self.artifacts.write(fixed_file_path, fixed_code)
 
-            test_file_path = os.path.join(iter_dir, "generated_tests.py")
-            fixed_file_path = os.path.join(iter_dir, "fixed_code.py")
-            next_iter_file_path = os.path.join(iter_dir, "fixed_code_next_iter.py")
-            results_file_path = os.path.join(iter_dir, "test_results.txt")
+                results = self.run_unit_tests(fixed_file_path, test_file_path)
 
-            # Overwrite any existing files
-            for path in [test_file_path, fixed_file_path, next_iter_file_path, results_file_path]:
-                if os.path.exists(path):
-                    os.remove(path)
+                problem = self._suite_problem(test_code, fixed_code, results) if self.stable_tests else None
+                if problem:
+                    print("🔁 Test suite is broken (syntax/import error or no tests), regenerating it...")
+                    if suite_key:
+                        self.suite_cache.invalidate(suite_key, self.model_id)
+                    test_code = self._regenerate_suite(fixed_code, suite_key, previous_error=problem)
+                    self.artifacts.write(test_file_path, test_code)
+                    results = self.run_unit_tests(fixed_file_path, test_file_path)
+                report = slowest_tests(results.get("tests", []))
+                self.artifacts.write(results_file_path, results["output"] + ("\n\n" + report + "\n" if report else ""))
 
-            test_code = self.generate_tests(fixed_code)
-            with open(test_file_path, "w") as f:
-                f.write(test_code)
+                print(f"Iteration {iteration}: {results['total']} unit tests generated, {results['failed']} failed, {results['passed']} passed")
 
-            with open(fixed_file_path, "w") as f:
-                f.write(fixed_code)
+                if results["failed"] == 0 and results["total"] > 0:
+                    print("✅ All tests passed! Final fixed code accepted.")
+                    tracker.record(iteration, fixed_code, fixed_file_path, results)
+                    stop_reason = convergence.STOP_PASSED
+                    break
 
-            results = self.run_unit_tests(fixed_file_path, test_file_path)
-            with open(results_file_path, "w") as f:
-                f.write(results["output"])
+                stop = tracker.record(iteration, fixed_code, fixed_file_path, results)
+                if stop:
+                    print(f"⏹️ No improvement for {tracker.stall} iterations, stopping.")
+                    stop_reason = stop
+                    break
+                if iteration == max_iterations:
+                    break
+
+                if self.failure_tokens:
+                    analysis_plan = "The following unit tests failed:\n" + compress_failures(results, self.failure_tokens)
+                else:
+                    analysis_plan = f"The following unit tests failed:\n{results['output']}"
+                try:
+                    new_fixed_code = fixer_agent.fix(fixed_code, analysis_plan, output_path=next_iter_file_path)
+                except Exception as e:
+                    print(f"⚠️ FixerAgent failed to fix: {e}")
+                    stop_reason = convergence.STOP_FIXER_ERROR
+                    break
+                if not new_fixed_code.strip():
+                    print("⚠️ FixerAgent returned no code.")
+                    stop_reason = convergence.STOP_FIXER_ERROR
+                    break
+
+                self.artifacts.write(next_iter_file_path, new_fixed_code)
+
+                stop = tracker.check_candidate(new_fixed_code)
+                if stop:
+                    print(f"⏹️ Fixer {'returned the same code' if stop == convergence.STOP_FIXPOINT else 'went back to an earlier candidate'}, stopping.")
+                    stop_reason = stop
+                    break
+                current_code_path = next_iter_file_path
+                if on_iteration:
+                    on_iteration({"iteration": iteration, "code_path": current_code_path, "tracker": tracker.state(),
+                                  "test_code": test_code if self.stable_tests else None})
+
+        if stop_reason == convergence.STOP_MAX_ITERATIONS:
+            print(f"⚠️ Maximum iterations ({max_iterations}) reached. Final code may still have failing tests.")
+
+        best = tracker.best
+        if stop_reason == convergence.STOP_PASSED:
+            # The candidate that just passed, whatever the scores of earlier runs (with other suites) were
+            best = {"iteration": iteration, "path": fixed_file_path, "results": results}
+        elif best is None:
+            # Nothing was tested (max_iterations < 1): hand back the input unchanged
+            best = {"iteration": 0, "path": target_code_path, "results": results}
+        elif best["iteration"] != iteration:
+            print(f"🏆 Keeping candidate from iteration {best['iteration']} ({best['results']['failed']} failed).")
+
+        log_experiment(
+            agent_name="JudgeAgent",
+            model_used=self.model_name,
+            action=ActionType.DEBUG,
+            details={
+                "input_prompt": f"judge loop on {target_code_path}",
+                "output_response": f"stopped: {stop_reason}",
+                "stop_reason": stop_reason,
+                "iterations": iteration,
+                "best_iteration": best["iteration"],
+                "best_failed": best["results"].get("failed", 0),
+                "best_total": best["results"].get("total", 0),
+            },
+            status="SUCCESS" if stop_reason == convergence.STOP_PASSED else "FAILURE"
+        )
+        verdict = self._verdict(best["path"], stop_reason == convergence.STOP_PASSED, iteration, best["results"])
+        verdict["stop_reason"] = stop_reason
+        verdict["best_iteration"] = best["iteration"]
+        return verdict
 
-            print(f"Iteration {iteration}: {results['total']} unit tests generated, {results['failed']} failed, {results['passed']} passed")
+    @staticmethod
+    def _verdict(final_path: str, passed: bool, iterations: int, results: dict) -> dict:
+        return {
+            "final_path": final_path,
+            "passed": passed,
+            "iterations": iterations,
+            "total": results.get("total", 0),
+            "failed": results.get("failed", 0),
+        }
 
-            if results["failed"] == 0:
-                print("✅ All tests passed! Final fixed code accepted.")
-                return fixed_file_path
 
-            analysis_plan = f"The following unit tests failed:\n{results['output']}"
-            try:
-                new_fixed_code = fixer_agent.fix(fixed_code, analysis_plan)
-            except Exception as e:
-                print(f"⚠️ FixerAgent failed to fix: {e}")
-                return fixed_file_path
+def _syntax_error(code: str):
+    """The compile error of `code` as one line, or None if it compiles."""
+    try:
+        compile(code, "<generated>", "exec")
+        return None
+    except SyntaxError as e:
+        return f"{e.msg} (line {e.lineno}): {(e.text or '').strip()}"
+    except ValueError as e:
+        return str(e)
 
-            with open(next_iter_file_path, "w") as f:
-                f.write(new_fixed_code)
-            current_code_path = next_iter_file_path
 
-        print(f"⚠️ Maximum iterations ({max_iterations}) reached. Final code may still have failing tests.")
-        return current_code_path
+def _compiles(code: str) -> bool:
+    return _syntax_error(code) is None
@@ -0,0 +1,165 @@
+"""Content-addressed storage for sandbox artifacts.
+
+Iteration files (fixed_code.py, fixed_code_next_iter.py, generated_tests.py,
+test_results.txt) and the final outputs are written once as blobs under
+sandbox/.blobs/<sha256[:2]>/<sha256> and exposed at their usual paths as hard
+links. Identical content (the candidate carried over from one iteration to the
+next, a stable test suite, the final copy of the best candidate...) is stored
+and written only once, whatever the number of iterations.
+
+A blob's link count is its reference count: `gc()` deletes the blobs no view
+links to anymore, and `prune_iterations()` drops old iteration views per the
+retention policy. Blobs are read-only; views must be replaced (write() does
+that), never modified in place, or every view of the blob would change.
+Where hard links are not available (another filesystem, Windows without
+privileges), views fall back to plain copies.
+"""
+import hashlib
+import os
+import re
+import shutil
+import stat
+import tempfile
+import threading
+import time
+from typing import Union
+
+DEFAULT_BLOB_DIR = os.path.join("sandbox", ".blobs")
+
+_ITERATION_RE = re.compile(r"^iteration_(\d+)$")
+
+
+class ArtifactStore:
+    def __init__(self, blob_dir: str = DEFAULT_BLOB_DIR):
+        self.blob_dir = blob_dir
+        self.blobs_written = 0
+        self.bytes_written = 0
+        self.deduplicated = 0
+        self._lock = threading.Lock()
+
+    def _blob_path(self, digest: str) -> str:
+        return os.path.join(self.blob_dir, digest[:2], digest)
+
+    def put(self, content: Union[str, bytes]) -> str:
+        """Store `content` (if not already there) and return its sha256."""
+        data = content.encode("utf-8") if isinstance(content, str) else content
+        digest = hashlib.sha256(data).hexdigest()
+        path = self._blob_path(digest)
+        if os.path.exists(path):
+            with self._lock:
+                self.deduplicated += 1
+            return digest
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(path), prefix=".tmp-")
+        try:
+            with os.fdopen(fd, "wb") as f:
+                f.write(data)
+            os.chmod(tmp_path, stat.S_IRUSR | stat.S_IRGRP | stat.S_IROTH)
+            os.replace(tmp_path, path)  # concurrent writers of the same content just race to the same result
+        except BaseException:
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+            raise
+        with self._lock:
+            self.blobs_written += 1
+            self.bytes_written += len(data)
+        return digest
+
+    def link(self, digest: str, dest: str) -> None:
+        """Make `dest` a view of the blob, replacing whatever was there (atomically)."""
+        os.makedirs(os.path.dirname(dest) or ".", exist_ok=True)
+        tmp_dest = f"{dest}.tmp-{os.getpid()}-{threading.get_ident()}"
+        try:
+            os.link(self._blob_path(digest), tmp_dest)
+        except FileNotFoundError:
+            raise
+        except OSError:
+            shutil.copyfile(self._blob_path(digest), tmp_dest)  # no hard links here: plain copy
+        os.replace(tmp_dest, dest)
+
+    def write(self, dest: str, content: Union[str, bytes]) -> str:
+        """Store `content` and expose it at `dest`. Returns the digest."""
+        for _ in range(3):
+            digest = self.put(content)
+            try:
+                self.link(digest, dest)
+                return digest
+            except FileNotFoundError:
+                continue  # gc() removed the blob between put() and link(): store it again
+        raise OSError(f"could not link {dest} to its blob")
+
+    def copy(self, source: str, dest: str) -> str:
+        """`dest` becomes a view of the same content as `source`, without rewriting it if it is already a blob."""
+        with open(source, "rb") as f:
+            return self.write(dest, f.read())
+
+    def gc(self, min_age: float = 3600.0) -> dict:
+        """
+        Delete the blobs no view links to anymore (link count 1), if older than `min_age` seconds
+        (a blob that was just put() may not be linked yet). Returns {"removed", "freed", "kept"}.
+        """
+        removed = freed = kept = 0
+        now = time.time()
+        if not os.path.isdir(self.blob_dir):
+            return {"removed": 0, "freed": 0, "kept": 0}
+        for shard in os.scandir(self.blob_dir):
+            if not shard.is_dir():
+                continue
+            for entry in os.scandir(shard.path):
+                try:
+                    info = entry.stat()
+                except FileNotFoundError:
+                    continue
+                if info.st_nlink <= 1 and now - info.st_mtime >= min_age:
+                    try:
+                        os.remove(entry.path)
+                        removed += 1
+                        freed += info.st_size
+                    except FileNotFoundError:
+                        pass
+                else:
+                    kept += 1
+        return {"removed": removed, "freed": freed, "kept": kept}
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {"blobs_written": self.blobs_written, "bytes_written": self.bytes_written,
+                    "deduplicated": self.deduplicated}
+
+
+def prune_iterations(test_dir: str, keep: int) -> int:
+    """Keep only the `keep` most recent iteration_N views under `test_dir` (0: keep all). Returns how many were removed."""
+    if keep <= 0 or not os.path.isdir(test_dir):
+        return 0
+    iterations = sorted((int(m.group(1)), name) for name in os.listdir(test_dir)
+                        if (m := _ITERATION_RE.match(name)))
+    removed = 0
+    for _, name in iterations[:-keep]:
+        shutil.rmtree(os.path.join(test_dir, name), ignore_errors=True)
+        removed += 1
+    return removed
+
+
+def prune_sandbox(sandbox_dir: str, keep: int) -> int:
+    """prune_iterations() on every per-file test folder (sandbox/temp_<file>/test_<file>)."""
+    removed = 0
+    if not os.path.isdir(sandbox_dir):
+        return 0
+    for entry in os.scandir(sandbox_dir):
+        if entry.is_dir() and entry.name.startswith("temp_"):
+            for sub in os.scandir(entry.path):
+                if sub.is_dir() and sub.name.startswith("test_"):
+                    removed += prune_iterations(sub.path, keep)
+    return removed
+
+
+_store = None
+_store_lock = threading.Lock()
+
+
+def get_artifact_store() -> ArtifactStore:
+    global _store
+    with _store_lock:
+        if _store is None:
+            _store = ArtifactStore()
+        return _store
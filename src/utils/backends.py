@@ -0,0 +1,243 @@
+"""Model backends: where the agents' prompts actually go.
+
+`GeminiBackend` calls the Gemini API. `FakeBackend` answers locally, with a
+configurable latency distribution, injected 429/server errors and canned
+responses, so the whole pipeline can be run and benchmarked offline without
+spending quota. Agents get the process-wide backend from `get_backend()`.
+
+FakeBackend config (JSON file given with --fake_config, all keys optional):
+    {
+      "latency": "lognormal:1.0:0.5",          # seconds per call, see parse_latency()
+      "latency_by_model": {"models/gemini-2.5-flash-lite": "fixed:0.2"},
+      "seconds_per_token": 0.001,              # added per response token
+      "rate_limit_rate": 0.05,                 # share of calls failing with a 429
+      "error_rate": 0.01,                      # share of calls failing with a 503
+      "retry_after": 1.0,                      # retry delay hinted by injected 429s
+      "first_chunk_share": 0.3,                # streaming: share of the latency before the first chunk
+      "chunk_chars": 200,                      # streaming: characters per chunk
+      "responses": [{"match": "regex", "response": "text"}],
+      "seed": 42
+    }
+"""
+import json
+import math
+import os
+import random
+import re
+import threading
+import time
+from typing import Optional
+
+from src.utils.tokens import estimate_tokens
+
+GEMINI = "gemini"
+FAKE = "fake"
+BACKENDS = (GEMINI, FAKE)
+
+
+class GeminiBackend:
+    """Thin wrapper around google.generativeai; configures the client once and reuses the model objects."""
+
+    name = GEMINI
+    cache_prefix = ""  # keeps the keys of existing cache entries valid
+
+    def __init__(self, api_key: str):
+        import google.generativeai as genai  # heavy import, only paid when Gemini is actually used
+        genai.configure(api_key=api_key)
+        self._genai = genai
+        self._models = {}
+        self._lock = threading.Lock()
+
+    def _model(self, model_name: str):
+        with self._lock:
+            if model_name not in self._models:
+                self._models[model_name] = self._genai.GenerativeModel(model_name)
+            return self._models[model_name]
+
+    def generate(self, model_name: str, prompt: str, generation_config=None) -> str:
+        kwargs = {"generation_config": generation_config} if generation_config else {}
+        return self._model(model_name).generate_content(prompt, **kwargs).text
+
+    def stream(self, model_name: str, prompt: str, generation_config=None):
+        """Yield the response text chunk by chunk; closing the generator drops the rest of the response."""
+        kwargs = {"generation_config": generation_config} if generation_config else {}
+        for chunk in self._model(model_name).generate_content(prompt, stream=True, **kwargs):
+            yield chunk.text
+
+
+class FakeRateLimitError(Exception):
+    """Injected quota error; shaped like the API's so the rate limiter classifies it as QUOTA."""
+
+    code = 429
+
+    def __init__(self, retry_after: float):
+        super().__init__("429 Resource exhausted (injected by the fake backend)")
+        self.retry_after = retry_after
+
+
+class FakeServerError(Exception):
+    """Injected transient error, classified as RETRYABLE."""
+
+    code = 503
+
+    def __init__(self):
+        super().__init__("503 Service unavailable (injected by the fake backend)")
+
+
+def parse_latency(spec: str):
+    """
+    Turn a latency spec into a sampler taking a random.Random. Accepted forms:
+    "fixed:S", "uniform:MIN:MAX", "normal:MEAN:STDDEV", "lognormal:MEDIAN:SIGMA", "exp:MEAN".
+    Samples are never negative.
+    """
+    kind, *raw = str(spec).split(":")
+    try:
+        params = [float(p) for p in raw]
+        if kind == "fixed" and len(params) == 1:
+            return lambda rng: params[0]
+        if kind == "uniform" and len(params) == 2:
+            return lambda rng: rng.uniform(params[0], params[1])
+        if kind == "normal" and len(params) == 2:
+            return lambda rng: max(0.0, rng.gauss(params[0], params[1]))
+        if kind == "lognormal" and len(params) == 2 and params[0] > 0:
+            return lambda rng: rng.lognormvariate(math.log(params[0]), params[1])
+        if kind == "exp" and len(params) == 1 and params[0] > 0:
+            return lambda rng: rng.expovariate(1.0 / params[0])
+    except ValueError:
+        pass
+    raise ValueError(f"invalid latency spec: {spec!r}")
+
+
+class FakeBackend:
+    """Local stand-in for Gemini: plausible latency, injected failures and canned, pipeline-friendly answers."""
+
+    name = FAKE
+    cache_prefix = "fake/"  # fake answers must never be served to a real run
+
+    def __init__(self, latency: str = "fixed:0", latency_by_model: dict = None, seconds_per_token: float = 0.0,
+                 rate_limit_rate: float = 0.0, error_rate: float = 0.0, retry_after: float = 1.0,
+                 first_chunk_share: float = 0.3, chunk_chars: int = 200, responses: list = None,
+                 seed: Optional[int] = None):
+        self._latency = parse_latency(latency)
+        self._latency_by_model = {model: parse_latency(spec) for model, spec in (latency_by_model or {}).items()}
+        self.seconds_per_token = seconds_per_token
+        self.rate_limit_rate = rate_limit_rate
+        self.error_rate = error_rate
+        self.retry_after = retry_after
+        self.first_chunk_share = first_chunk_share
+        self.chunk_chars = max(1, chunk_chars)
+        self.responses = [(re.compile(r["match"], re.DOTALL), r["response"]) for r in (responses or [])]
+        self._rng = random.Random(seed)
+        self._lock = threading.Lock()
+        self.calls = 0
+        self.rate_limited = 0
+        self.failed = 0
+
+    @classmethod
+    def from_file(cls, path: Optional[str]) -> "FakeBackend":
+        if not path:
+            return cls()
+        with open(path, "r", encoding="utf-8") as f:
+            return cls(**json.load(f))
+
+    def _draw(self, model_name: str, text: str):
+        """Sample this call's latency and injected error (None if the call succeeds)."""
+        with self._lock:
+            self.calls += 1
+            sampler = self._latency_by_model.get(model_name, self._latency)
+            delay = sampler(self._rng) + self.seconds_per_token * estimate_tokens(text)
+            draw = self._rng.random()
+            if draw < self.rate_limit_rate:
+                self.rate_limited += 1
+                return delay, FakeRateLimitError(self.retry_after)
+            if draw < self.rate_limit_rate + self.error_rate:
+                self.failed += 1
+                return delay, FakeServerError()
+            return delay, None
+
+    def generate(self, model_name: str, prompt: str, generation_config=None) -> str:
+        text = self.respond(prompt)
+        delay, error = self._draw(model_name, text)
+        if error is not None:
+            # A rejected request comes back quickly
+            time.sleep(min(delay, 0.05))
+            raise error
+        time.sleep(delay)
+        return text
+
+    def stream(self, model_name: str, prompt: str, generation_config=None):
+        """Like generate(), but the text arrives in chunks spread over the sampled latency."""
+        text = self.respond(prompt)
+        delay, error = self._draw(model_name, text)
+        if error is not None:
+            time.sleep(min(delay, 0.05))
+            raise error
+        chunks = [text[i:i + self.chunk_chars] for i in range(0, len(text), self.chunk_chars)] or [""]
+        time.sleep(delay * self.first_chunk_share)
+        per_chunk = delay * (1 - self.first_chunk_share) / len(chunks)
+        for i, chunk in enumerate(chunks):
+            if i:
+                time.sleep(per_chunk)
+            yield chunk
+
+    def respond(self, prompt: str) -> str:
+        """The canned answer for `prompt`: the first matching configured response, else one shaped for the agent."""
+        for pattern, response in self.responses:
+            if pattern.search(prompt):
+                return response
+        if "list its bugs" in prompt and '"files"' in prompt:
+            ids = re.findall(r"^=== FILE (F\d+):", prompt, re.MULTILINE)
+            return json.dumps({"files": [{"id": i, "analysis": "No critical bugs found."} for i in ids]})
+        if "unified diff" in prompt:
+            return ""  # no change needed
+        if prompt.startswith("You are a Python expert. Fix"):
+            # Echo CODE back unchanged
+            return prompt.split("CODE:\n", 1)[-1].rsplit("\n\nOutput ONLY", 1)[0]
+        if "unit tests" in prompt and "fixed_code" in prompt:
+            return _fake_test_module(prompt.split("CODE:\n", 1)[-1])
+        return "No critical bugs found."
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {"calls": self.calls, "rate_limited": self.rate_limited, "failed": self.failed}
+
+
+def _fake_test_module(code: str) -> str:
+    """A small unittest module checking that fixed_code imports and defines the top-level names of `code`."""
+    names = re.findall(r"^(?:def|class) ([A-Za-z_]\w*)", code, re.MULTILINE)
+    lines = ["import unittest", "", "import fixed_code", "", "", "class TestFixedCode(unittest.TestCase):",
+             "    def test_module_loads(self):", "        self.assertIsNotNone(fixed_code)"]
+    for name in dict.fromkeys(names):
+        lines += ["", f"    def test_defines_{name}(self):", f"        self.assertTrue(hasattr(fixed_code, {name!r}))"]
+    lines += ["", "", "if __name__ == '__main__':", "    unittest.main()", ""]
+    return "\n".join(lines)
+
+
+_backend = None
+_backend_lock = threading.Lock()
+
+
+def _create_backend(name: str, api_key: str = None, fake_config: str = None):
+    if name == FAKE:
+        return FakeBackend.from_file(fake_config)
+    if name == GEMINI:
+        return GeminiBackend(api_key)
+    raise ValueError(f"unknown backend {name!r} (expected one of {', '.join(BACKENDS)})")
+
+
+def configure_backend(name: str = GEMINI, api_key: str = None, fake_config: str = None):
+    """Create the process-wide backend. Call once at startup, before building the agents."""
+    global _backend
+    backend = _create_backend(name, api_key, fake_config)
+    with _backend_lock:
+        _backend = backend
+    return backend
+
+
+def get_backend(api_key: str = None):
+    """The shared backend; created on first use from $IGL_BACKEND / $IGL_FAKE_CONFIG if not configured."""
+    global _backend
+    with _backend_lock:
+        if _backend is None:
+            _backend = _create_backend(os.getenv("IGL_BACKEND", GEMINI), api_key, os.getenv("IGL_FAKE_CONFIG"))
+        return _backend
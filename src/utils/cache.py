@@ -0,0 +1,152 @@
+"""Content-addressed on-disk cache for model responses.
+
+Entries are keyed by (model name, prompt, generation config) and stored as one
+small JSON file each under `cache_dir`. Writes go through a temporary file and
+`os.replace`, so several processes can share the same cache directory. A hit
+refreshes the entry's mtime, and the oldest entries are evicted once the cache
+grows past `max_bytes` (LRU by mtime).
+"""
+import hashlib
+import json
+import os
+import tempfile
+import threading
+import time
+from typing import Optional
+
+DEFAULT_CACHE_DIR = os.path.join(".cache", "gemini")
+DEFAULT_MAX_BYTES = 200 * 1024 * 1024
+
+
+class ResponseCache:
+    def __init__(self, cache_dir: str = DEFAULT_CACHE_DIR, max_bytes: int = DEFAULT_MAX_BYTES, enabled: bool = True):
+        self.cache_dir = cache_dir
+        self.max_bytes = max_bytes
+        self.enabled = enabled
+        self.hits = 0
+        self.misses = 0
+        self.writes = 0
+        self.evictions = 0
+        self._lock = threading.Lock()
+        self._approx_bytes = None  # computed lazily on the first write
+
+    @staticmethod
+    def make_key(model_name: str, prompt: str, generation_config=None) -> str:
+        config = json.dumps(generation_config, sort_keys=True, default=str)
+        digest = hashlib.sha256()
+        for part in (model_name, config, prompt):
+            digest.update(part.encode("utf-8"))
+            digest.update(b"\0")
+        return digest.hexdigest()
+
+    def _path(self, key: str) -> str:
+        return os.path.join(self.cache_dir, key[:2], f"{key}.json")
+
+    def get(self, key: str) -> Optional[str]:
+        """Return the cached text for `key`, or None on a miss."""
+        if not self.enabled:
+            return None
+        path = self._path(key)
+        try:
+            with open(path, "r", encoding="utf-8") as f:
+                text = json.load(f)["text"]
+        except (OSError, ValueError, KeyError):
+            with self._lock:
+                self.misses += 1
+            return None
+        try:
+            os.utime(path)  # mark as recently used
+        except OSError:
+            pass
+        with self._lock:
+            self.hits += 1
+        return text
+
+    def put(self, key: str, text: str, model_name: str = "") -> None:
+        if not self.enabled or not text:
+            return
+        path = self._path(key)
+        directory = os.path.dirname(path)
+        os.makedirs(directory, exist_ok=True)
+        payload = json.dumps({"model": model_name, "created": time.time(), "text": text}, ensure_ascii=False)
+        fd, tmp_path = tempfile.mkstemp(dir=directory, prefix=".tmp-", suffix=".json")
+        try:
+            with os.fdopen(fd, "w", encoding="utf-8") as f:
+                f.write(payload)
+            os.replace(tmp_path, path)
+        except BaseException:
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+            raise
+
+        with self._lock:
+            self.writes += 1
+            if self._approx_bytes is None:
+                self._approx_bytes = self._scan_size()
+            else:
+                self._approx_bytes += len(payload.encode("utf-8"))
+            over_budget = self._approx_bytes > self.max_bytes
+        if over_budget:
+            self.evict()
+
+    def _entries(self):
+        for root, _dirs, files in os.walk(self.cache_dir):
+            for fname in files:
+                if not fname.endswith(".json") or fname.startswith(".tmp-"):
+                    continue
+                path = os.path.join(root, fname)
+                try:
+                    st = os.stat(path)
+                except OSError:
+                    continue  # removed by another process
+                yield path, st.st_mtime, st.st_size
+
+    def _scan_size(self) -> int:
+        return sum(size for _path, _mtime, size in self._entries())
+
+    def evict(self) -> None:
+        """Remove least recently used entries until the cache fits in `max_bytes`."""
+        entries = sorted(self._entries(), key=lambda e: e[1])
+        total = sum(size for _path, _mtime, size in entries)
+        # Leave some headroom so we don't rescan on every write
+        target = int(self.max_bytes * 0.9)
+        removed = 0
+        for path, _mtime, size in entries:
+            if total <= target:
+                break
+            try:
+                os.remove(path)
+                removed += 1
+            except OSError:
+                pass
+            total -= size
+        with self._lock:
+            self.evictions += removed
+            self._approx_bytes = total
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {"hits": self.hits, "misses": self.misses, "writes": self.writes, "evictions": self.evictions}
+
+
+_cache = None
+_cache_lock = threading.Lock()
+
+
+def configure_cache(enabled: bool = True, cache_dir: Optional[str] = None, max_bytes: Optional[int] = None) -> ResponseCache:
+    """Replace the shared cache. Call before the agents start generating."""
+    global _cache
+    with _cache_lock:
+        _cache = ResponseCache(
+            cache_dir or os.getenv("IGL_CACHE_DIR", DEFAULT_CACHE_DIR),
+            max_bytes if max_bytes is not None else int(os.getenv("IGL_CACHE_MAX_BYTES", str(DEFAULT_MAX_BYTES))),
+            enabled=enabled,
+        )
+        return _cache
+
+
+def get_cache() -> ResponseCache:
+    """Return the shared cache, created with default settings on first use."""
+    if _cache is None:
+        return configure_cache()
+    return _cache
@@ -0,0 +1,146 @@
+"""AST-driven splitting of a Python module into independently auditable chunks.
+
+Each top-level function and class is a unit (oversized classes are split per
+method under their class header); remaining module-level statements form one
+more unit. Consecutive units are packed into chunks of at most `max_chars`,
+and every chunk is prefixed with only the imports and global assignments its
+code actually refers to. Imports and assignments no unit refers to belong to
+the module-level unit, so every statement is audited somewhere.
+"""
+import ast
+from typing import List, Set
+
+DEFAULT_CHUNK_CHARS = 12000  # also the default of main.py --audit_chunk_chars
+
+
+def _start_line(node: ast.AST) -> int:
+    decorators = getattr(node, "decorator_list", [])
+    return min([node.lineno] + [d.lineno for d in decorators])
+
+
+def _names_used(nodes) -> Set[str]:
+    names = set()
+    for node in nodes:
+        for sub in ast.walk(node):
+            if isinstance(sub, ast.Name):
+                names.add(sub.id)
+            elif isinstance(sub, ast.Attribute):
+                root = sub
+                while isinstance(root, ast.Attribute):
+                    root = root.value
+                if isinstance(root, ast.Name):
+                    names.add(root.id)
+    return names
+
+
+def _names_bound(node: ast.AST) -> Set[str]:
+    if isinstance(node, (ast.Import, ast.ImportFrom)):
+        return {(alias.asname or alias.name).split(".")[0] for alias in node.names}
+    targets = []
+    if isinstance(node, ast.Assign):
+        targets = node.targets
+    elif isinstance(node, (ast.AnnAssign, ast.AugAssign)):
+        targets = [node.target]
+    return {n.id for t in targets for n in ast.walk(t) if isinstance(n, ast.Name)}
+
+
+class _Unit:
+    def __init__(self, name: str, nodes: list, start: int, end: int, text: str):
+        self.name = name
+        self.nodes = nodes
+        self.start = start
+        self.end = end
+        self.text = text
+
+
+def _segment(lines: List[str], start: int, end: int) -> str:
+    return "".join(lines[start - 1:end])
+
+
+def _units(tree: ast.Module, lines: List[str], max_chars: int, context_ids: Set[int]) -> List[_Unit]:
+    units = []
+    loose = []
+    for node in tree.body:
+        if id(node) in context_ids:
+            continue
+        if isinstance(node, (ast.FunctionDef, ast.AsyncFunctionDef, ast.ClassDef)):
+            start, end = _start_line(node), node.end_lineno
+            text = _segment(lines, start, end)
+            if isinstance(node, ast.ClassDef) and len(text) > max_chars:
+                units.extend(_split_class(node, lines))
+            else:
+                units.append(_Unit(node.name, [node], start, end, text))
+        else:
+            loose.append(node)
+    if loose:
+        text = "".join(_segment(lines, _start_line(n), n.end_lineno) for n in loose)
+        units.append(_Unit("<module-level code>", loose, _start_line(loose[0]), loose[-1].end_lineno, text))
+    return units
+
+
+def _split_class(node: ast.ClassDef, lines: List[str]) -> List[_Unit]:
+    """One unit per method, each carrying the class header and class-level attributes."""
+    methods = [n for n in node.body if isinstance(n, (ast.FunctionDef, ast.AsyncFunctionDef))]
+    if not methods:
+        # Nothing to split on (e.g. a large table of constants): the class stays one, oversized, unit
+        start, end = _start_line(node), node.end_lineno
+        return [_Unit(node.name, [node], start, end, _segment(lines, start, end))]
+    header_end = _start_line(methods[0]) - 1
+    attributes = [n for n in node.body if not isinstance(n, (ast.FunctionDef, ast.AsyncFunctionDef))]
+    header = _segment(lines, _start_line(node), header_end)
+    header += "".join(_segment(lines, _start_line(a), a.end_lineno) for a in attributes if a.lineno > header_end)
+    units = []
+    for method in methods:
+        start, end = _start_line(method), method.end_lineno
+        text = header + "    ...\n" + _segment(lines, start, end)
+        units.append(_Unit(f"{node.name}.{method.name}", [method] + attributes, start, end, text))
+    return units
+
+
+def chunk_module(code: str, max_chars: int = DEFAULT_CHUNK_CHARS) -> List[dict]:
+    """
+    Split `code` into chunks: [{"names", "start", "end", "code"}], lines are 1-based.
+    Code that does not parse, or that fits in one chunk, comes back as a single chunk.
+    """
+    whole = [{"names": ["<module>"], "start": 1, "end": code.count("\n") + 1, "code": code}]
+    if len(code) <= max_chars:
+        return whole
+    try:
+        tree = ast.parse(code)
+    except SyntaxError:
+        return whole
+
+    lines = code.splitlines(keepends=True)
+    context = [n for n in tree.body if isinstance(n, (ast.Import, ast.ImportFrom, ast.Assign, ast.AnnAssign))]
+    # Context only reaches a prompt through the code using it: what nothing uses is module-level code
+    context_ids = {id(n) for n in context}
+    used = _names_used(n for n in tree.body if id(n) not in context_ids)
+    context = [n for n in context if _names_bound(n) & used]
+    units = _units(tree, lines, max_chars, {id(n) for n in context})
+    if not units:
+        return whole
+
+    # Pack consecutive units into chunks of roughly max_chars
+    groups, current, size = [], [], 0
+    for unit in units:
+        if current and size + len(unit.text) > max_chars:
+            groups.append(current)
+            current, size = [], 0
+        current.append(unit)
+        size += len(unit.text)
+    if current:
+        groups.append(current)
+
+    chunks = []
+    for group in groups:
+        used = _names_used(n for unit in group for n in unit.nodes)
+        needed = [n for n in context if _names_bound(n) & used]
+        header = "".join(_segment(lines, _start_line(n), n.end_lineno) for n in needed)
+        body = "\n".join(unit.text for unit in group)
+        chunks.append({
+            "names": [unit.name for unit in group],
+            "start": min(unit.start for unit in group),
+            "end": max(unit.end for unit in group),
+            "code": (f"# --- context (imports/globals) ---\n{header}# --- end context ---\n\n" if header else "") + body,
+        })
+    return chunks
@@ -0,0 +1,27 @@
+"""Process-wide limits shared by every agent when files are processed concurrently."""
+import threading
+from contextlib import contextmanager
+
+DEFAULT_MAX_INFLIGHT = 4
+
+_max_inflight = DEFAULT_MAX_INFLIGHT
+_gemini_semaphore = threading.BoundedSemaphore(DEFAULT_MAX_INFLIGHT)
+
+
+def set_max_inflight(n: int) -> None:
+    """Set the global cap on in-flight Gemini requests. Call before starting workers."""
+    global _gemini_semaphore, _max_inflight
+    _max_inflight = max(1, n)
+    _gemini_semaphore = threading.BoundedSemaphore(_max_inflight)
+
+
+def get_max_inflight() -> int:
+    return _max_inflight
+
+
+@contextmanager
+def gemini_slot():
+    """Hold one of the global Gemini request slots for the duration of the block."""
+    semaphore = _gemini_semaphore
+    with semaphore:
+        yield
@@ -0,0 +1,69 @@
+"""Per-thread capture of console output.
+
+Agents print their progress with plain `print`. When several files are
+processed by worker threads, `capture_output` redirects what one thread prints
+into its own buffer so the main thread can replay it file by file, in order.
+"""
+import io
+import sys
+import threading
+from contextlib import contextmanager
+
+
+class _ThreadLocalStdout(io.TextIOBase):
+    def __init__(self, default):
+        self._default = default
+        self._local = threading.local()
+
+    def _target(self):
+        return getattr(self._local, "buffer", None) or self._default
+
+    def write(self, s):
+        return self._target().write(s)
+
+    def flush(self):
+        self._target().flush()
+
+    @property
+    def encoding(self):
+        return getattr(self._default, "encoding", "utf-8")
+
+
+_install_lock = threading.Lock()
+
+
+def _install() -> _ThreadLocalStdout:
+    with _install_lock:
+        if not isinstance(sys.stdout, _ThreadLocalStdout):
+            sys.stdout = _ThreadLocalStdout(sys.stdout)
+        return sys.stdout
+
+
+@contextmanager
+def capture_output():
+    """Collect everything the current thread prints. Yields the `io.StringIO` buffer."""
+    proxy = _install()
+    buffer = io.StringIO()
+    previous = getattr(proxy._local, "buffer", None)
+    proxy._local.buffer = buffer
+    try:
+        yield buffer
+    finally:
+        proxy._local.buffer = previous
+
+
+def bind_output(fn):
+    """Wrap `fn` so that, run on another thread, it prints into the calling thread's capture buffer."""
+    proxy = sys.stdout
+    buffer = getattr(proxy._local, "buffer", None) if isinstance(proxy, _ThreadLocalStdout) else None
+    if buffer is None:
+        return fn
+
+    def wrapper(*args, **kwargs):
+        previous = getattr(proxy._local, "buffer", None)
+        proxy._local.buffer = buffer
+        try:
+            return fn(*args, **kwargs)
+        finally:
+            proxy._local.buffer = previous
+    return wrapper
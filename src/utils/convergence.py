@@ -0,0 +1,72 @@
+"""Early-stopping bookkeeping for the Judge/Fixer loop."""
+import hashlib
+from typing import Optional
+
+STOP_PASSED = "passed"
+STOP_FIXPOINT = "fixpoint"          # the fixer returned the code it was given
+STOP_CYCLE = "cycle"                # the fixer returned a candidate already tested
+STOP_NO_PROGRESS = "no_progress"    # the score did not improve for `patience` iterations
+STOP_FIXER_ERROR = "fixer_error"
+STOP_MAX_ITERATIONS = "max_iterations"
+
+
+def fingerprint(code: str) -> str:
+    return hashlib.sha256(code.strip().encode("utf-8")).hexdigest()
+
+
+def score(results: dict) -> tuple:
+    """
+    Higher is better: pass rate first (comparable across suites of different sizes), then fewer failures.
+    A run where no test could be collected proves nothing and ranks below any run with tests.
+    """
+    total = results.get("total", 0)
+    if not total:
+        return (-1.0, 0)
+    return (results.get("passed", 0) / total, -results.get("failed", 0))
+
+
+class ConvergenceTracker:
+    def __init__(self, patience: int = 2):
+        self.patience = patience  # 0 disables the no-progress check
+        self.seen = {}            # fingerprint -> iteration where it was tested
+        self.last = None
+        self.best = None          # {"iteration", "path", "results", "score"}
+        self.stall = 0
+
+    def record(self, iteration: int, code: str, path: str, results: dict) -> Optional[str]:
+        """Register a tested candidate. Returns STOP_NO_PROGRESS when the loop should stop."""
+        self.last = fingerprint(code)
+        self.seen.setdefault(self.last, iteration)
+        current = score(results)
+        if self.best is None or current > self.best["score"]:
+            self.best = {"iteration": iteration, "path": path, "results": results, "score": current}
+            self.stall = 0
+        else:
+            self.stall += 1
+        if self.patience and self.stall >= self.patience:
+            return STOP_NO_PROGRESS
+        return None
+
+    def state(self) -> dict:
+        """JSON-serializable snapshot, to resume the loop in another process (see from_state)."""
+        return {"seen": self.seen, "last": self.last, "best": self.best, "stall": self.stall}
+
+    @classmethod
+    def from_state(cls, state: dict, patience: int = 2) -> "ConvergenceTracker":
+        tracker = cls(patience)
+        tracker.seen = dict(state.get("seen", {}))
+        tracker.last = state.get("last")
+        tracker.best = state.get("best")
+        if tracker.best:
+            tracker.best = dict(tracker.best, score=tuple(tracker.best["score"]))  # JSON turned it into a list
+        tracker.stall = state.get("stall", 0)
+        return tracker
+
+    def check_candidate(self, code: str) -> Optional[str]:
+        """Inspect the fixer's next candidate before testing it: STOP_FIXPOINT, STOP_CYCLE or None."""
+        fp = fingerprint(code)
+        if fp == self.last:
+            return STOP_FIXPOINT
+        if fp in self.seen:
+            return STOP_CYCLE
+        return None
@@ -0,0 +1,179 @@
+"""Compact failure reports for the Fixer, built from the structured per-test results of a run.
+
+Instead of the raw unittest output, the Fixer gets:
+- one line with the counts,
+- failing tests grouped by failure (same exception, same frames in the code
+  under test), each group shown once with the ids of the tests it covers,
+- tracebacks trimmed to the frames in the code under test, plus the test line
+  that triggered them,
+all within a token budget (local estimate), so the prompt stays bounded
+however many tests fail.
+"""
+import os
+import re
+from typing import List
+
+from src.utils.tokens import CHARS_PER_TOKEN, estimate_tokens
+
+FAILING = ("failed", "error", "timeout")
+
+_FRAME_RE = re.compile(r'^  File "(?P<file>[^"]+)", line (?P<line>\d+), in (?P<func>.+)$')
+_NUMBER_RE = re.compile(r"\b\d+(\.\d+)?\b")
+_QUOTED_RE = re.compile(r"'[^']*'|\"[^\"]*\"")
+
+MAX_MESSAGE_LINES = 12
+MAX_LINE_CHARS = 300
+OMITTED_NOTE_TOKENS = 12  # room kept for the "N more distinct failure(s) omitted." line
+
+
+def _short_id(test_id: str) -> str:
+    # generated_tests.TestFoo.test_bar -> TestFoo.test_bar
+    parts = test_id.split(".")
+    return ".".join(parts[-2:]) if len(parts) > 2 else test_id
+
+
+def parse_traceback(text: str):
+    """
+    Split a formatted traceback into (frames, message). Only the last exception of a
+    chain is kept. frames: [(file, line, func, source)]; message: the exception lines.
+    """
+    lines = text.rstrip().splitlines()
+    starts = [i for i, line in enumerate(lines) if line.startswith("Traceback (most recent call last)")]
+    if starts:
+        lines = lines[starts[-1] + 1:]
+    frames = []
+    i = 0
+    while i < len(lines):
+        match = _FRAME_RE.match(lines[i])
+        if not match:
+            break
+        source = []
+        i += 1
+        while i < len(lines) and lines[i].startswith("    "):
+            source.append(lines[i].strip())
+            i += 1
+        frames.append((match.group("file"), int(match.group("line")), match.group("func"),
+                       " ".join(s for s in source if s.strip("^~ "))))
+    return frames, lines[i:]
+
+
+def trim_frames(frames: list, code_file: str, test_file: str) -> list:
+    """Keep the frames in the code under test, and the last test-file frame that led into them."""
+    kept = []
+    last_test = None
+    for frame in frames:
+        name = os.path.basename(frame[0])
+        if name == code_file:
+            if last_test is not None and not kept:
+                kept.append(last_test)
+            kept.append(frame)
+        elif name == test_file:
+            last_test = frame
+    if not kept and last_test is not None:
+        kept.append(last_test)  # failure raised in the test itself (e.g. an assertion)
+    return kept
+
+
+def _format_message(message: List[str]) -> List[str]:
+    shown = [line if len(line) <= MAX_LINE_CHARS else line[:MAX_LINE_CHARS] + " ..." for line in message]
+    if len(shown) > MAX_MESSAGE_LINES:
+        shown = shown[:MAX_MESSAGE_LINES] + [f"... ({len(message) - MAX_MESSAGE_LINES} more lines)"]
+    return shown
+
+
+def _signature(frames: list, message: List[str], code_file: str) -> tuple:
+    """Failures with the same exception type, shape of message and frames in the code under test are one group."""
+    exception = message[0].split(":", 1)[0] if message else ""
+    text = _NUMBER_RE.sub("N", _QUOTED_RE.sub("S", " ".join(message)))
+    in_code = tuple((f[1], f[2]) for f in frames if os.path.basename(f[0]) == code_file)
+    return (exception, in_code) if in_code else (exception, text)
+
+
+def group_failures(tests: list, code_file: str = "fixed_code.py", test_file: str = "generated_tests.py") -> list:
+    """Failing tests grouped by signature, largest groups first: [{"ids", "status", "frames", "message"}]."""
+    groups = {}
+    for test in tests:
+        if test["status"] not in FAILING:
+            continue
+        frames, message = parse_traceback(test.get("traceback", ""))
+        frames = trim_frames(frames, code_file, test_file)
+        key = (test["status"],) + _signature(frames, message, code_file)
+        group = groups.setdefault(key, {"ids": [], "status": test["status"], "frames": frames, "message": message})
+        group["ids"].append(_short_id(test["id"]))
+    return sorted(groups.values(), key=lambda g: -len(g["ids"]))
+
+
+def _format_group(number: int, group: dict, max_ids: int = 8) -> str:
+    ids = group["ids"]
+    listed = ", ".join(ids[:max_ids]) + (f", ... (+{len(ids) - max_ids})" if len(ids) > max_ids else "")
+    lines = [f"[{number}] {group['status'].upper()} in {len(ids)} test(s): {listed}"]
+    for file, line, func, source in group["frames"]:
+        lines.append(f"  {os.path.basename(file)}, line {line}, in {func}")
+        if source:
+            lines.append(f"    {source}")
+    lines += ["  " + line for line in _format_message(group["message"])]
+    return "\n".join(lines)
+
+
+def compress_failures(results: dict, token_budget: int = 1500, code_file: str = "fixed_code.py",
+                      test_file: str = "generated_tests.py") -> str:
+    """Bounded summary of the failures in `results` (as returned by sandbox_runner.summarize)."""
+    tests = results.get("tests", [])
+    groups = group_failures(tests, code_file, test_file)
+    counts = {status: sum(1 for t in tests if t["status"] == status) for status in FAILING}
+    breakdown = ", ".join(f"{n} {status}" for status, n in counts.items() if n)
+    header = (f"{results.get('failed', 0)} of {results.get('total', 0)} tests failed"
+              + (f" ({breakdown})" if breakdown else "") + (", distinct failures below." if groups else "."))
+    if results.get("load_error"):
+        header = "The test module could not be loaded (import or syntax error); fix this first.\n" + header
+
+    parts = [header]
+    used = estimate_tokens(header)
+    omitted = []
+    # Each part costs its own estimate plus one token for the blank line joining it to the previous one
+    for number, group in enumerate(groups, start=1):
+        text = _format_group(number, group)
+        cost = estimate_tokens(text) + 1
+        # Room for the note on omitted groups, unless this is the last group and none was omitted
+        reserve = OMITTED_NOTE_TOKENS if number < len(groups) or omitted else 0
+        if used + cost + reserve <= token_budget:
+            parts.append(text)
+            used += cost
+        elif len(parts) == 1:
+            # Always show at least one failure, cut to what the budget allows
+            parts.append(text[:max(0, (token_budget - used - reserve - 1) * CHARS_PER_TOKEN - 6)] + "\n  ...")
+            used += estimate_tokens(parts[-1]) + 1
+        else:
+            omitted.append(group)
+    if omitted:
+        ids = [test_id for group in omitted for test_id in group["ids"]]
+        note = f"{len(omitted)} more distinct failure(s) omitted"
+        room = (token_budget - used - 1) * CHARS_PER_TOKEN - len(note) - 1
+        listed = ", in: " + ", ".join(ids)
+        if room > 40:
+            note += listed if len(listed) <= room else listed[:room - 4] + " ..."
+        parts.append(note + ".")
+        used += estimate_tokens(parts[-1]) + 1
+
+    if not groups and results.get("output"):
+        # No per-test records (the run itself failed): fall back to the end of the raw output
+        room = (token_budget - used - 1) * CHARS_PER_TOKEN
+        if room > 0:
+            parts.append(results["output"].strip()[-room:])
+            used += estimate_tokens(parts[-1]) + 1
+
+    captured = (results.get("captured") or "").strip()
+    room = (token_budget - used - 1) * CHARS_PER_TOKEN
+    if captured and room > 200:
+        # Tail of what the code printed: the most recent output is usually the relevant part
+        title = "Captured output (tail):\n"
+        parts.append(title + captured[-min(room - len(title), 2000):])
+    return _fit("\n\n".join(parts), token_budget)
+
+
+def _fit(text: str, token_budget: int) -> str:
+    """Last resort (budget smaller than the header...): cut `text` so its estimate stays within the budget."""
+    if estimate_tokens(text) <= token_budget:
+        return text
+    marker = "\n..."
+    return text[:max(0, token_budget * CHARS_PER_TOKEN - len(marker))] + marker
@@ -0,0 +1,347 @@
+"""Append-only JSONL storage for the experiment log.
+
+Entries are queued in memory and written in batches by a background thread,
+so the cost of `append` does not depend on the size of the history. The
+active file is rotated once it grows past `max_bytes`. `read_entries` also
+understands the legacy `experiment_data.json` array format.
+
+With a `BodyStore`, the large text fields of an entry (prompts and responses,
+which embed whole source files and test outputs) are stored once, compressed
+and keyed by their sha256, in a SQLite sidecar; the JSONL entry keeps only
+their digests under "bodies". `read_entries`/`query_entries` given the same
+store put the texts back.
+"""
+import json
+import os
+import sqlite3
+import threading
+import time
+import zlib
+from contextlib import contextmanager
+from hashlib import sha256
+from typing import Iterable, Iterator, List, Optional
+
+BODY_FIELDS = ("input_prompt", "output_response")
+
+_BODY_SCHEMA = """
+CREATE TABLE IF NOT EXISTS bodies (
+    digest TEXT PRIMARY KEY,
+    size INTEGER NOT NULL,
+    data BLOB NOT NULL,
+    last_seen REAL NOT NULL
+);
+"""
+
+
+class BodyStore:
+    """Content-addressed, zlib-compressed storage for the prompt/response texts of log entries."""
+
+    def __init__(self, path: str, min_chars: int = 256, level: int = 6):
+        """min_chars: shorter texts stay inline in the entry (a reference would not save anything)."""
+        self.path = path
+        self.min_chars = min_chars
+        self.level = level
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        with self._connect() as db:
+            db.execute("PRAGMA journal_mode=WAL")
+            db.executescript(_BODY_SCHEMA)
+
+    @contextmanager
+    def _connect(self):
+        db = sqlite3.connect(self.path, timeout=30.0, isolation_level=None)
+        try:
+            yield db
+        finally:
+            db.close()
+
+    def detach(self, entry: dict, bodies: dict) -> dict:
+        """
+        Copy of `entry` whose large BODY_FIELDS are replaced by their digests (entry["bodies"]).
+        The texts are added to `bodies` ({digest: text}) for put().
+        """
+        details = entry.get("details")
+        if not isinstance(details, dict):
+            return entry
+        refs = {}
+        for field in BODY_FIELDS:
+            text = details.get(field)
+            if isinstance(text, str) and len(text) >= self.min_chars:
+                digest = sha256(text.encode("utf-8")).hexdigest()
+                bodies[digest] = text
+                refs[field] = digest
+        if not refs:
+            return entry
+        entry = dict(entry, details={k: v for k, v in details.items() if k not in refs})
+        entry["bodies"] = refs
+        return entry
+
+    def put(self, bodies: dict) -> int:
+        """Store the texts of {digest: text} not stored yet. Returns how many were new."""
+        if not bodies:
+            return 0
+        digests = list(bodies)
+        now = time.time()
+        with self._connect() as db:
+            db.execute("BEGIN IMMEDIATE")
+            try:
+                known = set()
+                for i in range(0, len(digests), 500):  # stay under SQLite's bound-parameter limit
+                    part = digests[i:i + 500]
+                    marks = ",".join("?" * len(part))
+                    db.execute(f"UPDATE bodies SET last_seen = ? WHERE digest IN ({marks})", [now] + part)
+                    known.update(row[0] for row in db.execute(f"SELECT digest FROM bodies WHERE digest IN ({marks})",
+                                                              part))
+                new = [(d, len(bodies[d]), zlib.compress(bodies[d].encode("utf-8"), self.level), now)
+                       for d in digests if d not in known]
+                db.executemany("INSERT INTO bodies (digest, size, data, last_seen) VALUES (?, ?, ?, ?)", new)
+                db.execute("COMMIT")
+            except BaseException:
+                db.execute("ROLLBACK")
+                raise
+        return len(new)
+
+    def rehydrate(self, entries: Iterable[dict]) -> Iterator[dict]:
+        """Yield `entries` with their detached texts put back (a missing body becomes None)."""
+        with self._connect() as db:
+            for entry in entries:
+                refs = entry.get("bodies")
+                if not refs:
+                    yield entry
+                    continue
+                details = dict(entry.get("details") or {})
+                for field, digest in refs.items():
+                    row = db.execute("SELECT data FROM bodies WHERE digest = ?", (digest,)).fetchone()
+                    details[field] = zlib.decompress(row[0]).decode("utf-8") if row else None
+                entry = {k: v for k, v in entry.items() if k != "bodies"}
+                entry["details"] = details
+                yield entry
+
+    def compact(self, referenced: set, min_age: float = 3600.0) -> int:
+        """
+        Delete the bodies no entry in `referenced` (digests) uses anymore, e.g. after log rotation.
+        Bodies seen in the last `min_age` seconds are kept: their entry may not be written yet.
+        Returns the number of bodies deleted.
+        """
+        cutoff = time.time() - min_age
+        with self._connect() as db:
+            db.execute("BEGIN IMMEDIATE")
+            try:
+                stale = [row[0] for row in db.execute("SELECT digest FROM bodies WHERE last_seen < ?", (cutoff,))
+                         if row[0] not in referenced]
+                db.executemany("DELETE FROM bodies WHERE digest = ?", [(d,) for d in stale])
+                db.execute("COMMIT")
+            except BaseException:
+                db.execute("ROLLBACK")
+                raise
+            if stale:
+                db.execute("VACUUM")
+        return len(stale)
+
+    def stats(self) -> dict:
+        """{"bodies", "raw_bytes", "stored_bytes"}; raw_bytes counts characters of the original texts."""
+        with self._connect() as db:
+            count, raw, stored = db.execute("SELECT COUNT(*), COALESCE(SUM(size), 0), "
+                                            "COALESCE(SUM(LENGTH(data)), 0) FROM bodies").fetchone()
+        return {"bodies": count, "raw_bytes": raw, "stored_bytes": stored}
+
+
+class JsonlLogStore:
+    def __init__(self, path: str, batch_size: int = 50, flush_interval: float = 1.0,
+                 max_bytes: int = 10 * 1024 * 1024, backup_count: int = 5, bodies: Optional[BodyStore] = None):
+        self.path = path
+        self.bodies = bodies
+        self.batch_size = max(1, batch_size)
+        self.flush_interval = flush_interval
+        self.max_bytes = max_bytes
+        self.backup_count = backup_count
+
+        self._pending: List[dict] = []
+        self._cond = threading.Condition()
+        self._write_lock = threading.Lock()
+        self._closed = False
+        self._thread = threading.Thread(target=self._run, name="log-store-flush", daemon=True)
+        self._thread.start()
+
+    def append(self, entry: dict) -> None:
+        """Queue `entry` for writing. Never touches the disk itself."""
+        with self._cond:
+            if self._closed:
+                raise RuntimeError(f"Log store {self.path} is closed")
+            self._pending.append(entry)
+            if len(self._pending) >= self.batch_size:
+                self._cond.notify()
+
+    def flush(self) -> None:
+        """Write every queued entry to disk, in the order they were appended."""
+        # The batch is taken and written under one lock: concurrent flushes (background thread,
+        # flush_logs(), close()) can't append their batches out of order
+        with self._write_lock:
+            with self._cond:
+                batch, self._pending = self._pending, []
+            if not batch:
+                return
+            if self.bodies is not None:
+                # Texts first: an entry must never reference a body that isn't stored
+                texts = {}
+                batch = [self.bodies.detach(e, texts) for e in batch]
+                self.bodies.put(texts)
+            payload = "".join(json.dumps(e, ensure_ascii=False) + "\n" for e in batch)
+            directory = os.path.dirname(self.path)
+            if directory:
+                os.makedirs(directory, exist_ok=True)
+            self._rotate_if_needed()
+            with open(self.path, "a", encoding="utf-8") as f:
+                f.write(payload)
+
+    def close(self) -> None:
+        """Stop the background thread and flush what is left."""
+        with self._cond:
+            if self._closed:
+                return
+            self._closed = True
+            self._cond.notify()
+        self._thread.join()
+        self.flush()
+
+    def _run(self) -> None:
+        while True:
+            with self._cond:
+                if not self._closed and len(self._pending) < self.batch_size:
+                    self._cond.wait(self.flush_interval)
+                closed = self._closed
+            try:
+                self.flush()
+            except Exception as e:
+                print(f"⚠️ Log flush failed ({e}).")
+            if closed:
+                return
+
+    def _rotate_if_needed(self) -> None:
+        if self.max_bytes <= 0 or not os.path.exists(self.path):
+            return
+        if os.path.getsize(self.path) < self.max_bytes:
+            return
+        if self.backup_count <= 0:
+            os.remove(self.path)
+            return
+        for i in range(self.backup_count - 1, 0, -1):
+            src = f"{self.path}.{i}"
+            if os.path.exists(src):
+                os.replace(src, f"{self.path}.{i + 1}")
+        os.replace(self.path, f"{self.path}.1")
+
+
+def _rotated_files(path: str) -> List[str]:
+    """Return `path` and its rotated backups, oldest first."""
+    backups = []
+    i = 1
+    while os.path.exists(f"{path}.{i}"):
+        backups.append(f"{path}.{i}")
+        i += 1
+    files = list(reversed(backups))
+    if os.path.exists(path):
+        files.append(path)
+    return files
+
+
+def read_legacy(path: str) -> List[dict]:
+    """Load a legacy JSON-array log file. Returns [] if missing or empty."""
+    if not os.path.exists(path):
+        return []
+    with open(path, "r", encoding="utf-8") as f:
+        content = f.read().strip()
+    if not content:
+        return []
+    data = json.loads(content)
+    if not isinstance(data, list):
+        raise ValueError(f"{path} is not a JSON array")
+    return data
+
+
+def read_entries(path: str, legacy_path: Optional[str] = None, bodies: Optional[BodyStore] = None) -> Iterator[dict]:
+    """Yield every entry: legacy array first, then rotated and active JSONL files.
+
+    Undecodable lines (e.g. a partial write after a crash) are skipped, as are
+    JSONL entries that were already migrated from the legacy file. Given the
+    log's `bodies` store, entries come back with their full texts.
+    """
+    if bodies is not None:
+        yield from bodies.rehydrate(read_entries(path, legacy_path))
+        return
+    legacy_ids = set()
+    if legacy_path:
+        for e in read_legacy(legacy_path):
+            legacy_ids.add(e.get("id"))
+            yield e
+    for file_path in _rotated_files(path):
+        with open(file_path, "r", encoding="utf-8") as f:
+            for line in f:
+                line = line.strip()
+                if not line:
+                    continue
+                try:
+                    entry = json.loads(line)
+                except json.JSONDecodeError:
+                    continue
+                if legacy_ids and entry.get("id") in legacy_ids:
+                    continue
+                yield entry
+
+
+def query_entries(path: str, legacy_path: Optional[str] = None, bodies: Optional[BodyStore] = None,
+                  agent: Optional[str] = None, action: Optional[str] = None, status: Optional[str] = None,
+                  since: Optional[str] = None, until: Optional[str] = None) -> Iterator[dict]:
+    """
+    Entries matching every given filter (`since`/`until`: ISO timestamps, inclusive/exclusive).
+    Filters only look at the entry metadata, so texts are loaded for the matching entries only.
+    """
+    def matches(e: dict) -> bool:
+        return ((agent is None or e.get("agent") == agent)
+                and (action is None or e.get("action") == action)
+                and (status is None or e.get("status") == status)
+                and (since is None or e.get("timestamp", "") >= since)
+                and (until is None or e.get("timestamp", "") < until))
+
+    selected = (e for e in read_entries(path, legacy_path) if matches(e))
+    return bodies.rehydrate(selected) if bodies is not None else selected
+
+
+def compact_bodies(path: str, bodies: BodyStore, min_age: float = 3600.0) -> int:
+    """Drop the bodies that no entry of the log (rotated files included) references anymore."""
+    referenced = {digest for e in read_entries(path) for digest in (e.get("bodies") or {}).values()}
+    return bodies.compact(referenced, min_age=min_age)
+
+
+def migrate_legacy(legacy_path: str, path: str, bodies: Optional[BodyStore] = None) -> int:
+    """Append the entries of a legacy JSON-array file to the JSONL log.
+
+    Entries whose id is already present in the JSONL log are skipped, so the
+    migration can be re-run safely. With `bodies`, their texts are deduplicated
+    like new entries. Returns the number of entries written.
+    """
+    known_ids = {e.get("id") for e in read_entries(path)}
+    entries = [e for e in read_legacy(legacy_path) if e.get("id") not in known_ids]
+    if not entries:
+        return 0
+    if bodies is not None:
+        texts = {}
+        entries = [bodies.detach(e, texts) for e in entries]
+        bodies.put(texts)
+    directory = os.path.dirname(path)
+    if directory:
+        os.makedirs(directory, exist_ok=True)
+    with open(path, "a", encoding="utf-8") as f:
+        for e in entries:
+            f.write(json.dumps(e, ensure_ascii=False) + "\n")
+    return len(entries)
+
+
+def export_json(path: str, output_path: str, legacy_path: Optional[str] = None,
+                bodies: Optional[BodyStore] = None) -> int:
+    """Write every entry, with its full texts, as a single JSON array (the legacy format)."""
+    entries = list(read_entries(path, legacy_path, bodies))
+    with open(output_path, "w", encoding="utf-8") as f:
+        json.dump(entries, f, indent=4, ensure_ascii=False)
+    return len(entries)
@@ -1,11 +1,68 @@
-import json
+import atexit
 import os
+import threading
 import uuid
 from datetime import datetime
 from enum import Enum
 
-# Chemin du fichier de logs
-LOG_FILE = os.path.join("logs", "experiment_data.json")
+from src.utils.log_store import BodyStore, JsonlLogStore, query_entries
+
+# Chemin du fichier de logs (append-only, une entrée JSON par ligne)
+LOG_FILE = os.path.join("logs", "experiment_data.jsonl")
+# Ancien format (tableau JSON réécrit à chaque appel), toujours lisible via log_store.read_entries
+LEGACY_LOG_FILE = os.path.join("logs", "experiment_data.json")
+# Prompts et réponses, stockés une seule fois (compressés, indexés par sha256) et référencés par les entrées
+BODY_FILE = os.path.join("logs", "experiment_bodies.db")
+
+_store = None
+_store_lock = threading.Lock()
+
+
+def get_log_store() -> JsonlLogStore:
+    """
+    Retourne le store partagé, créé à la première utilisation.
+    Taille des lots, intervalle de flush, rotation et déduplication des textes sont réglables
+    par variables d'environnement (IGL_LOG_DEDUP=0 garde les prompts en clair dans le JSONL).
+    """
+    global _store
+    with _store_lock:
+        if _store is None:
+            bodies = None
+            if os.getenv("IGL_LOG_DEDUP", "1") != "0":
+                bodies = BodyStore(BODY_FILE, min_chars=int(os.getenv("IGL_LOG_BODY_MIN_CHARS", "256")))
+            _store = JsonlLogStore(
+                LOG_FILE,
+                batch_size=int(os.getenv("IGL_LOG_BATCH_SIZE", "50")),
+                flush_interval=float(os.getenv("IGL_LOG_FLUSH_INTERVAL", "1.0")),
+                max_bytes=int(os.getenv("IGL_LOG_MAX_BYTES", str(10 * 1024 * 1024))),
+                backup_count=int(os.getenv("IGL_LOG_BACKUP_COUNT", "5")),
+                bodies=bodies,
+            )
+            atexit.register(_store.close)
+        return _store
+
+
+def flush_logs():
+    """Force l'écriture des entrées en attente (ex: avant de lire le fichier de logs)."""
+    if _store is not None:
+        _store.flush()
+
+
+def get_body_store():
+    """Le store des textes du log (None si le fichier n'existe pas encore), pour relire les entrées."""
+    if _store is not None:
+        return _store.bodies
+    return BodyStore(BODY_FILE) if os.path.exists(BODY_FILE) else None
+
+
+def query_logs(**filters):
+    """
+    Entrées du log (ancien format compris) avec leurs prompts et réponses complets.
+    Filtres : agent, action, status, since, until (voir log_store.query_entries).
+    """
+    flush_logs()
+    return query_entries(LOG_FILE, LEGACY_LOG_FILE, get_body_store(), **filters)
+
 
 class ActionType(str, Enum):
     """
@@ -56,9 +113,6 @@ def log_experiment(agent_name: str, model_used: str, action: ActionType, details
             )
 
     # --- 3. PRÉPARATION DE L'ENTRÉE ---
-    # Création du dossier logs s'il n'existe pas
-    os.makedirs("logs", exist_ok=True)
-    
     entry = {
         "id": str(uuid.uuid4()),  # ID unique pour éviter les doublons lors de la fusion des données
         "timestamp": datetime.now().isoformat(),
@@ -69,21 +123,7 @@ def log_experiment(agent_name: str, model_used: str, action: ActionType, details
         "status": status
     }
 
-    # --- 4. LECTURE & ÉCRITURE ROBUSTE ---
-    data = []
-    if os.path.exists(LOG_FILE):
-        try:
-            with open(LOG_FILE, 'r', encoding='utf-8') as f:
-                content = f.read().strip()
-                if content: # Vérifie que le fichier n'est pas juste vide
-                    data = json.loads(content)
-        except json.JSONDecodeError:
-            # Si le fichier est corrompu, on repart à zéro (ou on pourrait sauvegarder un backup)
-            print(f"⚠️ Attention : Le fichier de logs {LOG_FILE} était corrompu. Une nouvelle liste a été créée.")
-            data = []
-
-    data.append(entry)
-    
-    # Écriture
-    with open(LOG_FILE, 'w', encoding='utf-8') as f:
-        json.dump(data, f, indent=4, ensure_ascii=False)
\ No newline at end of file
+    # --- 4. ÉCRITURE EN AJOUT ---
+    # L'entrée est mise en file ; un thread d'arrière-plan l'écrit par lots.
+    # Le coût d'un appel ne dépend donc plus de la taille de l'historique.
+    get_log_store().append(entry)
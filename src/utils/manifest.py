@@ -0,0 +1,103 @@
+"""Per-file run manifest used to skip unchanged files that already passed the Judge."""
+import hashlib
+import json
+import os
+import tempfile
+import threading
+from contextlib import contextmanager
+from datetime import datetime
+from typing import Optional
+
+try:
+    import fcntl
+except ImportError:  # Windows: only the in-process lock applies
+    fcntl = None
+
+DEFAULT_MANIFEST_PATH = os.path.join("sandbox", "manifest.json")
+
+VERDICT_PASS = "PASS"
+VERDICT_FAIL = "FAIL"
+
+
+def file_sha256(file_path: str) -> str:
+    """Hex sha256 of the file's bytes."""
+    digest = hashlib.sha256()
+    with open(file_path, "rb") as f:
+        for block in iter(lambda: f.read(65536), b""):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+class Manifest:
+    def __init__(self, path: str = DEFAULT_MANIFEST_PATH):
+        self.path = path
+        self._lock = threading.Lock()
+        self.entries = {}
+        if os.path.exists(path):
+            try:
+                with open(path, "r", encoding="utf-8") as f:
+                    self.entries = json.load(f).get("files", {})
+            except (OSError, ValueError, AttributeError):
+                print(f"⚠️ Manifest {path} unreadable, starting from scratch.")
+                self.entries = {}
+
+    @staticmethod
+    def _key(source_path: str) -> str:
+        return os.path.abspath(source_path)
+
+    def get(self, source_path: str) -> Optional[dict]:
+        with self._lock:
+            return self.entries.get(self._key(source_path))
+
+    def is_up_to_date(self, source_path: str, content_hash: str, model: str) -> bool:
+        """True if the file is unchanged, was processed with `model`, passed, and its output still exists."""
+        entry = self.get(source_path)
+        if not entry:
+            return False
+        return (
+            entry.get("hash") == content_hash
+            and entry.get("model") == model
+            and entry.get("verdict") == VERDICT_PASS
+            and os.path.exists(entry.get("final_output", ""))
+        )
+
+    @contextmanager
+    def _file_lock(self):
+        """Exclusive lock shared with the other processes writing this manifest (queue workers)."""
+        if fcntl is None:
+            yield
+            return
+        os.makedirs(os.path.dirname(self.path) or ".", exist_ok=True)
+        with open(self.path + ".lock", "a") as lock_file:
+            fcntl.flock(lock_file, fcntl.LOCK_EX)
+            try:
+                yield
+            finally:
+                fcntl.flock(lock_file, fcntl.LOCK_UN)
+
+    def record(self, source_path: str, content_hash: str, model: str, verdict: str, final_output: str) -> None:
+        """Store the outcome for one file and persist the manifest immediately."""
+        with self._lock, self._file_lock():
+            # Queue workers in other processes may have recorded files since we loaded it: what is on
+            # disk is newer than our copy for every file but this one
+            try:
+                with open(self.path, "r", encoding="utf-8") as f:
+                    self.entries = {**self.entries, **json.load(f).get("files", {})}
+            except (OSError, ValueError, AttributeError):
+                pass
+            self.entries[self._key(source_path)] = {
+                "hash": content_hash,
+                "model": model,
+                "verdict": verdict,
+                "final_output": final_output,
+                "updated": datetime.now().isoformat(),
+            }
+            self._save_locked()
+
+    def _save_locked(self) -> None:
+        directory = os.path.dirname(self.path) or "."
+        os.makedirs(directory, exist_ok=True)
+        fd, tmp_path = tempfile.mkstemp(dir=directory, prefix=".manifest-", suffix=".json")
+        with os.fdopen(fd, "w", encoding="utf-8") as f:
+            json.dump({"version": 1, "files": self.entries}, f, indent=2, ensure_ascii=False)
+        os.replace(tmp_path, self.path)
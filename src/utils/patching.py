@@ -0,0 +1,88 @@
+"""Helpers to turn model output into code: fence stripping and local unified-diff application."""
+import ast
+import re
+from typing import List, Tuple
+
+_FENCE_RE = re.compile(r"```[\w+-]*[ \t]*\n(.*?)```", re.DOTALL)
+_HUNK_RE = re.compile(r"^@@ -(\d+)(?:,(\d+))? \+(\d+)(?:,(\d+))? @@")
+
+
+class PatchError(Exception):
+    """The diff is malformed or does not match the original code."""
+
+
+def strip_code_fences(text: str) -> str:
+    """Return the content of the markdown code block(s) in `text`, or `text` itself if there are none."""
+    blocks = _FENCE_RE.findall(text)
+    if blocks:
+        return "\n".join(block.rstrip() for block in blocks).strip()
+    # An unterminated fence (truncated response) still starts with ```python
+    return re.sub(r"^```[\w+-]*[ \t]*\n?", "", text.strip()).replace("```", "").strip()
+
+
+def is_valid_python(code: str) -> bool:
+    try:
+        ast.parse(code)
+        return True
+    except (SyntaxError, ValueError):
+        return False
+
+
+def parse_unified_diff(diff: str) -> List[Tuple[int, List[str], List[str]]]:
+    """Parse hunks into (old_start, old_lines, new_lines). File headers and prose are ignored."""
+    hunks = []
+    current = None
+    for raw in diff.splitlines():
+        match = _HUNK_RE.match(raw)
+        if match:
+            current = (int(match.group(1)), [], [])
+            hunks.append(current)
+            continue
+        if current is None or raw.startswith("---") or raw.startswith("+++"):
+            continue
+        if raw.startswith("\\"):  # "\ No newline at end of file"
+            continue
+        tag, body = (raw[0], raw[1:]) if raw else (" ", "")
+        if tag == " ":
+            current[1].append(body)
+            current[2].append(body)
+        elif tag == "-":
+            current[1].append(body)
+        elif tag == "+":
+            current[2].append(body)
+        else:
+            # Models sometimes drop the leading space of context lines
+            current[1].append(raw)
+            current[2].append(raw)
+    if not hunks:
+        raise PatchError("no hunk found in diff")
+    return hunks
+
+
+def _find(lines: List[str], block: List[str], expected: int) -> int:
+    """Index where `block` occurs in `lines`, preferring the occurrence closest to `expected`."""
+    wanted = [l.rstrip() for l in block]
+    size = len(wanted)
+    candidates = [i for i in range(len(lines) - size + 1)
+                  if [l.rstrip() for l in lines[i:i + size]] == wanted]
+    if not candidates:
+        raise PatchError(f"hunk context not found near line {expected + 1}")
+    return min(candidates, key=lambda i: abs(i - expected))
+
+
+def apply_unified_diff(original: str, diff: str) -> str:
+    """Apply a unified diff to `original`, tolerating line-number drift. Raises PatchError."""
+    lines = original.splitlines()
+    offset = 0
+    for old_start, old_lines, new_lines in parse_unified_diff(diff):
+        # 0-based index of the hunk in the original; a pure insertion "-a,0" goes after line a
+        orig_index = old_start - 1 if old_lines else old_start
+        if old_lines:
+            position = _find(lines, old_lines, orig_index + offset)
+        else:
+            position = min(max(orig_index + offset, 0), len(lines))
+        lines[position:position + len(old_lines)] = new_lines
+        # Drift between the patched lines and the original, for the next hunks
+        offset = position + len(new_lines) - (orig_index + len(old_lines))
+    patched = "\n".join(lines)
+    return patched + "\n" if original.endswith("\n") or not original else patched
@@ -0,0 +1,115 @@
+"""Local static-analysis pre-pass: ast.parse, compile check and pylint, run in parallel.
+
+The result for each file tells main.py whether the file looks clean (and can
+be triaged out or sent to a cheaper audit) and gives the Auditor/Fixer the
+concrete findings, so their prompts can stay short and focused.
+"""
+import json
+import os
+import subprocess
+import sys
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, List
+
+# Conventions/refactoring messages are style noise for a bug-fixing pipeline
+PYLINT_ARGS = ["--output-format=json", "--score=n", "--disable=C,R", "--persistent=n"]
+
+
+def _local_checks(path: str) -> List[dict]:
+    try:
+        with open(path, "r", encoding="utf-8") as f:
+            source = f.read()
+    except (OSError, UnicodeDecodeError) as e:
+        return [{"line": 0, "type": "fatal", "symbol": "unreadable", "message": str(e)}]
+    # compile() covers ast.parse and also catches errors the parser lets through
+    # (e.g. 'return' outside a function, nonlocal at module level)
+    try:
+        compile(source, path, "exec")
+    except SyntaxError as e:
+        return [{"line": e.lineno or 0, "type": "error", "symbol": "syntax-error", "message": e.msg}]
+    except ValueError as e:
+        return [{"line": 0, "type": "error", "symbol": "compile-error", "message": str(e)}]
+    return []
+
+
+def _pylint(paths: List[str], timeout: float) -> Dict[str, List[dict]]:
+    """
+    Run one pylint process over `paths`. Returns {path: findings}; raises RuntimeError if pylint
+    is unavailable or did not complete (crash, usage error), since no findings would then look clean.
+    """
+    try:
+        result = subprocess.run(
+            [sys.executable, "-m", "pylint", *PYLINT_ARGS, *paths],
+            capture_output=True, text=True, timeout=timeout,
+        )
+    except subprocess.TimeoutExpired as e:
+        raise RuntimeError(f"pylint timed out after {timeout}s") from e
+    if "No module named pylint" in result.stderr:
+        raise RuntimeError("pylint is not installed")
+    # Exit status bits: 1 fatal message (e.g. astroid crash), 32 usage error; the others report findings
+    if result.returncode & (1 | 32) or (not result.stdout.strip() and result.stderr.strip()):
+        raise RuntimeError(f"pylint failed (exit status {result.returncode}): {result.stderr.strip()[-200:]}")
+    try:
+        messages = json.loads(result.stdout or "[]")
+    except ValueError as e:
+        raise RuntimeError(f"unexpected pylint output: {result.stderr.strip()[:200]}") from e
+
+    by_path = {os.path.abspath(p): [] for p in paths}
+    for m in messages:
+        by_path.setdefault(os.path.abspath(m.get("path", "")), []).append({
+            "line": m.get("line", 0),
+            "type": m.get("type", ""),
+            "symbol": m.get("symbol", ""),
+            "message": m.get("message", ""),
+        })
+    return by_path
+
+
+def run_prepass(paths: List[str], workers: int = 4, use_pylint: bool = True, timeout: float = 300) -> Dict[str, dict]:
+    """
+    Check every file. Returns {path: {"findings": [...], "broken": bool, "clean": bool}}.
+    broken: the file doesn't even compile. clean: pylint ran and nothing at all was reported.
+    """
+    workers = max(1, workers)
+    findings = {p: [] for p in paths}
+    with ThreadPoolExecutor(max_workers=workers) as pool:
+        for path, local in zip(paths, pool.map(_local_checks, paths)):
+            findings[path].extend(local)
+
+        compilable = [p for p in paths if not findings[p]]
+        linted = set()  # files of the batches pylint completed on
+        if use_pylint and compilable:
+            batches = [compilable[i::workers] for i in range(min(workers, len(compilable)))]
+
+            def lint(batch):
+                try:
+                    return _pylint(batch, timeout)
+                except RuntimeError as e:
+                    return e
+
+            for batch, batch_result in zip(batches, pool.map(lint, batches)):
+                if isinstance(batch_result, RuntimeError):
+                    print(f"⚠️ pylint skipped for {len(batch)} file(s) ({batch_result}).")
+                    continue
+                for path in batch:
+                    findings[path].extend(batch_result.get(os.path.abspath(path), []))
+                linted.update(batch)
+
+    results = {}
+    for path in paths:
+        items = sorted(findings[path], key=lambda f: f["line"])
+        results[path] = {
+            "findings": items,
+            "broken": any(f["symbol"] in ("syntax-error", "compile-error", "unreadable") for f in items),
+            # Without pylint, compiling is not enough evidence to triage a file out
+            "clean": path in linted and not items,
+        }
+    return results
+
+
+def format_findings(findings: List[dict], limit: int = 30) -> str:
+    """Compact, one-line-per-finding text for prompts."""
+    lines = [f"- line {f['line']}: [{f['type']}/{f['symbol']}] {f['message']}" for f in findings[:limit]]
+    if len(findings) > limit:
+        lines.append(f"- ... {len(findings) - limit} more")
+    return "\n".join(lines)
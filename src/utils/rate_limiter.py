@@ -0,0 +1,242 @@
+"""Shared rate limiting and retry policy for model calls.
+
+Every agent call goes through one `RateLimiter`:
+- token buckets keep requests/minute and tokens/minute under the configured quota,
+- errors are classified as retryable, quota or fatal,
+- retries use exponential backoff with full jitter and honour retry-after hints,
+- a quota error pauses every caller (not just the one that hit it) and lowers
+  the request rate, which then recovers slowly while calls succeed.
+"""
+import random
+import re
+import threading
+import time
+from typing import Callable, Optional
+
+RETRYABLE = "retryable"
+QUOTA = "quota"
+FATAL = "fatal"
+
+_QUOTA_NAMES = {"ResourceExhausted", "TooManyRequests"}
+_RETRYABLE_NAMES = {"ServiceUnavailable", "InternalServerError", "DeadlineExceeded", "GatewayTimeout",
+                    "Aborted", "Unknown", "TimeoutError", "ConnectionError", "ServerError"}
+_FATAL_NAMES = {"InvalidArgument", "PermissionDenied", "Unauthenticated", "NotFound", "FailedPrecondition",
+                "BadRequest", "Forbidden", "Unauthorized", "BlockedPromptException", "StopCandidateException"}
+
+_QUOTA_MARKERS = ("429", "quota", "rate limit", "resource exhausted", "resource_exhausted", "too many requests")
+_FATAL_MARKERS = ("api key not valid", "permission denied", "invalid argument", "not found", "400 ", "401 ", "403 ", "404 ")
+
+
+class RetryError(Exception):
+    """Raised when a call still fails after the last allowed attempt, or fails fatally."""
+
+    def __init__(self, message: str, kind: str, attempts: int, last_error: BaseException):
+        super().__init__(message)
+        self.kind = kind
+        self.attempts = attempts
+        self.last_error = last_error
+
+
+def classify_error(error: BaseException) -> str:
+    """Return RETRYABLE, QUOTA or FATAL for an exception raised by a model call."""
+    names = {cls.__name__ for cls in type(error).__mro__}
+    if names & _QUOTA_NAMES:
+        return QUOTA
+    if names & _FATAL_NAMES:
+        return FATAL
+    if names & _RETRYABLE_NAMES:
+        return RETRYABLE
+
+    code = getattr(error, "code", None)
+    if isinstance(code, int):
+        if code == 429:
+            return QUOTA
+        if code >= 500:
+            return RETRYABLE
+        if 400 <= code < 500:
+            return FATAL
+
+    message = str(error).lower()
+    if any(marker in message for marker in _QUOTA_MARKERS):
+        return QUOTA
+    if any(marker in message for marker in _FATAL_MARKERS):
+        return FATAL
+    if isinstance(error, (ValueError, TypeError)):
+        # e.g. response.text on a blocked or empty candidate: retrying won't help
+        return FATAL
+    return RETRYABLE
+
+
+def retry_after(error: BaseException) -> Optional[float]:
+    """Extract a server-provided retry delay (seconds) from an exception, if any."""
+    value = getattr(error, "retry_after", None)
+    if isinstance(value, (int, float)):
+        return float(value)
+
+    response = getattr(error, "response", None)
+    headers = getattr(response, "headers", None)
+    if headers:
+        try:
+            return float(headers.get("Retry-After"))
+        except (TypeError, ValueError):
+            pass
+
+    message = str(error)
+    # google.api_core renders RetryInfo as "retry_delay {\n  seconds: 17\n}"
+    match = re.search(r"retry_delay\s*\{\s*seconds:\s*(\d+)", message)
+    if match:
+        return float(match.group(1))
+    match = re.search(r"retry (?:in|after) ([\d.]+)\s*s", message, re.IGNORECASE)
+    if match:
+        return float(match.group(1))
+    return None
+
+
+class TokenBucket:
+    """Classic token bucket. `capacity` tokens, refilled continuously at `rate` tokens/second."""
+
+    def __init__(self, capacity: float, rate: float):
+        self.capacity = capacity
+        self.rate = rate
+        self._tokens = capacity
+        self._updated = time.monotonic()
+        self._lock = threading.Lock()
+
+    def _refill(self, now: float) -> None:
+        self._tokens = min(self.capacity, self._tokens + (now - self._updated) * self.rate)
+        self._updated = now
+
+    def reserve(self, amount: float) -> float:
+        """Take `amount` tokens (possibly going into debt) and return how long to wait before using them."""
+        with self._lock:
+            now = time.monotonic()
+            self._refill(now)
+            # A single request larger than the bucket would never fit: cap it
+            amount = min(amount, self.capacity)
+            self._tokens -= amount
+            if self._tokens >= 0:
+                return 0.0
+            return -self._tokens / self.rate
+
+    def consume(self, amount: float) -> None:
+        """Charge extra tokens after the fact (e.g. response tokens) without waiting."""
+        with self._lock:
+            self._refill(time.monotonic())
+            self._tokens -= amount
+
+    def set_rate(self, rate: float) -> None:
+        with self._lock:
+            self._refill(time.monotonic())
+            self.rate = rate
+
+
+class RateLimiter:
+    def __init__(self, rpm: Optional[float] = None, tpm: Optional[float] = None, max_retries: int = 5,
+                 base_delay: float = 1.0, max_delay: float = 60.0):
+        self.rpm = rpm
+        self.max_retries = max_retries
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+        self.requests = TokenBucket(rpm, rpm / 60.0) if rpm else None
+        self.tokens = TokenBucket(tpm, tpm / 60.0) if tpm else None
+        self._lock = threading.Lock()
+        self._paused_until = 0.0
+        self._rate_factor = 1.0
+
+    # --- quota ---
+
+    def acquire(self, tokens: int = 0) -> float:
+        """Block until a request of `tokens` prompt tokens may be sent. Returns the time waited."""
+        waited = 0.0
+        while True:
+            with self._lock:
+                pause = self._paused_until - time.monotonic()
+            if pause <= 0:
+                break
+            time.sleep(pause)
+            waited += pause
+
+        delay = 0.0
+        if self.requests:
+            delay = max(delay, self.requests.reserve(1))
+        if self.tokens and tokens:
+            delay = max(delay, self.tokens.reserve(tokens))
+        if delay > 0:
+            time.sleep(delay)
+        return waited + delay
+
+    def record_response(self, tokens: int) -> None:
+        if self.tokens and tokens:
+            self.tokens.consume(tokens)
+        self._adjust_rate(success=True)
+
+    def pause(self, seconds: float) -> None:
+        """Hold every caller for `seconds` (used when the server reports a quota error)."""
+        with self._lock:
+            self._paused_until = max(self._paused_until, time.monotonic() + seconds)
+
+    def _adjust_rate(self, success: bool) -> None:
+        if not self.requests:
+            return
+        with self._lock:
+            if success:
+                self._rate_factor = min(1.0, self._rate_factor + 0.02)
+            else:
+                self._rate_factor = max(0.1, self._rate_factor * 0.75)
+            factor = self._rate_factor
+        self.requests.set_rate(self.rpm * factor / 60.0)
+
+    # --- retry ---
+
+    def backoff(self, attempt: int) -> float:
+        """Full-jitter exponential backoff for the given (0-based) attempt."""
+        return random.uniform(0, min(self.max_delay, self.base_delay * (2 ** attempt)))
+
+    def call(self, fn: Callable[[], object], prompt_tokens: int = 0,
+             response_tokens: Callable[[object], int] = None, on_retry: Callable[[str, float, BaseException], None] = None):
+        """
+        Run `fn` under the rate limit, retrying according to the error class.
+        `response_tokens(result)` lets the limiter charge output tokens to the TPM bucket.
+        `on_retry(kind, delay, error)` is called before each retry sleep.
+        Raises RetryError when the call fails fatally or runs out of attempts.
+        """
+        attempts = self.max_retries + 1
+        for attempt in range(attempts):
+            self.acquire(prompt_tokens)
+            try:
+                result = fn()
+            except Exception as e:
+                kind = classify_error(e)
+                if kind == FATAL or attempt == attempts - 1:
+                    raise RetryError(f"{kind} error after {attempt + 1} attempt(s): {e}", kind, attempt + 1, e) from e
+
+                delay = self.backoff(attempt)
+                hint = retry_after(e)
+                if kind == QUOTA:
+                    delay = max(delay, hint if hint is not None else self.base_delay * (2 ** attempt))
+                    self._adjust_rate(success=False)
+                    self.pause(delay)
+                elif hint is not None:
+                    delay = max(delay, hint)
+                if on_retry:
+                    on_retry(kind, delay, e)
+                if kind != QUOTA:
+                    time.sleep(delay)
+                continue
+            self.record_response(response_tokens(result) if response_tokens else 0)
+            return result
+
+
+_limiter = RateLimiter()
+
+
+def configure_rate_limiter(rpm: Optional[float] = None, tpm: Optional[float] = None, max_retries: int = 5,
+                           base_delay: float = 1.0, max_delay: float = 60.0) -> RateLimiter:
+    """Replace the shared limiter. Call before the agents start generating."""
+    global _limiter
+    _limiter = RateLimiter(rpm, tpm, max_retries, base_delay, max_delay)
+    return _limiter
+
+
+def get_rate_limiter() -> RateLimiter:
+    return _limiter
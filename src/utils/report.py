@@ -0,0 +1,109 @@
+"""Summarise the spans of a run recorded in logs/metrics.jsonl (see src/utils/tracing.py)."""
+import argparse
+import math
+from collections import defaultdict
+from typing import List
+
+from src.utils.log_store import read_entries
+from src.utils.tracing import METRICS_FILE
+
+
+def percentile(values: List[float], pct: float) -> float:
+    """Nearest-rank percentile; 0.0 for an empty list."""
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    rank = max(1, math.ceil(pct * len(ordered) / 100.0))  # pct * n first: 0.07 * 100 would round up to rank 8
+    return ordered[min(rank, len(ordered)) - 1]
+
+
+def _select_run(spans: List[dict], run_id: str) -> List[dict]:
+    if run_id == "all":
+        return spans
+    if run_id is None:
+        # Latest run = the run of the span that started last
+        run_id = max(spans, key=lambda s: s["start"])["run_id"]
+    return [s for s in spans if s["run_id"] == run_id]
+
+
+def _latency_table(title: str, groups: dict) -> List[str]:
+    lines = [title, f"  {'name':<28}{'count':>7}{'p50':>9}{'p90':>9}{'p99':>9}{'max':>9}{'total':>10}"]
+    for name, durations in sorted(groups.items(), key=lambda kv: -sum(kv[1])):
+        lines.append(
+            f"  {name:<28}{len(durations):>7}{percentile(durations, 50):>9.2f}{percentile(durations, 90):>9.2f}"
+            f"{percentile(durations, 99):>9.2f}{max(durations):>9.2f}{sum(durations):>10.1f}"
+        )
+    return lines
+
+
+def build_report(spans: List[dict]) -> str:
+    if not spans:
+        return "No spans recorded."
+    by_id = {s["span_id"]: s for s in spans}
+    run_ids = sorted({s["run_id"] for s in spans})
+    started = min(s["start"] for s in spans)
+    ended = max(s["start"] + s["duration"] for s in spans)
+    wall = max(ended - started, 1e-9)
+
+    lines = [f"Run(s): {', '.join(run_ids)}", f"Wall time: {wall:.1f}s"]
+
+    files = [s for s in spans if s["name"] == "file"]
+    processed = [s for s in files if s["attrs"].get("outcome") in ("new", "reprocessed")]
+    if files:
+        lines.append(f"Files: {len(files)} seen, {len(processed)} processed, "
+                     f"throughput {len(processed) / wall * 60:.1f} files/min")
+
+    # Stage latencies
+    stages = defaultdict(list)
+    for s in spans:
+        stages[s["name"]].append(s["duration"])
+    lines.append("")
+    lines += _latency_table("Stage latency (s):", stages)
+
+    # Per-agent model call latencies
+    calls = defaultdict(list)
+    for s in spans:
+        if s["name"] == "llm_call":
+            calls[s["attrs"].get("agent", "?")].append(s["duration"])
+    if calls:
+        lines.append("")
+        lines += _latency_table("Model call latency per agent (s):", calls)
+
+    # Where the time went: self time (duration minus children) per stage
+    children = defaultdict(float)
+    for s in spans:
+        if s["parent_id"] in by_id:
+            children[s["parent_id"]] += s["duration"]
+    self_time = defaultdict(float)
+    for s in spans:
+        name = f"llm_call ({s['attrs'].get('agent', '?')})" if s["name"] == "llm_call" else s["name"]
+        self_time[name] += max(0.0, s["duration"] - children[s["span_id"]])
+    total_self = sum(self_time.values()) or 1e-9
+    lines.append("")
+    lines.append("Where the time went (self time, summed over threads):")
+    for name, seconds in sorted(self_time.items(), key=lambda kv: -kv[1]):
+        lines.append(f"  {name:<28}{seconds:>10.1f}s {100 * seconds / total_self:>6.1f}%")
+
+    # Counters, taken from root spans so nothing is counted twice
+    totals = defaultdict(int)
+    for s in spans:
+        if s["parent_id"] not in by_id:
+            for key, value in s.get("counters", {}).items():
+                totals[key] += value
+    if totals:
+        lines.append("")
+        lines.append("Totals: " + ", ".join(f"{key}={value}" for key, value in sorted(totals.items())))
+    return "\n".join(lines)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(prog="main.py report", description="Latency/throughput report of a pipeline run")
+    parser.add_argument("--metrics", type=str, default=METRICS_FILE, help="Metrics file (default: logs/metrics.jsonl)")
+    parser.add_argument("--run", type=str, default=None, help="Run id to report, or 'all' (default: latest run)")
+    args = parser.parse_args(argv)
+
+    spans = [s for s in read_entries(args.metrics) if "span_id" in s]
+    if not spans:
+        print(f"No spans found in {args.metrics}.")
+        return
+    print(build_report(_select_run(spans, args.run)))
@@ -0,0 +1,223 @@
+"""Pool of warm unittest worker processes (see src/utils/sandbox_worker.py).
+
+Workers are started once and reused for every test run, so interpreter startup
+and imports are paid once per worker instead of once per Judge iteration. On
+platforms without fork, each run uses a fresh `sandbox_worker.py --once` process
+with the same request/response format.
+"""
+import atexit
+import json
+import os
+import queue
+import subprocess
+import sys
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from typing import List, Optional
+
+WORKER_SCRIPT = os.path.join(os.path.dirname(os.path.abspath(__file__)), "sandbox_worker.py")
+
+DEFAULT_TEST_TIMEOUT = 10.0    # seconds per test case
+DEFAULT_RUN_TIMEOUT = 120.0    # seconds for a whole module
+DEFAULT_MEMORY_MB = 1024
+
+
+class _Worker:
+    def __init__(self, once: bool = False):
+        args = [sys.executable, WORKER_SCRIPT] + (["--once"] if once else [])
+        self.proc = subprocess.Popen(
+            args,
+            stdin=subprocess.PIPE,
+            stdout=subprocess.PIPE,
+            stderr=subprocess.DEVNULL,
+            text=True,
+            encoding="utf-8",
+            bufsize=1,
+        )
+
+    def alive(self) -> bool:
+        return self.proc.poll() is None
+
+    def request(self, payload: dict) -> dict:
+        self.proc.stdin.write(json.dumps(payload) + "\n")
+        self.proc.stdin.flush()
+        line = self.proc.stdout.readline()
+        if not line:
+            raise RuntimeError("test worker exited unexpectedly")
+        return json.loads(line)
+
+    def close(self) -> None:
+        if self.alive():
+            try:
+                self.proc.stdin.close()
+                self.proc.wait(timeout=5)
+            except Exception:
+                self.proc.kill()
+
+
+class TestWorkerPool:
+    def __init__(self, size: int = 2, test_timeout: float = DEFAULT_TEST_TIMEOUT,
+                 run_timeout: float = DEFAULT_RUN_TIMEOUT, memory_mb: int = DEFAULT_MEMORY_MB):
+        self.size = max(1, size)
+        self.test_timeout = test_timeout
+        self.run_timeout = run_timeout
+        self.memory_mb = memory_mb
+        self.persistent = hasattr(os, "fork")
+        self._idle = queue.Queue()
+        self._workers: List[_Worker] = []
+        self._lock = threading.Lock()
+        self._closed = False
+        if self.persistent:
+            for _ in range(self.size):
+                self._spawn()
+
+    def _spawn(self) -> None:
+        worker = _Worker()
+        with self._lock:
+            self._workers.append(worker)
+        self._idle.put(worker)
+
+    def run(self, test_path: str, test_ids: Optional[List[str]] = None) -> dict:
+        """Run a test module (or only `test_ids` from it) and return the worker's structured result."""
+        return self._request({
+            "test_path": os.path.abspath(test_path),
+            "test_ids": test_ids,
+            "timeout": self.test_timeout,
+            "hard_timeout": self.run_timeout,
+            "memory_mb": self.memory_mb,
+        })
+
+    def discover(self, test_path: str) -> dict:
+        """List the test ids of a module without running them: {"ids": [...], "load_error": bool}."""
+        return self._request({
+            "test_path": os.path.abspath(test_path),
+            "discover": True,
+            "hard_timeout": self.run_timeout,
+            "memory_mb": self.memory_mb,
+        })
+
+    def run_sharded(self, test_path: str, shards: int) -> dict:
+        """
+        Split the module's test cases round-robin into `shards` groups, run them on
+        separate workers in parallel and merge the results into one worker-style result.
+        Falls back to a plain run when the module can't be loaded or has a single test.
+        """
+        found = self.discover(test_path)
+        ids = found.get("ids", [])
+        shards = min(shards, len(ids))
+        if found.get("load_error") or shards <= 1:
+            return self.run(test_path)
+
+        groups = [ids[i::shards] for i in range(shards)]
+        with ThreadPoolExecutor(max_workers=shards) as executor:
+            parts = list(executor.map(lambda group: self.run(test_path, group), groups))
+
+        tests = sorted((t for part in parts for t in part.get("tests", [])), key=lambda t: t["id"])
+        return {
+            "tests": tests,
+            "output": "\n".join(part["output"] for part in parts if part.get("output")),
+            "load_error": any(part.get("load_error") for part in parts),
+        }
+
+    def _request(self, payload: dict) -> dict:
+        if not self.persistent:
+            worker = _Worker(once=True)
+            try:
+                return worker.request(payload)
+            finally:
+                worker.close()
+
+        worker = self._idle.get()
+        try:
+            result = worker.request(payload)
+        except Exception:
+            # The worker itself died: replace it so the pool keeps its size
+            with self._lock:
+                if worker in self._workers:
+                    self._workers.remove(worker)
+            worker.close()
+            self._spawn()
+            raise
+        self._idle.put(worker)
+        return result
+
+    def close(self) -> None:
+        with self._lock:
+            if self._closed:
+                return
+            self._closed = True
+            workers = list(self._workers)
+        for worker in workers:
+            worker.close()
+
+
+def slowest_tests(tests: List[dict], count: int = 5) -> str:
+    """Human-readable report of the `count` slowest test cases."""
+    ranked = sorted(tests, key=lambda t: t.get("duration", 0.0), reverse=True)[:count]
+    if not ranked:
+        return ""
+    lines = [f"Slowest {len(ranked)} tests:"]
+    for t in ranked:
+        lines.append(f"  {t['duration']:8.3f}s  {t['status']:<8} {t['id']}")
+    return "\n".join(lines)
+
+
+def summarize(result: dict) -> dict:
+    """Turn a worker result into the {total, passed, failed, output, tests, captured} dict used by JudgeAgent."""
+    tests = result.get("tests", [])
+    passed = sum(1 for t in tests if t["status"] == "passed")
+    failed = sum(1 for t in tests if t["status"] in ("failed", "error", "timeout"))
+
+    lines = []
+    for t in tests:
+        if t["status"] in ("failed", "error", "timeout"):
+            lines.append("=" * 70)
+            lines.append(f"{t['status'].upper()}: {t['id']} ({t['duration']:.3f}s)")
+            lines.append("-" * 70)
+            lines.append(t["traceback"].rstrip())
+    lines.append("-" * 70)
+    lines.append(f"Ran {passed + failed} tests: {passed} passed, {failed} failed")
+    if result.get("output"):
+        lines.append("")
+        lines.append("Captured output:")
+        lines.append(result["output"].rstrip())
+
+    return {
+        "total": passed + failed,
+        "passed": passed,
+        "failed": failed,
+        "output": "\n".join(lines),
+        "tests": tests,
+        "captured": result.get("output", ""),
+        "load_error": result.get("load_error", False),
+    }
+
+
+_pool = None
+_pool_lock = threading.Lock()
+
+
+def configure_test_pool(size: int = 2, test_timeout: float = DEFAULT_TEST_TIMEOUT,
+                        run_timeout: float = DEFAULT_RUN_TIMEOUT, memory_mb: int = DEFAULT_MEMORY_MB) -> TestWorkerPool:
+    """Replace the shared pool. Call before the Judge starts running tests."""
+    global _pool
+    with _pool_lock:
+        if _pool is not None:
+            _pool.close()
+        _pool = TestWorkerPool(size, test_timeout, run_timeout, memory_mb)
+        return _pool
+
+
+def get_test_pool() -> TestWorkerPool:
+    """Return the shared pool, created with default settings on first use."""
+    global _pool
+    with _pool_lock:
+        if _pool is None:
+            _pool = TestWorkerPool()
+        return _pool
+
+
+@atexit.register
+def _shutdown() -> None:
+    if _pool is not None:
+        _pool.close()
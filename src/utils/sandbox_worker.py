@@ -0,0 +1,236 @@
+"""Long-running unittest worker, driven by src/utils/sandbox_runner.py.
+
+The worker reads one JSON request per line on stdin and answers with one JSON
+line on stdout. Heavy imports are done once at startup; each request is then
+run in a forked child (POSIX) so that the generated module, its imports and
+any global state disappear with the child. The child applies a memory limit
+and a per-test timeout and reports one structured record per test case.
+
+Only the standard library is used: the worker is started as a plain script,
+without the project on sys.path.
+
+Request:  {"test_path": "...", "timeout": 10, "memory_mb": 1024, "test_ids": [...] | null, "discover": bool}
+Response: {"tests": [{"id", "status", "duration", "traceback"}], "output": "...", "load_error": bool}
+          or, for discover requests, {"ids": [...], "load_error": bool}
+"""
+import io
+import json
+import os
+import select
+import signal
+import sys
+import time
+import traceback
+import unittest
+
+# Warm the interpreter with modules generated tests commonly use
+import collections, copy, datetime, decimal, functools, itertools, math, random, re, string, tempfile, typing  # noqa: E401,F401
+import unittest.mock  # noqa: F401
+
+try:
+    import resource
+except ImportError:  # Windows
+    resource = None
+
+# Test files are hard links to shared, old blobs: their mtime says nothing about their content,
+# so a cached .pyc could be stale. Never write bytecode for them.
+sys.dont_write_bytecode = True
+
+
+class TestTimeout(BaseException):
+    """Raised inside a test that exceeded its time budget (BaseException so `except Exception` won't swallow it)."""
+
+
+class _RecordingResult(unittest.TestResult):
+    def __init__(self, timeout: float):
+        super().__init__()
+        self.timeout = timeout
+        self.records = []
+        self._started = 0.0
+
+    def startTest(self, test):
+        super().startTest(test)
+        self._started = time.perf_counter()
+        if self.timeout and hasattr(signal, "setitimer"):
+            signal.setitimer(signal.ITIMER_REAL, self.timeout)
+
+    def stopTest(self, test):
+        if self.timeout and hasattr(signal, "setitimer"):
+            signal.setitimer(signal.ITIMER_REAL, 0)
+        super().stopTest(test)
+
+    def _record(self, test, status, err=None):
+        tb = self._exc_info_to_string(err, test) if err else ""
+        if err and err[0] is TestTimeout:
+            status = "timeout"
+        self.records.append({
+            "id": test.id(),
+            "status": status,
+            "duration": round(time.perf_counter() - self._started, 4),
+            "traceback": tb,
+        })
+
+    def addSuccess(self, test):
+        super().addSuccess(test)
+        self._record(test, "passed")
+
+    def addFailure(self, test, err):
+        super().addFailure(test, err)
+        self._record(test, "failed", err)
+
+    def addError(self, test, err):
+        super().addError(test, err)
+        self._record(test, "error", err)
+
+    def addSkip(self, test, reason):
+        super().addSkip(test, reason)
+        self._record(test, "skipped")
+
+    def addExpectedFailure(self, test, err):
+        super().addExpectedFailure(test, err)
+        self._record(test, "passed")
+
+    def addUnexpectedSuccess(self, test):
+        super().addUnexpectedSuccess(test)
+        self._record(test, "failed")
+
+
+def _on_alarm(_signum, _frame):
+    raise TestTimeout("test exceeded its time budget")
+
+
+def _iter_tests(suite):
+    for item in suite:
+        if isinstance(item, unittest.TestSuite):
+            yield from _iter_tests(item)
+        else:
+            yield item
+
+
+def _load_suite(test_path: str, test_ids=None):
+    test_dir = os.path.dirname(os.path.abspath(test_path))
+    module_name = os.path.splitext(os.path.basename(test_path))[0]
+    os.chdir(test_dir)
+    sys.path.insert(0, test_dir)
+    loader = unittest.TestLoader()
+    if test_ids:
+        return loader.loadTestsFromNames(test_ids)
+    return loader.loadTestsFromName(module_name)
+
+
+def run_tests(request: dict) -> dict:
+    """Run the requested tests in the current process and return the structured result."""
+    timeout = float(request.get("timeout") or 0)
+    if hasattr(signal, "SIGALRM"):
+        signal.signal(signal.SIGALRM, _on_alarm)
+
+    captured = io.StringIO()
+    sys.stdout = sys.stderr = captured
+    load_error = False
+    try:
+        suite = _load_suite(request["test_path"], request.get("test_ids"))
+        # Import/syntax errors in the module surface as unittest.loader._FailedTest cases
+        load_error = any(type(t).__name__ == "_FailedTest" for t in _iter_tests(suite))
+        if request.get("discover"):
+            return {"ids": [t.id() for t in _iter_tests(suite)], "load_error": load_error}
+        result = _RecordingResult(timeout)
+        suite.run(result)
+        records = result.records
+    except BaseException:
+        load_error = True
+        if request.get("discover"):
+            return {"ids": [], "load_error": True}
+        records = [{"id": request["test_path"], "status": "error", "duration": 0.0, "traceback": traceback.format_exc()}]
+    finally:
+        sys.stdout, sys.stderr = sys.__stdout__, sys.__stderr__
+    return {"tests": records, "output": captured.getvalue(), "load_error": load_error}
+
+
+def _apply_limits(memory_mb) -> None:
+    if resource is None or not memory_mb:
+        return
+    limit = int(memory_mb) * 1024 * 1024
+    try:
+        resource.setrlimit(resource.RLIMIT_AS, (limit, limit))
+    except (ValueError, OSError):
+        pass
+
+
+def _read_until(fd: int, deadline: float):
+    """Read everything from `fd` until EOF; returns None if `deadline` passes first."""
+    chunks = []
+    while True:
+        remaining = deadline - time.monotonic()
+        if remaining <= 0:
+            return None
+        ready, _, _ = select.select([fd], [], [], remaining)
+        if not ready:
+            continue
+        data = os.read(fd, 65536)
+        if not data:
+            return b"".join(chunks)
+        chunks.append(data)
+
+
+def run_forked(request: dict) -> dict:
+    """Run `request` in a forked child, killing it if the whole run overruns its budget."""
+    read_fd, write_fd = os.pipe()
+    pid = os.fork()
+    if pid == 0:  # child
+        os.close(read_fd)
+        try:
+            _apply_limits(request.get("memory_mb"))
+            payload = json.dumps(run_tests(request)).encode("utf-8")
+            with os.fdopen(write_fd, "wb") as f:
+                f.write(payload)
+        finally:
+            os._exit(0)
+
+    os.close(write_fd)
+    hard_timeout = request.get("hard_timeout") or 600
+    raw = _read_until(read_fd, time.monotonic() + hard_timeout)
+    os.close(read_fd)
+    if raw is None:
+        os.kill(pid, signal.SIGKILL)
+    _pid, status = os.waitpid(pid, 0)
+
+    if raw is None:
+        return _crash_result(request, "timeout", f"Test run killed after {hard_timeout}s")
+    try:
+        return json.loads(raw.decode("utf-8"))
+    except ValueError:
+        return _crash_result(request, "error", f"Test process died (wait status {status}); likely out of memory or crashed")
+
+
+def _crash_result(request: dict, status: str, message: str) -> dict:
+    return {
+        "tests": [{"id": request["test_path"], "status": status, "duration": 0.0, "traceback": message}],
+        "output": message,
+        "load_error": False,
+    }
+
+
+def main():
+    once = "--once" in sys.argv
+    runner = run_forked if hasattr(os, "fork") else run_tests
+    # Keep a private copy of stdout for the protocol and point fd 1 at /dev/null,
+    # so tests writing straight to the file descriptor can't corrupt the replies
+    out = os.fdopen(os.dup(sys.stdout.fileno()), "w", encoding="utf-8")
+    devnull = os.open(os.devnull, os.O_WRONLY)
+    os.dup2(devnull, sys.stdout.fileno())
+    for line in sys.stdin:
+        line = line.strip()
+        if not line:
+            continue
+        request = json.loads(line)
+        if not hasattr(os, "fork"):
+            _apply_limits(request.get("memory_mb"))
+        response = runner(request)
+        out.write(json.dumps(response) + "\n")
+        out.flush()
+        if once:
+            break
+
+
+if __name__ == "__main__":
+    main()
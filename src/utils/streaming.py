@@ -0,0 +1,156 @@
+"""Incremental checks on Python code arriving as a stream of chunks.
+
+`CodeStreamChecker` is fed the chunks of a model response. It follows the
+code (inside a markdown fence if there is one) and checks each completed
+top-level block with ast.parse as soon as the next top-level statement starts.
+A generation is aborted early (StreamAborted) on a syntax error in a completed
+block, on a degenerate repetition loop, or when it grows far beyond the
+expected size. `complete` turns true as soon as the module is known to be
+whole (closing fence, or a line matching `complete_pattern`), so the caller
+can stop reading and use the code right away.
+"""
+import ast
+import re
+from typing import Optional
+
+ABORT_SYNTAX = "syntax"
+ABORT_REPETITION = "repetition"
+ABORT_RUNAWAY = "runaway"
+
+# ast.parse errors meaning "this block continues further down", not "this block is wrong"
+_INCOMPLETE_MARKERS = ("was never closed", "unterminated triple-quoted string", "unexpected EOF",
+                       "expected an indented block")
+# Column-0 lines that continue the previous statement
+_CONTINUATION_RE = re.compile(r"(else|elif|except|finally)\b|[)\]}]")
+
+
+class StreamAborted(Exception):
+    """The generation was stopped early; `text` is what had arrived so far."""
+
+    def __init__(self, reason: str, detail: str, text: str):
+        super().__init__(f"{reason}: {detail}")
+        self.reason = reason
+        self.text = text
+
+
+class CodeStreamChecker:
+    def __init__(self, max_chars: Optional[int] = None, complete_pattern: Optional[str] = None,
+                 max_repeats: int = 25):
+        self.max_chars = max_chars
+        self.complete_pattern = re.compile(complete_pattern) if complete_pattern else None
+        self.max_repeats = max_repeats
+        self.text = ""
+        self.complete = False
+        self._complete_lines = None  # set when complete_pattern matched: the code ends after that many lines
+        self._fence_closes = None
+        self._code_start = 0
+        self._reset_scan()
+
+    def _reset_scan(self):
+        self._block_start = 0  # first line of the block not validated yet
+        self._scanned = 0  # lines already looked at
+        self._validated = 0  # number of blocks that parsed
+        self._preamble = 0  # lines of prose skipped before unfenced code
+        self._repeat_line = None
+        self._repeats = 0
+
+    def _region(self):
+        """(start, end, fenced) of the code inside the raw text; end is None while the code is still open."""
+        fence = self.text.find("```")
+        if fence == -1:
+            return 0, None, False
+        if self._fence_closes is None:
+            # Decided once, when the first fence shows up: after code that parses, it closes unfenced code
+            before = self.text[:fence]
+            self._fence_closes = bool(self._validated or (before.strip() and _parses(before)))
+        if self._fence_closes:
+            return 0, fence, False
+        newline = self.text.find("\n", fence)
+        if newline == -1:
+            return len(self.text), None, True  # the fence's language tag isn't complete yet
+        start = newline + 1
+        close = self.text.find("\n```", start - 1)
+        return start, (close + 1 if close != -1 else None), True
+
+    def code(self) -> str:
+        """The code received so far, without fences and surrounding prose."""
+        start, end, _ = self._region()
+        lines = (self.text[start:end] if end is not None else self.text[start:]).split("\n")
+        if self._complete_lines is not None:
+            lines = lines[:self._complete_lines] + [""]
+        return "\n".join(lines[self._preamble:])
+
+    def feed(self, chunk: str) -> None:
+        """Add a chunk; raises StreamAborted if the generation is clearly going wrong."""
+        if self.complete:
+            return
+        self.text += chunk
+        start, end, fenced = self._region()
+        if start != self._code_start:
+            # A fence showed up: whatever came before it was prose
+            self._code_start = start
+            self._reset_scan()
+        code = self.text[start:end] if end is not None else self.text[start:]
+
+        if self.max_chars and len(code) > self.max_chars:
+            raise StreamAborted(ABORT_RUNAWAY, f"more than {self.max_chars} characters", self.text)
+
+        if end is not None:
+            self.complete = True
+            lines = code.split("\n")
+        else:
+            lines = code.split("\n")[:-1]  # only lines whose newline has arrived
+        self._scan(lines, fenced)
+
+    def _scan(self, lines: list, fenced: bool) -> None:
+        for i in range(self._scanned, len(lines)):
+            line = lines[i]
+            stripped = line.strip()
+            if stripped and len(stripped) > 3:
+                if stripped == self._repeat_line:
+                    self._repeats += 1
+                    if self._repeats >= self.max_repeats:
+                        raise StreamAborted(ABORT_REPETITION, f"line repeated {self._repeats} times: {stripped[:60]}",
+                                            self.text)
+                else:
+                    self._repeat_line, self._repeats = stripped, 1
+
+            if i > self._block_start and self._is_boundary(lines, i):
+                self._check_block(lines[self._block_start:i], i, fenced)
+            if self.complete_pattern and self.complete_pattern.match(line):
+                self.complete = True
+                self._complete_lines = i + 1
+                break
+        self._scanned = len(lines)
+
+    @staticmethod
+    def _is_boundary(lines: list, i: int) -> bool:
+        """True if line i starts a new top-level statement."""
+        line = lines[i]
+        if not line or line[0] in " \t#" or _CONTINUATION_RE.match(line):
+            return False
+        previous = next((l for l in reversed(lines[:i]) if l.strip() and not l.lstrip().startswith("#")), "")
+        return not (previous.startswith("@") or previous.rstrip().endswith("\\"))
+
+    def _check_block(self, block: list, next_start: int, fenced: bool) -> None:
+        try:
+            ast.parse("\n".join(block))
+        except SyntaxError as e:
+            if any(marker in (e.msg or "") for marker in _INCOMPLETE_MARKERS):
+                return  # e.g. a column-0 line inside a string: wait for the rest
+            if not fenced and self._validated == 0 and not self._preamble:
+                # Unfenced answers sometimes open with a sentence of prose
+                self._preamble = next_start
+                self._block_start = next_start
+                return
+            raise StreamAborted(ABORT_SYNTAX, f"{e.msg} (line {self._block_start + (e.lineno or 1)})", self.text)
+        self._validated += 1
+        self._block_start = next_start
+
+
+def _parses(code: str) -> bool:
+    try:
+        ast.parse(code)
+        return True
+    except (SyntaxError, ValueError):
+        return False
@@ -0,0 +1,40 @@
+"""On-disk store of generated test suites, keyed by the original source file's hash.
+
+Lets the Judge generate a suite once per source file and reuse it across
+iterations and across runs, until the suite itself turns out to be broken.
+"""
+import hashlib
+import os
+import tempfile
+from typing import Optional
+
+DEFAULT_SUITE_DIR = os.path.join(".cache", "test_suites")
+
+
+class SuiteCache:
+    def __init__(self, suite_dir: str = DEFAULT_SUITE_DIR):
+        self.suite_dir = suite_dir
+
+    def _path(self, source_hash: str, model_name: str) -> str:
+        model_tag = hashlib.sha256(model_name.encode("utf-8")).hexdigest()[:8]
+        return os.path.join(self.suite_dir, f"{source_hash}_{model_tag}.py")
+
+    def get(self, source_hash: str, model_name: str) -> Optional[str]:
+        try:
+            with open(self._path(source_hash, model_name), "r", encoding="utf-8") as f:
+                return f.read()
+        except OSError:
+            return None
+
+    def put(self, source_hash: str, model_name: str, test_code: str) -> None:
+        os.makedirs(self.suite_dir, exist_ok=True)
+        fd, tmp_path = tempfile.mkstemp(dir=self.suite_dir, prefix=".suite-", suffix=".py")
+        with os.fdopen(fd, "w", encoding="utf-8") as f:
+            f.write(test_code)
+        os.replace(tmp_path, self._path(source_hash, model_name))
+
+    def invalidate(self, source_hash: str, model_name: str) -> None:
+        try:
+            os.remove(self._path(source_hash, model_name))
+        except OSError:
+            pass
@@ -0,0 +1,11 @@
+"""Local token estimates, used where exact counts would cost a network call."""
+
+# Gemini averages roughly 4 characters per token on English text and code
+CHARS_PER_TOKEN = 4
+
+
+def estimate_tokens(text: str) -> int:
+    """Cheap, deterministic estimate of the number of tokens in `text`."""
+    if not text:
+        return 0
+    return max(1, (len(text) + CHARS_PER_TOKEN - 1) // CHARS_PER_TOKEN)
@@ -0,0 +1,127 @@
+"""Lightweight stage-level tracing.
+
+`span(name, **attrs)` times a block and records it, with its parent span, in
+logs/metrics.jsonl (through the same batched JSONL store as the experiment
+log). `add_counters(...)` adds numbers (tokens, retries, cache hits...) to the
+current span and to every enclosing span, so a file span carries the totals
+of everything that happened while processing that file.
+"""
+import atexit
+import os
+import threading
+import time
+import uuid
+from contextlib import contextmanager
+
+from src.utils.log_store import JsonlLogStore
+
+METRICS_FILE = os.path.join("logs", "metrics.jsonl")
+
+RUN_ID = uuid.uuid4().hex[:12]
+
+_local = threading.local()
+_store = None
+_store_lock = threading.Lock()
+_counter_lock = threading.Lock()
+_enabled = True
+
+
+class Span:
+    def __init__(self, name: str, parent, attrs: dict):
+        self.id = uuid.uuid4().hex[:12]
+        self.name = name
+        self.parent = parent
+        self.attrs = attrs
+        self.counters = {}
+        self.start = time.time()
+
+
+def configure_tracing(enabled: bool = True, path: str = None) -> None:
+    """Enable/disable tracing or change the metrics file. Call before the first span."""
+    global _enabled, _store
+    with _store_lock:
+        _enabled = enabled
+        if path and (_store is None or _store.path != path):
+            if _store is not None:
+                _store.close()
+            _store = JsonlLogStore(path)
+            atexit.register(_store.close)
+
+
+def _get_store() -> JsonlLogStore:
+    global _store
+    with _store_lock:
+        if _store is None:
+            _store = JsonlLogStore(METRICS_FILE)
+            atexit.register(_store.close)
+        return _store
+
+
+def _stack() -> list:
+    if not hasattr(_local, "stack"):
+        _local.stack = []
+    return _local.stack
+
+
+def current_span():
+    stack = _stack()
+    return stack[-1] if stack else None
+
+
+@contextmanager
+def span(name: str, **attrs):
+    """Time the enclosed block as a child of the current span."""
+    stack = _stack()
+    s = Span(name, stack[-1] if stack else None, attrs)
+    stack.append(s)
+    started = time.perf_counter()
+    error = None
+    try:
+        yield s
+    except BaseException as e:
+        error = type(e).__name__
+        raise
+    finally:
+        duration = time.perf_counter() - started
+        stack.pop()
+        if _enabled:
+            record = {
+                "run_id": RUN_ID,
+                "span_id": s.id,
+                "parent_id": s.parent.id if s.parent else None,
+                "name": name,
+                "start": s.start,
+                "duration": round(duration, 6),
+                "attrs": s.attrs,
+                "counters": s.counters,
+            }
+            if error:
+                record["error"] = error
+            _get_store().append(record)
+
+
+def add_counters(**counters) -> None:
+    """Add to the counters of the current span and all of its ancestors."""
+    s = current_span()
+    with _counter_lock:  # ancestors may be shared with spans on other threads
+        while s is not None:
+            for key, value in counters.items():
+                s.counters[key] = s.counters.get(key, 0) + value
+            s = s.parent
+
+
+def bind_span(fn):
+    """Wrap `fn` so that, run on another thread, its spans are children of the caller's current span."""
+    parent = current_span()
+    if parent is None:
+        return fn
+
+    def wrapper(*args, **kwargs):
+        stack = _stack()
+        saved = list(stack)
+        stack[:] = [parent]
+        try:
+            return fn(*args, **kwargs)
+        finally:
+            stack[:] = saved
+    return wrapper
@@ -0,0 +1,66 @@
+"""Change detection for `main.py watch`: which files of a tree were edited, once their edits settle.
+
+Each poll lists the tree and stats the files (cheap: no reads). A file whose
+(mtime, size) moved is considered settled once it has not moved again for
+`debounce` seconds; only then is it hashed, and it is reported only if its
+content differs from the last version reported (a touch, or an edit that was
+undone, is not a change).
+"""
+import os
+import time
+from typing import Callable, Dict, List, Tuple
+
+from src.utils.manifest import file_sha256
+
+
+class TreeWatcher:
+    def __init__(self, target_dir: str, list_files: Callable[[str], List[str]], debounce: float = 1.0):
+        """list_files(target_dir) returns the files to watch (e.g. main.collect_target_files)."""
+        self.target_dir = target_dir
+        self.list_files = list_files
+        self.debounce = debounce
+        self._stats: Dict[str, Tuple[int, int]] = {}  # path -> (mtime_ns, size) at the last poll
+        self._moved_at: Dict[str, float] = {}  # path -> when its stat last moved, while unsettled
+        self._hashes: Dict[str, str] = {}  # path -> sha256 of the version last reported
+        self._started = False
+
+    def poll(self) -> List[str]:
+        """The files changed since they were last reported and now settled, in a stable order."""
+        now = time.monotonic()
+        current = {}
+        for path in self.list_files(self.target_dir):
+            try:
+                info = os.stat(path)
+            except OSError:
+                continue  # deleted between listing and stat
+            current[path] = (info.st_mtime_ns, info.st_size)
+
+        # Files already there at startup are not being edited: no need to wait for them
+        moved_at = now if self._started else now - self.debounce
+        self._started = True
+        for path, signature in current.items():
+            if self._stats.get(path) != signature:
+                self._moved_at[path] = moved_at
+        for path in set(self._stats) - set(current):
+            self._moved_at.pop(path, None)
+            self._hashes.pop(path, None)
+        self._stats = current
+
+        ready = []
+        for path, moved in list(self._moved_at.items()):
+            if now - moved < self.debounce:
+                continue
+            del self._moved_at[path]
+            try:
+                digest = file_sha256(path)
+            except OSError:
+                continue
+            if self._hashes.get(path) == digest:
+                continue
+            self._hashes[path] = digest
+            ready.append(path)
+        return sorted(ready)
+
+    def pending(self) -> int:
+        """Files seen moving that are still waiting for their edits to settle."""
+        return len(self._moved_at)
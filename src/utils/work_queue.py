@@ -0,0 +1,252 @@
+"""Durable work queue stored in SQLite: one job per source file, with stage checkpoints and leases.
+
+`main.py enqueue` adds the files of a tree, `main.py worker` processes them
+(any number of worker processes, on one machine or several sharing the
+database file), `main.py status` shows progress.
+
+A worker claims a job by taking a lease on it and keeps the lease alive while
+it works. If the worker dies, the lease expires and another worker picks the
+job up again, starting from its last checkpoint:
+    queued -> audited (analysis saved) -> fixed (fixed code saved)
+           -> iteration k (Judge loop state saved) -> done
+Every state change is a single transaction, so a crash never leaves a job
+half-updated.
+"""
+import json
+import os
+import socket
+import sqlite3
+import threading
+import time
+import uuid
+from contextlib import contextmanager
+from typing import Optional
+
+DEFAULT_QUEUE_PATH = os.path.join("sandbox", "queue.db")
+
+PENDING = "pending"
+RUNNING = "running"
+DONE = "done"
+FAILED = "failed"
+
+STAGE_QUEUED = "queued"
+STAGE_AUDITED = "audited"
+STAGE_FIXED = "fixed"
+STAGE_DONE = "done"
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS jobs (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    path TEXT NOT NULL UNIQUE,
+    target_dir TEXT NOT NULL,
+    key TEXT NOT NULL,
+    content_hash TEXT NOT NULL,
+    status TEXT NOT NULL DEFAULT 'pending',
+    stage TEXT NOT NULL DEFAULT 'queued',
+    checkpoint TEXT NOT NULL DEFAULT '{}',
+    attempts INTEGER NOT NULL DEFAULT 0,
+    lease_owner TEXT,
+    lease_expires REAL,
+    outcome TEXT,
+    error TEXT,
+    updated REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS jobs_status ON jobs (status, lease_expires);
+"""
+
+
+class LeaseLost(Exception):
+    """The worker's lease on a job expired and the job may now belong to another worker."""
+
+
+def worker_id() -> str:
+    return f"{socket.gethostname()}:{os.getpid()}:{uuid.uuid4().hex[:6]}"
+
+
+class WorkQueue:
+    def __init__(self, path: str = DEFAULT_QUEUE_PATH, lease_seconds: float = 300.0, max_attempts: int = 3,
+                 wal: bool = True):
+        """wal: WAL journaling (faster, concurrent readers); turn it off for a database on a network filesystem."""
+        self.path = path
+        self.lease_seconds = lease_seconds
+        self.max_attempts = max_attempts
+        self.wal = wal
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        with self._connect() as db:
+            db.execute(f"PRAGMA journal_mode={'WAL' if wal else 'DELETE'}")  # persistent, set once
+            db.executescript(_SCHEMA)
+
+    @contextmanager
+    def _connect(self):
+        """One short-lived connection per operation: safe across threads and processes."""
+        db = sqlite3.connect(self.path, timeout=30.0, isolation_level=None)
+        db.row_factory = sqlite3.Row
+        try:
+            yield db
+        finally:
+            db.close()
+
+    @contextmanager
+    def _transaction(self):
+        # BEGIN IMMEDIATE takes the write lock up front, so two workers can't claim the same job
+        with self._connect() as db:
+            db.execute("BEGIN IMMEDIATE")
+            try:
+                yield db
+                db.execute("COMMIT")
+            except BaseException:
+                db.execute("ROLLBACK")
+                raise
+
+    def enqueue(self, path: str, target_dir: str, key: str, content_hash: str, force: bool = False) -> str:
+        """
+        Add (or refresh) the job of one file. Returns "added", "requeued" (content changed, failed,
+        or force) or "unchanged". A running job is left alone unless its content changed.
+        """
+        path = os.path.abspath(path)
+        now = time.time()
+        with self._transaction() as db:
+            row = db.execute("SELECT status, content_hash FROM jobs WHERE path = ?", (path,)).fetchone()
+            if row is None:
+                db.execute("INSERT INTO jobs (path, target_dir, key, content_hash, updated) VALUES (?, ?, ?, ?, ?)",
+                           (path, os.path.abspath(target_dir), key, content_hash, now))
+                return "added"
+            changed = row["content_hash"] != content_hash
+            if not changed and not force and row["status"] in (PENDING, RUNNING, DONE):
+                return "unchanged"
+            db.execute(
+                "UPDATE jobs SET target_dir = ?, key = ?, content_hash = ?, status = ?, stage = ?, checkpoint = '{}', "
+                "attempts = 0, lease_owner = NULL, lease_expires = NULL, outcome = NULL, error = NULL, updated = ? "
+                "WHERE path = ?",
+                (os.path.abspath(target_dir), key, content_hash, PENDING, STAGE_QUEUED, now, path))
+            return "requeued"
+
+    def claim(self, owner: str) -> Optional[dict]:
+        """Lease the oldest available job (pending, or running with an expired lease). None if there is none."""
+        now = time.time()
+        with self._transaction() as db:
+            while True:
+                row = db.execute(
+                    "SELECT * FROM jobs WHERE status = ? OR (status = ? AND lease_expires < ?) ORDER BY id LIMIT 1",
+                    (PENDING, RUNNING, now)).fetchone()
+                if row is None:
+                    return None
+                if row["attempts"] < self.max_attempts:
+                    break
+                # Its workers died mid-job too many times: the file itself is probably the problem
+                db.execute("UPDATE jobs SET status = ?, lease_owner = NULL, error = ?, updated = ? WHERE id = ?",
+                           (FAILED, f"gave up after {row['attempts']} attempts", now, row["id"]))
+            db.execute("UPDATE jobs SET status = ?, lease_owner = ?, lease_expires = ?, attempts = attempts + 1, "
+                       "updated = ? WHERE id = ?", (RUNNING, owner, now + self.lease_seconds, now, row["id"]))
+        job = dict(row)
+        job["checkpoint"] = json.loads(job["checkpoint"] or "{}")
+        return job
+
+    def _update_owned(self, job_id: int, owner: str, assignments: str, values: tuple) -> None:
+        """UPDATE a job we hold the lease on; raises LeaseLost if we don't anymore."""
+        with self._transaction() as db:
+            cursor = db.execute(f"UPDATE jobs SET {assignments}, updated = ? WHERE id = ? AND lease_owner = ? "
+                                f"AND status = ?", values + (time.time(), job_id, owner, RUNNING))
+            if cursor.rowcount != 1:
+                raise LeaseLost(f"job {job_id} is no longer leased by {owner}")
+
+    def renew(self, job_id: int, owner: str) -> None:
+        self._update_owned(job_id, owner, "lease_expires = ?", (time.time() + self.lease_seconds,))
+
+    def checkpoint(self, job_id: int, owner: str, stage: str, checkpoint: dict) -> None:
+        """Save the job's progress (and extend the lease)."""
+        self._update_owned(job_id, owner, "stage = ?, checkpoint = ?, lease_expires = ?",
+                           (stage, json.dumps(checkpoint), time.time() + self.lease_seconds))
+
+    def complete(self, job_id: int, owner: str, outcome: str) -> None:
+        self._update_owned(job_id, owner, "status = ?, stage = ?, outcome = ?, checkpoint = '{}', lease_owner = NULL, "
+                           "lease_expires = NULL, error = NULL", (DONE, STAGE_DONE, outcome))
+
+    def fail(self, job_id: int, owner: str, error: str) -> None:
+        """Give the job back for another attempt, or mark it failed once it used up its attempts."""
+        with self._transaction() as db:
+            row = db.execute("SELECT attempts FROM jobs WHERE id = ? AND lease_owner = ?", (job_id, owner)).fetchone()
+            if row is None:
+                raise LeaseLost(f"job {job_id} is no longer leased by {owner}")
+            status = FAILED if row["attempts"] >= self.max_attempts else PENDING
+            db.execute("UPDATE jobs SET status = ?, error = ?, lease_owner = NULL, lease_expires = NULL, updated = ? "
+                       "WHERE id = ?", (status, error[:2000], time.time(), job_id))
+
+    def counts(self) -> dict:
+        """{status: {stage: count}}; running jobs with an expired lease are reported as "stale"."""
+        now = time.time()
+        counts = {}
+        with self._connect() as db:
+            for row in db.execute("SELECT status, stage, lease_expires FROM jobs"):
+                status = row["status"]
+                if status == RUNNING and (row["lease_expires"] or 0) < now:
+                    status = "stale"
+                stages = counts.setdefault(status, {})
+                stages[row["stage"]] = stages.get(row["stage"], 0) + 1
+        return counts
+
+    def jobs(self, status: str = None) -> list:
+        with self._connect() as db:
+            if status:
+                rows = db.execute("SELECT * FROM jobs WHERE status = ? ORDER BY id", (status,)).fetchall()
+            else:
+                rows = db.execute("SELECT * FROM jobs ORDER BY id").fetchall()
+        return [dict(row) for row in rows]
+
+
+class Lease:
+    """
+    A claimed job: keeps its lease alive from a background thread and saves checkpoints.
+    Use as a context manager around the work on the job.
+    """
+
+    def __init__(self, queue: WorkQueue, job: dict, owner: str):
+        self.queue = queue
+        self.job = job
+        self.owner = owner
+        self.state = dict(job["checkpoint"])
+        self.lost = False
+        self._renewed = time.monotonic()  # claim() just set the expiry
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._heartbeat, daemon=True)
+
+    def __enter__(self):
+        self._thread.start()
+        return self
+
+    def __exit__(self, *exc):
+        self._stop.set()
+        self._thread.join()
+        return False
+
+    def _heartbeat(self):
+        while not self._stop.wait(self.queue.lease_seconds / 3):
+            try:
+                self.queue.renew(self.job["id"], self.owner)
+                self._renewed = time.monotonic()
+            except LeaseLost:
+                self.lost = True
+                return
+            except sqlite3.Error as e:
+                print(f"⚠️ Lease renewal failed ({e}), retrying.")
+
+    def check(self) -> None:
+        """
+        Raise LeaseLost if the job may belong to another worker now: the heartbeat saw the lease
+        taken, or could not renew it in time (the lease may have expired and been claimed).
+        """
+        if not self.lost and time.monotonic() - self._renewed >= self.queue.lease_seconds:
+            self.lost = True
+        if self.lost:
+            raise LeaseLost(f"job {self.job['id']} is no longer leased by {self.owner}")
+
+    def save(self, stage: str, **data) -> None:
+        """Record that `stage` was reached, merging `data` into the job's checkpoint."""
+        self.check()
+        self.state.update(data)
+        try:
+            self.queue.checkpoint(self.job["id"], self.owner, stage, self.state)
+        except LeaseLost:
+            self.lost = True
+            raise
+        self._renewed = time.monotonic()  # checkpoint() extends the lease too
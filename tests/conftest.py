@@ -0,0 +1,15 @@
+import os
+import sys
+
+import pytest
+
+# The project is not installed: import `src` from the repository root, like the scripts do
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from src.utils import tracing  # noqa: E402
+
+
+@pytest.fixture(autouse=True)
+def no_metrics(monkeypatch):
+    """Spans would be flushed to the relative logs/metrics.jsonl at exit, i.e. into the working tree."""
+    monkeypatch.setattr(tracing, "_enabled", False)
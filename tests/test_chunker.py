@@ -0,0 +1,57 @@
+import ast
+
+from src.utils.chunker import chunk_module
+
+
+def _function(name: str, body_lines: int = 30) -> str:
+    return f"def {name}(x):\n" + "".join(f"    x = x + {i}\n" for i in range(body_lines)) + "    return x\n\n\n"
+
+
+def _covered(chunks) -> str:
+    return "\n".join(chunk["code"] for chunk in chunks)
+
+
+def test_small_module_is_one_chunk():
+    code = "import os\n\n" + _function("f", 2)
+    assert chunk_module(code, max_chars=10000) == [
+        {"names": ["<module>"], "start": 1, "end": code.count("\n") + 1, "code": code}]
+
+
+def test_unreferenced_assignment_is_audited():
+    code = "import os\nCONFIG = {'debug': True, 'retries': 3}\n\n\n" + _function("f") + _function("g")
+    chunks = chunk_module(code, max_chars=600)
+    assert len(chunks) > 1
+    assert "CONFIG = {" in _covered(chunks)
+    assert any("<module-level code>" in chunk["names"] for chunk in chunks)
+
+
+def test_referenced_assignment_is_context_of_its_users():
+    code = "LIMIT = 10\n\n\n" + _function("f").replace("return x", "return x + LIMIT") + _function("g")
+    chunks = chunk_module(code, max_chars=600)
+    with_f = next(chunk for chunk in chunks if "f" in chunk["names"])
+    assert "LIMIT = 10" in with_f["code"]
+    assert not any("<module-level code>" in chunk["names"] for chunk in chunks)
+
+
+def test_oversized_class_without_methods_is_kept():
+    attributes = "".join(f"    FIELD_{i} = {i}\n" for i in range(100))
+    code = "class Table:\n" + attributes + "\n\n" + _function("after")
+    chunks = chunk_module(code, max_chars=600)
+    assert "Table" in [name for chunk in chunks for name in chunk["names"]]
+    assert "FIELD_99 = 99" in _covered(chunks)
+
+
+def test_oversized_class_is_split_per_method():
+    methods = "".join("    " + line for line in _function("m1").splitlines(True)) + \
+        "".join("    " + line for line in _function("m2").splitlines(True))
+    code = "class Big:\n    KIND = 'x'\n\n" + methods
+    chunks = chunk_module(code, max_chars=600)
+    names = [name for chunk in chunks for name in chunk["names"]]
+    assert names == ["Big.m1", "Big.m2"]
+    assert all("class Big:" in chunk["code"] for chunk in chunks)
+
+
+def test_every_chunk_parses():
+    code = "import os\nimport sys\nX: int = 1\n\n\n" + _function("f") + _function("g") + "print(os.sep)\n"
+    for chunk in chunk_module(code, max_chars=600):
+        ast.parse(chunk["code"])
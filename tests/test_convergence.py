@@ -0,0 +1,45 @@
+import json
+
+from src.utils import convergence
+from src.utils.convergence import ConvergenceTracker, score
+
+
+def results(total, failed):
+    return {"total": total, "passed": total - failed, "failed": failed}
+
+
+def test_no_tests_ranks_below_any_run_with_tests():
+    assert score(results(0, 0)) < score(results(10, 10))
+    assert score(results(10, 10)) < score(results(10, 5)) < score(results(10, 0))
+
+
+def test_best_candidate_is_kept():
+    tracker = ConvergenceTracker(patience=0)
+    tracker.record(1, "a", "p1", results(10, 5))
+    tracker.record(2, "b", "p2", results(0, 0))
+    tracker.record(3, "c", "p3", results(10, 8))
+    assert tracker.best["iteration"] == 1
+
+
+def test_no_progress_stops_after_patience():
+    tracker = ConvergenceTracker(patience=2)
+    assert tracker.record(1, "a", "p1", results(10, 5)) is None
+    assert tracker.record(2, "b", "p2", results(10, 6)) is None
+    assert tracker.record(3, "c", "p3", results(10, 7)) == convergence.STOP_NO_PROGRESS
+
+
+def test_fixpoint_and_cycle():
+    tracker = ConvergenceTracker()
+    tracker.record(1, "a", "p1", results(10, 5))
+    tracker.record(2, "b", "p2", results(10, 4))
+    assert tracker.check_candidate("b\n") == convergence.STOP_FIXPOINT
+    assert tracker.check_candidate("a") == convergence.STOP_CYCLE
+    assert tracker.check_candidate("c") is None
+
+
+def test_state_round_trip():
+    tracker = ConvergenceTracker(patience=3)
+    tracker.record(1, "a", "p1", results(10, 5))
+    restored = ConvergenceTracker.from_state(json.loads(json.dumps(tracker.state())), 3)
+    assert restored.best["score"] == tracker.best["score"]
+    assert restored.check_candidate("a") == convergence.STOP_FIXPOINT
@@ -0,0 +1,53 @@
+import random
+
+import pytest
+
+from src.utils.failures import compress_failures
+from src.utils.tokens import estimate_tokens
+
+
+def _test(n: int, status: str = "failed", line: int = 10, message: str = "AssertionError: 1 != 2") -> dict:
+    traceback = (
+        "Traceback (most recent call last):\n"
+        f'  File "/sandbox/generated_tests.py", line {n + 5}, in test_{n}\n'
+        f"    self.assertEqual(fixed_code.f({n}), 2)\n"
+        f'  File "/sandbox/fixed_code.py", line {line}, in f\n'
+        "    return x + 1\n"
+        f"{message}\n"
+    )
+    return {"id": f"generated_tests.TestF.test_{n}", "status": status, "duration": 0.01, "traceback": traceback}
+
+
+def _results(tests: list, captured: str = "", output: str = "") -> dict:
+    failed = sum(t["status"] != "passed" for t in tests)
+    return {"total": len(tests), "failed": failed, "passed": len(tests) - failed, "tests": tests,
+            "output": output, "captured": captured, "load_error": False}
+
+
+def test_identical_failures_are_grouped():
+    summary = compress_failures(_results([_test(i) for i in range(20)]))
+    assert summary.count("AssertionError") == 1
+    assert "FAILED in 20 test(s)" in summary
+
+
+def test_distinct_failures_are_listed_separately():
+    tests = [_test(i, line=10 + i % 3, message=f"ValueError: case {i % 3}") for i in range(9)]
+    summary = compress_failures(_results(tests))
+    assert "[3]" in summary
+
+
+@pytest.mark.parametrize("budget", [20, 50, 100, 300, 700, 1500])
+def test_budget_is_a_hard_bound(budget):
+    rng = random.Random(budget)
+    for _ in range(30):
+        tests = [_test(i, status=rng.choice(["failed", "error"]), line=rng.randint(1, 40),
+                       message="E: " + "x" * rng.randint(10, 600)) for i in range(rng.randint(1, 60))]
+        results = _results(tests, captured="printed\n" * rng.randint(0, 500))
+        assert estimate_tokens(compress_failures(results, token_budget=budget)) <= budget
+
+
+def test_raw_output_fallback_stays_within_budget():
+    results = _results([], output="Traceback: boom\n" * 1000)
+    results["failed"] = 1
+    summary = compress_failures(results, token_budget=100)
+    assert "boom" in summary and estimate_tokens(summary) <= 100
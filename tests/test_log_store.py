@@ -0,0 +1,53 @@
+import threading
+import time
+
+from src.utils.log_store import BodyStore, JsonlLogStore, query_entries, read_entries
+
+
+class SlowFirstPut(BodyStore):
+    """Stalls the first batch between taking it and writing it: the window a second flush could use."""
+
+    def __init__(self, path):
+        super().__init__(path)
+        self.first = True
+
+    def put(self, bodies):
+        if self.first:
+            self.first = False
+            time.sleep(0.2)
+        return super().put(bodies)
+
+
+def test_concurrent_flushes_keep_append_order(tmp_path):
+    path = str(tmp_path / "log.jsonl")
+    store = JsonlLogStore(path, batch_size=1000, flush_interval=60, bodies=SlowFirstPut(str(tmp_path / "bodies.db")))
+    store.append({"id": "1", "details": {"input_prompt": "p" * 300, "output_response": "1"}})
+    first = threading.Thread(target=store.flush)
+    first.start()
+    time.sleep(0.05)  # the first flush has taken entry 1 and is stalled
+    store.append({"id": "2", "details": {"input_prompt": "q" * 300, "output_response": "2"}})
+    store.flush()
+    first.join()
+    store.close()
+
+    assert [e["id"] for e in read_entries(path)] == ["1", "2"]
+
+
+def test_bodies_are_stored_once_and_rehydrated(tmp_path):
+    path = str(tmp_path / "log.jsonl")
+    bodies = BodyStore(str(tmp_path / "bodies.db"), min_chars=10)
+    store = JsonlLogStore(path, bodies=bodies)
+    prompt = "the same long prompt " * 20
+    for i in range(5):
+        store.append({"id": str(i), "agent": "Fixer" if i % 2 else "Auditor",
+                      "details": {"input_prompt": prompt, "output_response": "short"}})
+    store.close()
+
+    raw = list(read_entries(path))
+    assert all("input_prompt" not in e["details"] and "bodies" in e for e in raw)
+    assert all(e["details"]["output_response"] == "short" for e in raw)  # under min_chars: inline
+    assert bodies.stats()["bodies"] == 1
+
+    fixer = list(query_entries(path, bodies=bodies, agent="Fixer"))
+    assert [e["id"] for e in fixer] == ["1", "3"]
+    assert all(e["details"]["input_prompt"] == prompt and "bodies" not in e for e in fixer)
@@ -0,0 +1,27 @@
+import json
+import os
+
+from src.utils.manifest import Manifest, VERDICT_FAIL, VERDICT_PASS
+
+
+def test_record_keeps_newer_entries_written_by_another_process(tmp_path):
+    path = str(tmp_path / "manifest.json")
+    worker_a = Manifest(path)
+    worker_b = Manifest(path)
+
+    worker_a.record("x.py", "old", "m", VERDICT_FAIL, "out_x")
+    worker_b.record("x.py", "new", "m", VERDICT_PASS, "out_x")  # B's copy of x is newer than A's
+    worker_a.record("y.py", "h", "m", VERDICT_PASS, "out_y")
+
+    files = json.loads(open(path, encoding="utf-8").read())["files"]
+    assert files[os.path.abspath("x.py")]["hash"] == "new"
+    assert files[os.path.abspath("x.py")]["verdict"] == VERDICT_PASS
+    assert files[os.path.abspath("y.py")]["hash"] == "h"
+
+
+def test_record_overwrites_the_recorded_file(tmp_path):
+    path = str(tmp_path / "manifest.json")
+    manifest = Manifest(path)
+    manifest.record("x.py", "h1", "m", VERDICT_FAIL, "out")
+    manifest.record("x.py", "h2", "m", VERDICT_PASS, "out")
+    assert Manifest(path).get("x.py")["hash"] == "h2"
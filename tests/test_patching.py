@@ -0,0 +1,66 @@
+import difflib
+import random
+
+import pytest
+
+from src.utils.patching import PatchError, apply_unified_diff, strip_code_fences
+
+
+def _diff(old: str, new: str, context: int = 3) -> str:
+    return "".join(difflib.unified_diff(old.splitlines(True), new.splitlines(True), "a", "b", n=context))
+
+
+ORIGINAL = "".join(f"line {i}\n" for i in range(1, 21))
+
+
+def test_multi_hunk():
+    new = ORIGINAL.replace("line 3\n", "line three\n").replace("line 15\n", "line 15\nextra\n")
+    assert apply_unified_diff(ORIGINAL, _diff(ORIGINAL, new)) == new
+
+
+def test_insertion_only_hunks():
+    new = ORIGINAL.replace("line 2\n", "line 2\nA\nB\n").replace("line 9\n", "line 9\nC\n")
+    diff = _diff(ORIGINAL, new, context=0)
+    assert "-2,0" in diff
+    assert apply_unified_diff(ORIGINAL, diff) == new
+
+
+def test_insertion_at_the_top():
+    new = "header\n" + ORIGINAL
+    assert apply_unified_diff(ORIGINAL, _diff(ORIGINAL, new, context=0)) == new
+
+
+def test_drifted_context():
+    new = ORIGINAL.replace("line 10\n", "line ten\n")
+    diff = _diff(ORIGINAL, new).replace("@@ -7,7 +7,7 @@", "@@ -4,7 +4,7 @@")  # line numbers off by 3
+    assert apply_unified_diff(ORIGINAL, diff) == new
+
+
+def test_context_mismatch_raises():
+    diff = "@@ -1,2 +1,2 @@\n line 1\n-not there\n+x\n"
+    with pytest.raises(PatchError):
+        apply_unified_diff(ORIGINAL, diff)
+
+
+def test_random_zero_context_diffs():
+    rng = random.Random(0)
+    for _ in range(300):
+        lines = ORIGINAL.splitlines(True)
+        for _ in range(rng.randint(1, 4)):
+            i = rng.randrange(len(lines) + 1)
+            kind = rng.choice(["insert", "delete", "replace"])
+            if kind == "insert" or i == len(lines):
+                lines[i:i] = [f"new {rng.random()}\n"] * rng.randint(1, 3)
+            elif kind == "delete":
+                del lines[i]
+            else:
+                lines[i] = f"changed {rng.random()}\n"
+        new = "".join(lines)
+        for context in (0, 1, 3):
+            assert apply_unified_diff(ORIGINAL, _diff(ORIGINAL, new, context)) == new
+
+
+def test_strip_code_fences():
+    assert strip_code_fences("Here:\n```python\nx = 1\n```\nDone.") == "x = 1"
+    assert strip_code_fences("```python\nx = 1\n") == "x = 1"
+    assert strip_code_fences("x = 1") == "x = 1"
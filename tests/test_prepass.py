@@ -0,0 +1,47 @@
+import subprocess
+
+from src.utils import prepass
+
+
+def _fake_run(returncode, stdout="", stderr=""):
+    def run(*args, **kwargs):
+        return subprocess.CompletedProcess(args, returncode, stdout=stdout, stderr=stderr)
+    return run
+
+
+def _source(tmp_path):
+    path = tmp_path / "a.py"
+    path.write_text("x = 1\n")
+    return str(path)
+
+
+def test_pylint_crash_is_not_clean(tmp_path, monkeypatch):
+    monkeypatch.setattr(prepass.subprocess, "run", _fake_run(1, stderr="Traceback ...\nAstroidError: boom"))
+    path = _source(tmp_path)
+    assert prepass.run_prepass([path], workers=1)[path]["clean"] is False
+
+
+def test_pylint_usage_error_is_not_clean(tmp_path, monkeypatch):
+    monkeypatch.setattr(prepass.subprocess, "run", _fake_run(32, stderr="usage: pylint [options]"))
+    path = _source(tmp_path)
+    assert prepass.run_prepass([path], workers=1)[path]["clean"] is False
+
+
+def test_empty_output_with_errors_is_not_clean(tmp_path, monkeypatch):
+    monkeypatch.setattr(prepass.subprocess, "run", _fake_run(0, stderr="something went wrong"))
+    path = _source(tmp_path)
+    assert prepass.run_prepass([path], workers=1)[path]["clean"] is False
+
+
+def test_no_messages_is_clean(tmp_path, monkeypatch):
+    monkeypatch.setattr(prepass.subprocess, "run", _fake_run(0, stdout="[]"))
+    path = _source(tmp_path)
+    assert prepass.run_prepass([path], workers=1)[path]["clean"] is True
+
+
+def test_findings_are_reported(tmp_path, monkeypatch):
+    path = _source(tmp_path)
+    stdout = '[{"path": "%s", "line": 1, "type": "warning", "symbol": "unused", "message": "m"}]' % path
+    monkeypatch.setattr(prepass.subprocess, "run", _fake_run(4, stdout=stdout))
+    result = prepass.run_prepass([path], workers=1)[path]
+    assert result["clean"] is False and result["findings"][0]["symbol"] == "unused"
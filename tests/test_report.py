@@ -0,0 +1,16 @@
+import pytest
+
+from src.utils.report import percentile
+
+
+@pytest.mark.parametrize("values, pct, expected", [
+    ([], 50, 0.0),
+    ([7], 0, 7), ([7], 50, 7), ([7], 100, 7),
+    ([1, 2], 0, 1), ([1, 2], 50, 1), ([1, 2], 90, 2), ([1, 2], 100, 2),
+    (list(range(1, 11)), 0, 1), (list(range(1, 11)), 50, 5), (list(range(1, 11)), 90, 9),
+    (list(range(1, 11)), 99, 10), (list(range(1, 11)), 100, 10),
+    ([10, 3, 7, 1], 50, 3),  # unsorted input
+    (list(range(1, 101)), 7, 7),  # no floating-point overshoot to the next rank
+])
+def test_nearest_rank(values, pct, expected):
+    assert percentile(values, pct) == expected
@@ -0,0 +1,135 @@
+"""Queued jobs resume from their checkpoint, and stop as soon as their lease is lost."""
+import os
+
+import pytest
+
+pytest.importorskip("dotenv")  # main.py loads .env at import
+
+import main  # noqa: E402
+from src.utils.manifest import Manifest, file_sha256  # noqa: E402
+from src.utils.work_queue import STAGE_AUDITED, STAGE_FIXED, Lease, LeaseLost, WorkQueue  # noqa: E402
+
+
+class Auditor:
+    def __init__(self):
+        self.calls = 0
+
+    def analyze(self, path, findings=None, brief=False):
+        self.calls += 1
+        return "fresh audit"
+
+
+class Fixer:
+    model_id = "fake/model"
+
+    def __init__(self):
+        self.calls = []
+
+    def fix(self, code, analysis, output_path=None):
+        self.calls.append(analysis)
+        return code + "# fixed\n"
+
+
+class Judge:
+    def __init__(self, on_evaluate=None):
+        self.calls = []
+        self.on_evaluate = on_evaluate
+
+    def evaluate(self, target_code_path, fixer, max_iterations=5, base_dir_override=None, suite_key=None,
+                 resume=None, on_iteration=None, guard=None):
+        with open(target_code_path) as f:
+            self.calls.append({"code": f.read(), "resume": resume})
+        if self.on_evaluate:
+            self.on_evaluate()
+        if guard:
+            guard()
+        return {"final_path": target_code_path, "passed": True}
+
+
+@pytest.fixture
+def setup(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)  # the sandbox is relative to the working directory
+    source = tmp_path / "src_dir" / "a.py"
+    source.parent.mkdir()
+    source.write_text("x = 1\n")
+    queue = WorkQueue(str(tmp_path / "queue.db"), lease_seconds=60)
+    queue.enqueue(str(source), str(source.parent), "a.py", file_sha256(str(source)))
+    return queue, str(source)
+
+
+def run(queue, path, state, stage, judge=None, manifest=None):
+    job = queue.claim("worker")
+    lease = Lease(queue, job, "worker")
+    if state:
+        lease.save(stage, **state)
+    auditor, fixer, judge = Auditor(), Fixer(), judge or Judge()
+    outcome = main.process_file(path, "a.py", auditor, fixer, judge, max_iterations=3, manifest=manifest,
+                                checkpoint=lease)
+    return outcome, auditor, fixer, judge
+
+
+def test_fresh_job_runs_every_stage(setup):
+    queue, path = setup
+    outcome, auditor, fixer, _ = run(queue, path, {}, None)
+    assert outcome == "new"
+    assert auditor.calls == 1 and fixer.calls == ["fresh audit"]
+    assert queue.jobs()[0]["stage"] == STAGE_FIXED
+
+
+def test_resume_after_audit(setup):
+    queue, path = setup
+    _, auditor, fixer, _ = run(queue, path, {"analysis": "saved audit"}, STAGE_AUDITED)
+    assert auditor.calls == 0
+    assert fixer.calls == ["saved audit"]
+
+
+def test_resume_after_fix(setup):
+    queue, path = setup
+    _, auditor, fixer, judge = run(queue, path, {"analysis": "a", "fixed_code": "x = 2\n"}, STAGE_FIXED)
+    assert auditor.calls == 0 and fixer.calls == []
+    assert judge.calls[0]["code"] == "x = 2\n"
+    assert judge.calls[0]["resume"] is None
+
+
+def test_resume_judge_loop(setup, tmp_path):
+    queue, path = setup
+    candidate = tmp_path / "candidate.py"
+    candidate.write_text("x = 3\n")
+    judge_state = {"iteration": 2, "code_path": str(candidate), "tracker": {}, "test_code": None}
+    _, auditor, fixer, judge = run(queue, path, {"analysis": "a", "fixed_code": "x = 2\n", "judge": judge_state},
+                                   "iteration 2")
+    assert auditor.calls == 0 and fixer.calls == []
+    assert judge.calls[0]["resume"] == judge_state
+
+
+def test_judge_loop_restarts_when_its_files_are_gone(setup, tmp_path):
+    queue, path = setup
+    judge_state = {"iteration": 2, "code_path": str(tmp_path / "missing.py"), "tracker": {}, "test_code": None}
+    _, _, _, judge = run(queue, path, {"analysis": "a", "fixed_code": "x = 2\n", "judge": judge_state}, "iteration 2")
+    assert judge.calls[0]["resume"] is None
+
+
+def test_saved_progress_is_dropped_when_the_file_changed(setup):
+    queue, path = setup
+    with open(path, "a") as f:
+        f.write("y = 2\n")
+    _, auditor, fixer, _ = run(queue, path, {"analysis": "stale", "fixed_code": "stale"}, STAGE_FIXED)
+    assert auditor.calls == 1 and fixer.calls == ["fresh audit"]
+
+
+def test_lost_lease_stops_before_the_final_output(setup, tmp_path):
+    queue, path = setup
+    manifest = Manifest(str(tmp_path / "manifest.json"))
+    leases = []
+
+    def taken_over():
+        leases[0].lost = True  # what the heartbeat does once another worker owns the job
+
+    job = queue.claim("worker")
+    lease = Lease(queue, job, "worker")
+    leases.append(lease)
+    with pytest.raises(LeaseLost):
+        main.process_file(path, "a.py", Auditor(), Fixer(), Judge(on_evaluate=taken_over), max_iterations=3,
+                          manifest=manifest, checkpoint=lease)
+    assert not os.path.exists(os.path.join("sandbox", "final_fixed_a.py"))
+    assert manifest.get(path) is None
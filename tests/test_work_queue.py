@@ -0,0 +1,87 @@
+import time
+
+import pytest
+
+from src.utils.work_queue import DONE, PENDING, STAGE_AUDITED, Lease, LeaseLost, WorkQueue
+
+
+@pytest.fixture
+def queue(tmp_path):
+    return WorkQueue(str(tmp_path / "queue.db"), lease_seconds=0.2, max_attempts=3)
+
+
+def enqueue_one(queue, tmp_path):
+    path = tmp_path / "a.py"
+    path.write_text("x = 1\n")
+    queue.enqueue(str(path), str(tmp_path), "a.py", "hash")
+    return str(path)
+
+
+def test_expired_lease_is_taken_over(queue, tmp_path):
+    enqueue_one(queue, tmp_path)
+    job = queue.claim("A")
+    assert queue.claim("B") is None  # still leased by A
+
+    time.sleep(0.25)
+    taken = queue.claim("B")
+    assert taken["id"] == job["id"]
+    assert taken["attempts"] == 1  # attempts made before this claim
+
+    with pytest.raises(LeaseLost):
+        queue.checkpoint(job["id"], "A", STAGE_AUDITED, {"analysis": "stale"})
+    with pytest.raises(LeaseLost):
+        queue.complete(job["id"], "A", "new")
+    queue.complete(job["id"], "B", "new")
+    assert queue.jobs(DONE)[0]["outcome"] == "new"
+
+
+def test_heartbeat_keeps_the_lease(queue, tmp_path):
+    enqueue_one(queue, tmp_path)
+    job = queue.claim("A")
+    with Lease(queue, job, "A") as lease:
+        time.sleep(0.5)
+        assert queue.claim("B") is None
+        lease.check()
+        lease.save(STAGE_AUDITED, analysis="ok")
+    assert queue.jobs()[0]["stage"] == STAGE_AUDITED
+
+
+def test_lease_check_raises_after_takeover(queue, tmp_path):
+    enqueue_one(queue, tmp_path)
+    job = queue.claim("A")
+    lease = Lease(queue, job, "A")  # heartbeat not started: the lease runs out
+    time.sleep(0.25)
+    assert queue.claim("B") is not None
+    with pytest.raises(LeaseLost):
+        lease.check()
+    with pytest.raises(LeaseLost):
+        lease.save(STAGE_AUDITED, analysis="stale")
+    assert queue.jobs()[0]["checkpoint"] == "{}"
+
+
+def test_checkpoint_survives_a_new_claim(queue, tmp_path):
+    enqueue_one(queue, tmp_path)
+    job = queue.claim("A")
+    Lease(queue, job, "A").save(STAGE_AUDITED, analysis="saved audit")
+    time.sleep(0.25)
+    job = queue.claim("B")
+    assert job["stage"] == STAGE_AUDITED
+    assert job["checkpoint"] == {"analysis": "saved audit"}
+
+
+def test_job_fails_after_max_attempts(queue, tmp_path):
+    enqueue_one(queue, tmp_path)
+    for owner in ("A", "B", "C"):
+        assert queue.claim(owner) is not None
+        time.sleep(0.25)
+    assert queue.claim("D") is None
+    assert queue.jobs()[0]["status"] == "failed"
+
+
+def test_changed_content_requeues_from_scratch(queue, tmp_path):
+    path = enqueue_one(queue, tmp_path)
+    job = queue.claim("A")
+    Lease(queue, job, "A").save(STAGE_AUDITED, analysis="old")
+    assert queue.enqueue(path, str(tmp_path), "a.py", "other hash") == "requeued"
+    job = queue.jobs()[0]
+    assert job["status"] == PENDING and job["checkpoint"] == "{}"